@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------
+#Module Description
+#--------------------------------------------------------------------
+"""
+Benchmarks of the EMI request/response path.
+Micro benchmarks:
+- serialize     -> Building a getParameterValuesRequest, uncached and cached
+- reassemble    -> Splitting a response received in socket sized chunks
+- parse         -> Parsing a getParameterValuesResponse, fast path and ElementTree
+End to end benchmark:
+- logging       -> IMMController in INTERNLOGGING against a local EMISimulator,
+                   reporting achieved rate, p50/p99 latency, CPU per sample and RSS growth
+
+The results are saved as JSON, and two result files can be compared.
+Usage:
+python bench_emi.py --output results.json
+python bench_emi.py --compare old.json new.json
+"""
+#--------------------------------------------------------------------
+#Administration Details
+#--------------------------------------------------------------------
+__author__ = "Mats Larsen"
+__copyright__ = "2020 [NTNU Gjøvik and SINTEF Manufacturing]"
+__credits__ = ["Mats Larsen"]
+__license__ = "MIT"
+__maintainer__ = "Mats Larsen"
+__email__ = "Mats.Larsen@sintef.no"
+__status__ = "Development"
+__date__ = "30032020"
+__version__ = "1.0"
+#--------------------------------------------------------------------
+#Import
+#--------------------------------------------------------------------
+import os
+import sys
+import json
+import time
+import timeit
+import argparse
+import datetime
+import platform
+import subprocess
+import multiprocessing
+import xml.etree.ElementTree as ET
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.abspath(__file__)),'..'))
+import imm
+from imm.emi_requests import RequestCache, param_values_request
+from imm.emi_parser import parse_frame, parse_param_values
+#--------------------------------------------------------------------
+#CONSTANTS
+#--------------------------------------------------------------------
+URI_COUNTS = [1,10,100,500,1000,2000]   # Number of uris in the micro benchmarks
+READ_SIZE = 1024                        # Chunk size of the reassembly benchmark
+MIN_TIME = 0.2                          # Min seconds per micro benchmark
+DURATION = 10.0                         # Seconds of the end to end benchmark
+SAMPLING_RATE = 0.01                    # Sampling time of the end to end benchmark
+E2E_URIS = 200                          # Number of uris in the end to end benchmark
+#--------------------------------------------------------------------
+#METHODS
+#--------------------------------------------------------------------
+def uris(n):
+    '''
+    Return n synthetic uris.
+    '''
+    return ['cc300://imm/cm#//c.Bench/p.sv_rParam{}/v'.format(i) for i in range(n)]
+
+def response(u):
+    '''
+    Return a serialized getParameterValuesResponse for the uris.
+    '''
+    root = ET.Element('getParameterValuesResponse')
+    root.set('id','1')
+    parameters = ET.SubElement(root,'parameters')
+    for i in u:
+        p = ET.SubElement(parameters,'parameter')
+        p.set('uri',i)
+        p.set('parameterValue','123.456')
+    return b'<?xml version="1.0" encoding="UTF-8"?>' + ET.tostring(root)
+
+def measure(func):
+    '''
+    Return the mean seconds per call of func.
+    '''
+    t = timeit.Timer(func)
+    n,total = t.autorange()
+    while total < MIN_TIME:
+        n *= 2
+        total = t.timeit(n)
+    return total/n
+
+def reassemble_naive(chunks,endtag):
+    '''
+    Reassembly as EMI_Interface did before the frame decoder.
+    '''
+    r = b''
+    i = 0
+    while not r.endswith(endtag):
+        r += chunks[i]
+        i += 1
+    return r[:-1]
+
+def reassemble_decoder(chunks,endtag):
+    '''
+    Reassembly with the frame decoder.
+    '''
+    d = imm.FrameDecoder(endtag=endtag,read_size=READ_SIZE)
+    for c in chunks:
+        d.feed(c)
+    return d.next_frame()
+
+def parse_tree(frame):
+    '''
+    Parsing with ElementTree as EMI_Interface did before the fast path.
+    '''
+    r = frame.decode('UTF-8')
+    r = '<' + r.split('<',1)[-1]
+    values = {}
+    for i in ET.fromstring(r).findall('./parameters/parameter'):
+        values[i.get('uri')] = i.get('parameterValue')
+    return values
+
+def bench_micro():
+    '''
+    Run the micro benchmarks.
+    Return:
+    - Dict : name -> uri count -> seconds per call
+    '''
+    endtag = imm.emi_frame_decoder.ENDTAG
+    r = {'serialize_uncached':{},'serialize_cached':{},
+         'reassemble_naive':{},'reassemble_decoder':{},
+         'parse_tree':{},'parse_fast':{}}
+    for n in URI_COUNTS:
+        u = uris(n)
+        cache = RequestCache()
+        r['serialize_uncached'][n] = measure(lambda: param_values_request(u,'1') + endtag)
+        r['serialize_cached'][n] = measure(lambda: cache.get(('values',tuple(u)),lambda: param_values_request(u,'1')))
+
+        frame = response(u)
+        data = frame + endtag
+        chunks = [data[i:i+READ_SIZE] for i in range(0,len(data),READ_SIZE)]
+        r['reassemble_naive'][n] = measure(lambda: reassemble_naive(chunks,endtag))
+        r['reassemble_decoder'][n] = measure(lambda: reassemble_decoder(chunks,endtag))
+
+        r['parse_tree'][n] = measure(lambda: parse_tree(frame))
+        r['parse_fast'][n] = measure(lambda: parse_param_values(frame))
+        print('Micro benchmarks done for {} uris'.format(n))
+    return r
+
+def rss():
+    '''
+    Return the current resident set size in bytes.
+    '''
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1])*os.sysconf('SC_PAGE_SIZE')
+    except (OSError,ValueError,AttributeError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss*1024
+
+def percentile(values,p):
+    '''
+    Return the p percentile of the values.
+    '''
+    if not values:
+        return None
+    v = sorted(values)
+    i = min(len(v)-1,max(0,int(round(p/100.0*(len(v)-1)))))
+    return v[i]
+
+def run_simulator(port,latency,jitter,ready):
+    '''
+    Serve a simulator in a separate process, so it does not count as client CPU.
+    '''
+    sim = imm.EMISimulator(port=port,latency=latency,jitter=jitter)
+    sim.start()
+    ready.set()
+    while True:
+        time.sleep(1)
+
+def bench_logging(duration,sampling_rate,n_uris,latency,jitter,port):
+    '''
+    Run IMMController in INTERNLOGGING against a local simulator.
+    Return:
+    - Dict : Achieved rate, latency percentiles, CPU per sample and RSS growth
+    '''
+    ready = multiprocessing.Event()
+    p = multiprocessing.Process(target=run_simulator,args=(port,latency,jitter,ready))
+    p.daemon = True
+    p.start()
+    ready.wait(10)
+    try:
+        c = imm.IMMController(name='bench',ip='127.0.0.1',port=port,username='bench',passw='bench',
+                              uri=uris(n_uris),sampling_rate=sampling_rate)
+        c.init()
+
+        # Time every request of the sampling loop
+        latencies = []
+        get_value = c.get_value
+        def timed_get_value(uri=None):
+            s = time.perf_counter()
+            d = get_value(uri)
+            latencies.append(time.perf_counter()-s)
+            return d
+        c.get_value = timed_get_value
+
+        rss_start = rss()
+        cpu_start = time.process_time()
+        start = time.perf_counter()
+        c.set_state(imm.States.INTERNLOGGING)
+        # Count the samples from the queue, the same for the row and columnar queue
+        added = c.get_queue_info()['added']
+        while time.perf_counter()-start < duration:
+            time.sleep(0.1)
+            if c.columnar:
+                c.drain_columns()
+            else:
+                c.drain()
+        c.set_state(imm.States.IDLE)
+        samples = c.get_queue_info()['added'] - added
+        elapsed = time.perf_counter()-start
+        cpu = time.process_time()-cpu_start
+        rss_end = rss()
+        c.close()
+    finally:
+        p.terminate()
+
+    return {'duration':elapsed,
+            'uris':n_uris,
+            'target_rate':1.0/sampling_rate,
+            'achieved_rate':samples/elapsed,
+            'samples':samples,
+            'latency_p50':percentile(latencies,50),
+            'latency_p99':percentile(latencies,99),
+            'cpu_per_sample':cpu/samples if samples else None,
+            'rss_growth':rss_end-rss_start}
+
+def git_commit():
+    '''
+    Return the current git commit, None if not in a git repository.
+    '''
+    try:
+        return subprocess.check_output(['git','rev-parse','HEAD'],stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError,subprocess.CalledProcessError):
+        return None
+
+def compare(old_path,new_path):
+    '''
+    Print the ratio new/old of every result in two result files.
+    '''
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print('Comparing {} ({}) with {} ({})'.format(old_path,old.get('commit'),new_path,new.get('commit')))
+    for name,results in new.get('micro',{}).items():
+        for n,t in results.items():
+            o = old.get('micro',{}).get(name,{}).get(n)
+            if o:
+                print('{:<22} {:>6} uris : {:>12.3e} s -> {:>12.3e} s ({:.2f}x)'.format(name,n,o,t,t/o))
+    for key,v in new.get('logging',{}).items():
+        o = old.get('logging',{}).get(key)
+        if isinstance(v,(int,float)) and isinstance(o,(int,float)) and o:
+            print('{:<22} : {:>12.4g} -> {:>12.4g} ({:.2f}x)'.format(key,o,v,v/o))
+#--------------------------------------------------------------------
+#MAIN
+#--------------------------------------------------------------------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks of the EMI request/response path')
+    parser.add_argument('--output',default='bench_emi.json',help='Path of the JSON result file')
+    parser.add_argument('--compare',nargs=2,metavar=('OLD','NEW'),help='Compare two result files')
+    parser.add_argument('--skip-micro',action='store_true',help='Skip the micro benchmarks')
+    parser.add_argument('--skip-logging',action='store_true',help='Skip the end to end benchmark')
+    parser.add_argument('--duration',type=float,default=DURATION,help='Seconds of the end to end benchmark')
+    parser.add_argument('--sampling-rate',type=float,default=SAMPLING_RATE,help='Sampling time in seconds')
+    parser.add_argument('--uris',type=int,default=E2E_URIS,help='Number of uris in the end to end benchmark')
+    parser.add_argument('--latency',type=float,default=0.0,help='Simulator response delay in seconds')
+    parser.add_argument('--jitter',type=float,default=0.0,help='Simulator max random extra delay in seconds')
+    parser.add_argument('--port',type=int,default=10150,help='Port of the simulator')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        sys.exit(0)
+
+    results = {'commit':git_commit(),
+               'date':datetime.datetime.now().isoformat(),
+               'python':platform.python_version(),
+               'platform':platform.platform()}
+    if not args.skip_micro:
+        results['micro'] = bench_micro()
+    if not args.skip_logging:
+        results['logging'] = bench_logging(args.duration,args.sampling_rate,args.uris,
+                                           args.latency,args.jitter,args.port)
+        print('Logging : {}'.format(results['logging']))
+
+    with open(args.output,'w') as f:
+        json.dump(results,f,sort_keys=True,indent=4,separators=(',',': '))
+    print('Results saved to {}'.format(args.output))
@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------
+#Module Description
+#--------------------------------------------------------------------
+'''
+Sampling tools shared by the imm and revpi_daq controllers.
+'''
+#--------------------------------------------------------------------
+# Administration Details
+#--------------------------------------------------------------------
+__author__ = "Mats Larsen"
+__copyright__ = "2020 [NTNU Gjøvik and SINTEF Manufacturing]"
+__credits__ = ["Mats Larsen", "Olga Ogorodnyk"]
+__license__ = "MIT"
+__maintainer__ = "Mats Larsen"
+__email__ = "Mats.Larsen@sintef.no"
+__status__ = "Development"
+__date__ = "30032020"
+__version__ = "1.0"
+#--------------------------------------------------------------------
+# IMPORT
+#--------------------------------------------------------------------
+from .deadline_timer import DeadlineTimer, OverrunPolicy
+from .ring_buffer import RingBuffer, OverflowPolicy, rows_to_lists
+from .subscriptions import Subscription, SubscriptionHub
+from .param_catalog import load_catalog, read_csv
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------
+# Module Description
+#--------------------------------------------------------------------
+"""
+Columnar store for samples.
+The schema is fixed when the store is created, with one preallocated NumPy
+column per parameter. A sample dict is written as one row, so the keys are not
+stored per sample. The columns form a bounded ring with the same overflow
+policies as RingBuffer, and drain() removes and returns the buffered rows as
+one array per column.
+
+A parameter that is missing in a sample, or has a value that can not be
+converted, is stored as NaN, NaT or None. With allow_missing the int and bool
+columns are therefore stored as float64.
+
+The methods put, get, empty, full, qsize and clear behave as for RingBuffer,
+so the store can replace it as the sample queue of a controller.
+
+Methods for ColumnStore
+put(d,block,timeout)    -> Write a sample dict as a row, False if a row was dropped
+get(block,timeout)      -> Remove and return the oldest row as a dict
+drain(max_items)        -> Remove and return the oldest rows as columns
+drain_rows(max_items)   -> Remove and return the oldest rows as dicts
+clear()                 -> Remove all rows
+info()                  -> Returning size, capacity, bytes and counters
+"""
+#--------------------------------------------------------------------
+# Administration Details
+#--------------------------------------------------------------------
+__author__ = "Mats Larsen"
+__copyright__ = "2020 [NTNU Gjøvik and SINTEF Manufacturing]"
+__credits__ = ["Mats Larsen", "Olga Ogorodnyk"]
+__license__ = "MIT"
+__maintainer__ = "Mats Larsen"
+__email__ = "Mats.Larsen@sintef.no"
+__status__ = "Development"
+__date__ = "30032020"
+__version__ = "1.0"
+#--------------------------------------------------------------------
+#IMPORT
+#--------------------------------------------------------------------
+import queue
+import threading
+import numpy as np
+from .ring_buffer import OverflowPolicy
+#--------------------------------------------------------------------
+#CONSTANTS
+#--------------------------------------------------------------------
+CAPACITY = 10000                    # Default max number of rows
+DEFAULT_DTYPE = 'float64'           # dtype of a column given without dtype
+TIMESTAMP_DTYPE = 'datetime64[ms]'  # dtype of timestamp columns
+# Value of a missing parameter per dtype kind
+MISSING = {'f':np.nan,'c':np.nan,'M':np.datetime64('NaT'),'m':np.timedelta64('NaT'),'O':None}
+#--------------------------------------------------------------------
+# CLASSES
+#--------------------------------------------------------------------
+class ColumnStore():
+    '''
+    Bounded ring of samples stored as one NumPy column per parameter.
+    '''
+    def __init__(self,columns,**kwargs):
+        '''
+        Instantiate the store with a fixed schema.
+        Params:
+        - columns       -> Dict[str,str] or list<str> : Column name and NumPy dtype name, a list gives float64
+        - capacity      -> int              : Max number of rows
+        - overflow      -> OverflowPolicy   : Handling of a row when the store is full
+        - allow_missing -> Boolean          : Store int and bool columns as float64, so missing values are NaN
+        '''
+        # Arguments
+        if not isinstance(columns,dict):
+            columns = {name:DEFAULT_DTYPE for name in columns}
+        self.__capacity = max(1,kwargs.get('capacity',CAPACITY))
+        self.__policy = kwargs.get('overflow',OverflowPolicy.DROP_OLDEST)
+        allow_missing = kwargs.get('allow_missing',True)
+
+        # Attributes
+        self.__columns = {}         # name -> array
+        self.__missing = {}         # name -> value of a missing parameter
+        for name,dtype in columns.items():
+            dtype = np.dtype(dtype)
+            if allow_missing and dtype.kind in 'iub':
+                dtype = np.dtype('float64')
+            self.__columns[name] = np.empty(self.__capacity,dtype=dtype)
+            self.__missing[name] = MISSING.get(dtype.kind,0)
+        self.__items = list(self.__columns.items())
+        self.__head = 0             # Index of the oldest row
+        self.__count = 0
+        self.__dropped = 0
+        self.__added = 0
+        self.__invalid = 0          # Values that could not be converted
+        self.__high_water = 0
+        self.__lock = threading.Lock()
+        self.__not_empty = threading.Condition(self.__lock)
+        self.__not_full = threading.Condition(self.__lock)
+
+    def put(self,d,block=True,timeout=None):
+        '''
+        Write a sample as a row. Keys that are not in the schema are ignored.
+        Params:
+        - d       -> Dict    : The sample, column name -> value
+        - block   -> Boolean : Wait for room with the BLOCK policy
+        - timeout -> float   : Max time to wait with the BLOCK policy, None waits forever
+        Return:
+        - Boolean : True if the row was added, False if a row was dropped for it
+        '''
+        with self.__lock:
+            added = True
+            if self.__count >= self.__capacity:
+                if self.__policy == OverflowPolicy.BLOCK and block:
+                    if not self.__not_full.wait_for(lambda: self.__count < self.__capacity,timeout):
+                        self.__dropped += 1
+                        return False
+                elif self.__policy == OverflowPolicy.DROP_OLDEST:
+                    self.__head = (self.__head + 1) % self.__capacity
+                    self.__count -= 1
+                    self.__dropped += 1
+                    added = False
+                else:
+                    self.__dropped += 1
+                    return False
+
+            i = (self.__head + self.__count) % self.__capacity
+            for name,col in self.__items:
+                v = d.get(name)
+                if v is None:
+                    col[i] = self.__missing[name]
+                    continue
+                try:
+                    col[i] = v
+                except (ValueError,TypeError,OverflowError):
+                    col[i] = self.__missing[name]
+                    self.__invalid += 1
+            self.__count += 1
+            self.__added += 1
+            if self.__count > self.__high_water:
+                self.__high_water = self.__count
+            self.__not_empty.notify()
+            return added
+
+    def __take(self,n):
+        '''
+        Remove the n oldest rows and return them as columns.
+        '''
+        h = self.__head
+        end = h + n
+        r = {}
+        if end <= self.__capacity:
+            for name,col in self.__items:
+                r[name] = col[h:end].copy()
+        else:
+            end -= self.__capacity
+            for name,col in self.__items:
+                r[name] = np.concatenate((col[h:],col[:end]))
+        self.__head = end % self.__capacity
+        self.__count -= n
+        self.__not_full.notify_all()
+        return r
+
+    def drain(self,max_items=None):
+        '''
+        Remove and return the oldest rows as columns.
+        Params:
+        - max_items -> int : Max number of rows, None returns all rows
+        Return:
+        - Dict : column name -> array, empty arrays if there are no rows
+        '''
+        with self.__lock:
+            n = self.__count if max_items is None else max(0,min(max_items,self.__count))
+            return self.__take(n)
+
+    def drain_rows(self,max_items=None):
+        '''
+        Remove and return the oldest rows as dicts, as RingBuffer.drain.
+        Params:
+        - max_items -> int : Max number of rows, None returns all rows
+        Return:
+        - list<Dict> : The rows oldest first, with python values
+        '''
+        with self.__lock:
+            n = self.__count if max_items is None else max(0,min(max_items,self.__count))
+            columns = self.__take(n)
+        names = list(columns.keys())
+        return [dict(zip(names,row)) for row in zip(*(col.tolist() for col in columns.values()))]
+
+    def get(self,block=True,timeout=None):
+        '''
+        Remove and return the oldest row.
+        Params:
+        - block   -> Boolean : Wait for a row
+        - timeout -> float   : Max time to wait, None waits forever
+        Return:
+        - Dict : column name -> value, raises queue.Empty if there is none
+        '''
+        with self.__lock:
+            if not block:
+                if self.__count == 0:
+                    raise queue.Empty
+            elif not self.__not_empty.wait_for(lambda: self.__count > 0,timeout):
+                raise queue.Empty
+            return {name:col[0] for name,col in self.__take(1).items()}
+
+    def clear(self):
+        '''
+        Remove all rows. The counters are kept.
+        '''
+        with self.__lock:
+            self.__head = 0
+            self.__count = 0
+            self.__not_full.notify_all()
+
+    def empty(self):
+        '''
+        '''
+        return self.__count == 0
+
+    def full(self):
+        '''
+        '''
+        return self.__count >= self.__capacity
+
+    def qsize(self):
+        '''
+        '''
+        return self.__count
+
+    def __len__(self):
+        '''
+        '''
+        return self.__count
+
+    @property
+    def columns(self):
+        '''
+        '''
+        return {name:col.dtype.name for name,col in self.__items}
+
+    def info(self):
+        '''
+        Return the state of the store.
+        Return:
+        - Dict : size, capacity, bytes, policy and counters of added, dropped and invalid values
+        '''
+        with self.__lock:
+            return {'size':self.__count,
+                    'capacity':self.__capacity,
+                    'columns':len(self.__items),
+                    'bytes':sum(col.nbytes for name,col in self.__items),
+                    'policy':self.__policy,
+                    'added':self.__added,
+                    'dropped':self.__dropped,
+                    'invalid':self.__invalid,
+                    'high_water':self.__high_water}
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------
+# Module Description
+#--------------------------------------------------------------------
+"""
+Deadline timer for periodic sampling.
+The deadlines are absolute on a monotonic clock, start + k*period, so the
+time spent on a sample does not add up as drift. A sample that takes longer
+than the period gives missed deadlines, which are handled by a policy:
+- SKIP      -> The missed deadlines are skipped, the next sample is on the grid
+- CATCH_UP  -> The missed deadlines are sampled at once, up to max_catch_up
+
+The timer records the achieved period, the jitter of the period, the lateness
+of the samples and the number of missed deadlines.
+
+Methods for DeadlineTimer
+start()         -> Start a new run, the first deadline is now
+wait(event)     -> Wait for the next deadline, False if the event was set
+done()          -> Mark the sample as done and compute the next deadline
+record(d,m)     -> Record a sample for a deadline of another scheduler
+info()          -> Returning the timing statistics of the run
+"""
+#--------------------------------------------------------------------
+# Administration Details
+#--------------------------------------------------------------------
+__author__ = "Mats Larsen"
+__copyright__ = "2020 [NTNU Gjøvik and SINTEF Manufacturing]"
+__credits__ = ["Mats Larsen", "Olga Ogorodnyk"]
+__license__ = "MIT"
+__maintainer__ = "Mats Larsen"
+__email__ = "Mats.Larsen@sintef.no"
+__status__ = "Development"
+__date__ = "30032020"
+__version__ = "1.0"
+#--------------------------------------------------------------------
+#IMPORT
+#--------------------------------------------------------------------
+import math
+import time
+import threading
+#--------------------------------------------------------------------
+#CONSTANTS
+#--------------------------------------------------------------------
+MAX_CATCH_UP = 10       # Default max number of missed deadlines sampled at once
+#--------------------------------------------------------------------
+# CLASSES
+#--------------------------------------------------------------------
+class OverrunPolicy:
+    '''
+    Handling of missed deadlines.
+    '''
+    SKIP = 'skip'
+    CATCH_UP = 'catch_up'
+
+class DeadlineTimer():
+    '''
+    Absolute deadlines with overrun accounting.
+    '''
+    def __init__(self,period,**kwargs):
+        '''
+        Instantiate the timer.
+        Params:
+        - period            -> float            : Sampling period in seconds
+        - overrun_policy    -> OverrunPolicy    : Handling of missed deadlines
+        - max_catch_up      -> int              : Max missed deadlines sampled at once for CATCH_UP
+        - overrun_callback  -> callable         : Called with the number of missed deadlines and info()
+        '''
+        # Arguments
+        self.__period = period
+        self.__policy = kwargs.get('overrun_policy',OverrunPolicy.SKIP)
+        self.__max_catch_up = kwargs.get('max_catch_up',MAX_CATCH_UP)
+        self.__callback = kwargs.get('overrun_callback',None)
+
+        # Attributes
+        self.__lock = threading.Lock()
+        self.start()
+
+    def start(self):
+        '''
+        Start a new run, the first deadline is now and the statistics are reset.
+        '''
+        with self.__lock:
+            self.__deadline = time.monotonic()
+            self.__last_start = None
+            self.__samples = 0
+            self.__missed = 0
+            self.__overruns = 0
+            self.__sum = 0.0            # Sum of periods
+            self.__sum_sq = 0.0         # Sum of squared periods
+            self.__max_late = 0.0
+            self.__sum_late = 0.0
+
+    def wait(self,event=None):
+        '''
+        Wait for the next deadline.
+        Params:
+        - event -> threading.Event : Event that interrupts the wait
+        Return:
+        - Boolean : True at the deadline, False if the event was set
+        '''
+        timeout = self.__deadline - time.monotonic()
+        if timeout > 0:
+            if event is None:
+                time.sleep(timeout)
+            elif event.wait(timeout=timeout):
+                return False
+        elif event is not None and event.is_set():
+            return False
+
+        with self.__lock:
+            self.__start_sample(time.monotonic(),self.__deadline)
+        return True
+
+    def __start_sample(self,now,deadline):
+        '''
+        Record the lateness and period of a sample started at now, the lock is held.
+        '''
+        late = now - deadline
+        self.__sum_late += late
+        if late > self.__max_late:
+            self.__max_late = late
+        if self.__last_start is not None:
+            p = now - self.__last_start
+            self.__sum += p
+            self.__sum_sq += p*p
+        self.__last_start = now
+        self.__samples += 1
+
+    def record(self,deadline,missed=0):
+        '''
+        Record a sample started now for a deadline given by another scheduler,
+        e.g. the SamplingScheduler of the flexible cycles mode.
+        Params:
+        - deadline -> float : Monotonic time the sample was due
+        - missed   -> int   : Number of deadlines the scheduler skipped
+        '''
+        with self.__lock:
+            self.__start_sample(time.monotonic(),deadline)
+            if missed > 0:
+                self.__overruns += 1
+                self.__missed += missed
+        if missed > 0 and self.__callback is not None:
+            self.__callback(missed,self.info())
+
+    def done(self):
+        '''
+        Mark the sample as done and compute the next deadline.
+        Return:
+        - int : Number of missed deadlines
+        '''
+        now = time.monotonic()
+        with self.__lock:
+            self.__deadline += self.__period
+            missed = 0
+            if now > self.__deadline:
+                self.__overruns += 1
+                missed = int(math.floor((now - self.__deadline)/self.__period)) + 1
+                if self.__policy == OverrunPolicy.CATCH_UP:
+                    # Sample the missed deadlines at once, skip the rest
+                    skipped = max(0,missed - self.__max_catch_up)
+                else:
+                    skipped = missed
+                self.__deadline += skipped*self.__period
+                self.__missed += skipped
+                missed = skipped
+        if missed > 0 and self.__callback is not None:
+            self.__callback(missed,self.info())
+        return missed
+
+    @property
+    def period(self):
+        '''
+        '''
+        return self.__period
+
+    @period.setter
+    def period(self,period):
+        '''
+        Set a new period, the next deadline is moved relative to the last sample.
+        '''
+        with self.__lock:
+            if self.__last_start is not None:
+                self.__deadline = self.__last_start + period
+            self.__period = period
+
+    @property
+    def next_deadline(self):
+        '''
+        '''
+        return self.__deadline
+
+    def info(self):
+        '''
+        Return the timing statistics of the run.
+        Return:
+        - Dict : period, samples, achieved period and rate, jitter, lateness, missed deadlines and overruns
+        '''
+        with self.__lock:
+            n = self.__samples - 1
+            achieved = self.__sum/n if n > 0 else None
+            jitter = None
+            if n > 0:
+                jitter = math.sqrt(max(0.0,self.__sum_sq/n - achieved*achieved))
+            return {'period':self.__period,
+                    'policy':self.__policy,
+                    'samples':self.__samples,
+                    'achieved_period':achieved,
+                    'achieved_rate':1.0/achieved if achieved else None,
+                    'jitter':jitter,
+                    'mean_late':self.__sum_late/self.__samples if self.__samples else None,
+                    'max_late':self.__max_late,
+                    'missed':self.__missed,
+                    'overruns':self.__overruns}
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------
+# Module Description
+#--------------------------------------------------------------------
+"""
+Compiled parameter catalog.
+A parameter list is read from its CSV file once and compiled by the caller,
+e.g. validated and prepared with the uri index and sampling groups. The result
+is stored next to the CSV file as JSON with the size and modification time of
+the CSV. The next start loads the compiled catalog instead of validating the
+CSV again, and the catalog is compiled again when the CSV has changed or the
+catalog has another version or kind.
+
+The catalog holds only plain data (dicts, lists, strings and numbers), so
+loading it never creates objects of the package. The caller builds its objects
+from the data and changes the kind when the compiled format changes.
+
+Methods
+read_csv(path)                  -> Returning the rows of a CSV parameter list by name
+load_catalog(path,compile)      -> Returning the compiled catalog of a CSV parameter list
+"""
+#--------------------------------------------------------------------
+# Administration Details
+#--------------------------------------------------------------------
+__author__ = "Mats Larsen"
+__copyright__ = "2020 [NTNU Gjøvik and SINTEF Manufacturing]"
+__credits__ = ["Mats Larsen", "Olga Ogorodnyk"]
+__license__ = "MIT"
+__maintainer__ = "Mats Larsen"
+__email__ = "Mats.Larsen@sintef.no"
+__status__ = "Development"
+__date__ = "30032020"
+__version__ = "1.0"
+#--------------------------------------------------------------------
+#IMPORT
+#--------------------------------------------------------------------
+import os
+import csv
+import json
+#--------------------------------------------------------------------
+#CONSTANTS
+#--------------------------------------------------------------------
+CATALOG_VERSION = 2             # Version of the file format, 2 is JSON
+SUFFIX = '.catalog'             # Default catalog path is the CSV path with this suffix
+#--------------------------------------------------------------------
+#METHODS
+#--------------------------------------------------------------------
+def read_csv(path,delimiter=','):
+    '''
+    Read a CSV parameter list.
+    Params:
+    - path      -> str : Path to the CSV file
+    - delimiter -> str : Delimiter of the columns
+    Return:
+    - Dict : name -> row as a dict of strings
+    '''
+    params = {}
+    with open(path,newline='') as csvfile:
+        for row in csv.DictReader(csvfile,delimiter=delimiter,quotechar='"'):
+            params[row['name']] = row
+    return params
+
+def _source(path):
+    '''
+    Return the identity of the CSV file.
+    '''
+    st = os.stat(path)
+    return [st.st_mtime_ns,st.st_size]
+
+def _read_catalog(path):
+    '''
+    Load a catalog file, None if it is missing or broken.
+    '''
+    try:
+        with open(path,encoding='UTF-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError,ValueError):
+        print('Parameter catalog {} could not be read, it is compiled again'.format(path))
+        return None
+
+def _write_catalog(path,catalog):
+    '''
+    Save a catalog file. The file is replaced atomically.
+    '''
+    tmp = '{}.tmp'.format(path)
+    try:
+        with open(tmp,'w',encoding='UTF-8') as f:
+            json.dump(catalog,f,separators=(',',':'))
+        os.replace(tmp,path)
+    except (OSError,TypeError,ValueError) as e:
+        print('Parameter catalog {} could not be saved : {}'.format(path,e))
+
+def load_catalog(path,compile=None,**kwargs):
+    '''
+    Load the compiled catalog of a CSV parameter list, compile it if the CSV has changed.
+    Params:
+    - path          -> str      : Path to the CSV file
+    - compile       -> callable : Called with the rows from read_csv, the result is the catalog
+                                  as plain JSON data. None gives the rows
+    - kind          -> str      : Name of the compiled format, a catalog of another kind is compiled again
+    - catalog_path  -> str      : Path to the catalog file, default is the CSV path with SUFFIX
+    - delimiter     -> str      : Delimiter of the CSV columns
+    Return:
+    - object : The compiled catalog
+    '''
+    kind = kwargs.get('kind','rows')
+    catalog_path = kwargs.get('catalog_path') or path + SUFFIX
+    source = _source(path)
+
+    c = _read_catalog(catalog_path)
+    if (isinstance(c,dict) and c.get('version') == CATALOG_VERSION
+            and c.get('kind') == kind and c.get('source') == source):
+        print('Loading parameter catalog at path : {}'.format(catalog_path))
+        return c['data']
+
+    print('Loading parameter list at path : {}'.format(path))
+    data = read_csv(path,kwargs.get('delimiter',','))
+    if compile is not None:
+        data = compile(data)
+    _write_catalog(catalog_path,{'version':CATALOG_VERSION,
+                                 'kind':kind,
+                                 'source':source,
+                                 'data':data})
+    return data
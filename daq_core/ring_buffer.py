@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------
+# Module Description
+#--------------------------------------------------------------------
+"""
+Bounded ring buffer for samples.
+The slots are preallocated, and the buffer is bounded by a number of samples
+and optionally by an estimated number of bytes, so the memory use is known
+also when nobody drains the samples during a long run. When the buffer is
+full a sample is handled by an overflow policy:
+- DROP_OLDEST   -> The oldest sample is removed to make room
+- DROP_NEWEST   -> The new sample is dropped
+- BLOCK         -> The producer waits until there is room
+
+The methods get, put, empty, full and qsize behave as for queue.Queue.
+
+Methods for RingBuffer
+put(item,timeout)       -> Add a sample, False if it was dropped
+get(block,timeout)      -> Remove and return the oldest sample
+drain(max_items)        -> Remove and return the oldest samples in one operation
+clear()                 -> Remove all samples
+info()                  -> Returning size, capacity and counters
+
+Methods
+rows_to_lists(rows)     -> Returning the samples as one list per key, None where a key is missing
+"""
+#--------------------------------------------------------------------
+# Administration Details
+#--------------------------------------------------------------------
+__author__ = "Mats Larsen"
+__copyright__ = "2020 [NTNU Gjøvik and SINTEF Manufacturing]"
+__credits__ = ["Mats Larsen", "Olga Ogorodnyk"]
+__license__ = "MIT"
+__maintainer__ = "Mats Larsen"
+__email__ = "Mats.Larsen@sintef.no"
+__status__ = "Development"
+__date__ = "30032020"
+__version__ = "1.0"
+#--------------------------------------------------------------------
+#IMPORT
+#--------------------------------------------------------------------
+import sys
+import time
+import queue
+import threading
+#--------------------------------------------------------------------
+#CONSTANTS
+#--------------------------------------------------------------------
+CAPACITY = 100000       # Default max number of samples
+#--------------------------------------------------------------------
+#METHODS
+#--------------------------------------------------------------------
+def rows_to_lists(rows,exclude=()):
+    '''
+    Turn drained samples into one list per key. A key that is missing in a
+    sample, e.g. a uri that was not due in the flexible cycles mode, gives None,
+    so all lists have the same length and stay aligned with the timestamps.
+    Params:
+    - rows    -> list<Dict>    : The samples, oldest first
+    - exclude -> iterable<str> : Keys that are left out
+    Return:
+    - Dict : key -> list of values
+    '''
+    keys = {}
+    for row in rows:
+        for key in row:
+            if key not in keys and key not in exclude:
+                keys[key] = None
+    return {key:[row.get(key) for row in rows] for key in keys}
+
+def sample_size(d):
+    '''
+    Estimate the memory of a sample.
+    Params:
+    - d -> object : The sample, a dict of values is counted with its keys and values
+    Return:
+    - int : Estimated size in bytes
+    '''
+    n = sys.getsizeof(d)
+    if isinstance(d,dict):
+        for k,v in d.items():
+            n += sys.getsizeof(k) + sys.getsizeof(v)
+    return n
+#--------------------------------------------------------------------
+# CLASSES
+#--------------------------------------------------------------------
+class OverflowPolicy:
+    '''
+    Handling of a sample when the buffer is full.
+    '''
+    DROP_OLDEST = 'drop_oldest'
+    DROP_NEWEST = 'drop_newest'
+    BLOCK = 'block'
+
+class RingBuffer():
+    '''
+    Preallocated FIFO of samples with a bounded size.
+    '''
+    def __init__(self,**kwargs):
+        '''
+        Instantiate the buffer.
+        Params:
+        - capacity  -> int              : Max number of samples
+        - max_bytes -> int              : Max estimated bytes of the samples, None is no limit
+        - overflow  -> OverflowPolicy   : Handling of a sample when the buffer is full
+        '''
+        # Arguments
+        self.__capacity = max(1,kwargs.get('capacity',CAPACITY))
+        self.__max_bytes = kwargs.get('max_bytes',None)
+        self.__policy = kwargs.get('overflow',OverflowPolicy.DROP_OLDEST)
+
+        # Attributes
+        self.__slots = [None]*self.__capacity
+        self.__sizes = [0]*self.__capacity if self.__max_bytes is not None else None
+        self.__head = 0                 # Index of the oldest sample
+        self.__count = 0
+        self.__bytes = 0
+        self.__dropped = 0
+        self.__added = 0
+        self.__high_water = 0
+        self.__lock = threading.Lock()
+        self.__not_empty = threading.Condition(self.__lock)
+        self.__not_full = threading.Condition(self.__lock)
+
+    def __is_full(self,size):
+        '''
+        Check if a sample of the size does not fit.
+        '''
+        if self.__count >= self.__capacity:
+            return True
+        if self.__max_bytes is not None and self.__count > 0:
+            return self.__bytes + size > self.__max_bytes
+        return False
+
+    def __pop(self):
+        '''
+        Remove and return the oldest sample.
+        '''
+        item = self.__slots[self.__head]
+        self.__slots[self.__head] = None
+        if self.__sizes is not None:
+            self.__bytes -= self.__sizes[self.__head]
+        self.__head = (self.__head + 1) % self.__capacity
+        self.__count -= 1
+        return item
+
+    def put(self,item,block=True,timeout=None):
+        '''
+        Add a sample to the buffer.
+        Params:
+        - item    -> object  : The sample
+        - block   -> Boolean : Wait for room with the BLOCK policy
+        - timeout -> float   : Max time to wait with the BLOCK policy, None waits forever
+        Return:
+        - Boolean : True if the sample was added, False if a sample was dropped for it
+        '''
+        size = sample_size(item) if self.__max_bytes is not None else 0
+        with self.__lock:
+            added = True
+            if self.__is_full(size):
+                if self.__policy == OverflowPolicy.BLOCK and block:
+                    end = None if timeout is None else time.monotonic() + timeout
+                    while self.__is_full(size):
+                        remaining = None if end is None else end - time.monotonic()
+                        if remaining is not None and remaining <= 0:
+                            self.__dropped += 1
+                            return False
+                        self.__not_full.wait(remaining)
+                elif self.__policy == OverflowPolicy.DROP_OLDEST:
+                    while self.__is_full(size):
+                        self.__pop()
+                        self.__dropped += 1
+                    added = False
+                else:
+                    self.__dropped += 1
+                    return False
+
+            i = (self.__head + self.__count) % self.__capacity
+            self.__slots[i] = item
+            if self.__sizes is not None:
+                self.__sizes[i] = size
+                self.__bytes += size
+            self.__count += 1
+            self.__added += 1
+            if self.__count > self.__high_water:
+                self.__high_water = self.__count
+            self.__not_empty.notify()
+            return added
+
+    def get(self,block=True,timeout=None):
+        '''
+        Remove and return the oldest sample.
+        Params:
+        - block   -> Boolean : Wait for a sample
+        - timeout -> float   : Max time to wait, None waits forever
+        Return:
+        - object : The sample, raises queue.Empty if there is none
+        '''
+        with self.__lock:
+            if not block:
+                if self.__count == 0:
+                    raise queue.Empty
+            elif not self.__not_empty.wait_for(lambda: self.__count > 0,timeout):
+                raise queue.Empty
+            item = self.__pop()
+            self.__not_full.notify()
+            return item
+
+    def drain(self,max_items=None):
+        '''
+        Remove and return the oldest samples in one operation.
+        Params:
+        - max_items -> int : Max number of samples, None returns all samples
+        Return:
+        - list : The samples, oldest first
+        '''
+        with self.__lock:
+            n = self.__count if max_items is None else max(0,min(max_items,self.__count))
+            h = self.__head
+            end = h + n
+            # Parts of the ring holding the samples
+            if end <= self.__capacity:
+                parts = [(h,end)]
+            else:
+                end -= self.__capacity
+                parts = [(h,self.__capacity),(0,end)]
+            items = []
+            for a,b in parts:
+                items += self.__slots[a:b]
+                self.__slots[a:b] = [None]*(b-a)
+                if self.__sizes is not None:
+                    self.__bytes -= sum(self.__sizes[a:b])
+            self.__head = end % self.__capacity
+            self.__count -= n
+            self.__not_full.notify_all()
+            return items
+
+    def clear(self):
+        '''
+        Remove all samples. The counters are kept.
+        '''
+        with self.__lock:
+            self.__slots = [None]*self.__capacity
+            if self.__sizes is not None:
+                self.__sizes = [0]*self.__capacity
+            self.__head = 0
+            self.__count = 0
+            self.__bytes = 0
+            self.__not_full.notify_all()
+
+    def empty(self):
+        '''
+        '''
+        return self.__count == 0
+
+    def full(self):
+        '''
+        '''
+        return self.__count >= self.__capacity
+
+    def qsize(self):
+        '''
+        '''
+        return self.__count
+
+    def __len__(self):
+        '''
+        '''
+        return self.__count
+
+    def info(self):
+        '''
+        Return the state of the buffer.
+        Return:
+        - Dict : size, capacity, bytes, policy and counters of added and dropped samples
+        '''
+        with self.__lock:
+            return {'size':self.__count,
+                    'capacity':self.__capacity,
+                    'bytes':self.__bytes if self.__max_bytes is not None else None,
+                    'max_bytes':self.__max_bytes,
+                    'policy':self.__policy,
+                    'added':self.__added,
+                    'dropped':self.__dropped,
+                    'high_water':self.__high_water}
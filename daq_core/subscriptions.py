@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------
+# Module Description
+#--------------------------------------------------------------------
+"""
+Push based delivery of samples.
+A controller publishes every sample to its subscriptions when the sample is
+taken. Each subscription has its own bounded RingBuffer, so a slow subscriber
+does not hold back the others, and its overflow policy is the backpressure
+policy: drop the oldest, drop the newest, or block the sampling thread.
+
+The samples are delivered in batches of the samples buffered at the time, by
+a callback on a thread of the subscription, by iterating the subscription, or
+by iterating it with async for. An async consumer is woken in its event loop
+by the publisher, so it holds no thread while it waits and can be cancelled.
+
+Methods for Subscription
+get_batch(timeout)      -> Returning the next batch of samples, empty at timeout
+close()                 -> Stop the subscription
+info()                  -> Returning the state of the buffer
+
+Methods for SubscriptionHub
+subscribe(callback)     -> Returning a new subscription
+unsubscribe(sub)        -> Close and remove a subscription
+publish(sample)         -> Deliver a sample to all subscriptions
+"""
+#--------------------------------------------------------------------
+# Administration Details
+#--------------------------------------------------------------------
+__author__ = "Mats Larsen"
+__copyright__ = "2020 [NTNU Gjøvik and SINTEF Manufacturing]"
+__credits__ = ["Mats Larsen", "Olga Ogorodnyk"]
+__license__ = "MIT"
+__maintainer__ = "Mats Larsen"
+__email__ = "Mats.Larsen@sintef.no"
+__status__ = "Development"
+__date__ = "30032020"
+__version__ = "1.0"
+#--------------------------------------------------------------------
+#IMPORT
+#--------------------------------------------------------------------
+import queue
+import asyncio
+import threading
+from .ring_buffer import RingBuffer, OverflowPolicy
+#--------------------------------------------------------------------
+#CONSTANTS
+#--------------------------------------------------------------------
+CAPACITY = 1000         # Default max number of samples buffered per subscription
+WAIT_TIME = 1.0         # Max time a consumer waits before checking if it is closed
+#--------------------------------------------------------------------
+# CLASSES
+#--------------------------------------------------------------------
+class Subscription():
+    '''
+    Bounded buffer of samples for one subscriber.
+    '''
+    def __init__(self,**kwargs):
+        '''
+        Instantiate the subscription.
+        Params:
+        - capacity      -> int              : Max number of buffered samples
+        - overflow      -> OverflowPolicy   : Backpressure policy when the buffer is full
+        - block_timeout -> float            : Max time the publisher is blocked with BLOCK, None waits forever
+        - batch_size    -> int              : Max number of samples in a batch, None is all buffered
+        - callback      -> callable         : Called with every batch on a thread of the subscription
+        - transform     -> callable         : Called with every sample on the consumer side, e.g. to rename the keys
+        '''
+        # Arguments
+        self.__block_timeout = kwargs.get('block_timeout',None)
+        self.__batch_size = kwargs.get('batch_size',None)
+        self.__callback = kwargs.get('callback',None)
+        self.__transform = kwargs.get('transform',None)
+
+        # Attributes
+        self.__buffer = RingBuffer(capacity=kwargs.get('capacity',CAPACITY),
+                                   overflow=kwargs.get('overflow',OverflowPolicy.DROP_OLDEST))
+        self.__closed = threading.Event()
+        self.__thread = None
+        # Event loop and wakeup of an async consumer, set by the first __anext__
+        self.__loop = None
+        self.__wakeup = None
+        if self.__callback is not None:
+            self.__thread = threading.Thread(target=self.__deliver)
+            self.__thread.daemon = True
+            self.__thread.start()
+
+    def publish(self,sample):
+        '''
+        Add a sample to the buffer.
+        Return:
+        - Boolean : False if a sample was dropped
+        '''
+        if self.__closed.is_set():
+            return False
+        added = self.__buffer.put(sample,timeout=self.__block_timeout)
+        if self.__wakeup is not None and not self.__wakeup.is_set():
+            self.__wake()
+        return added
+
+    def __wake(self):
+        '''
+        Wake the async consumer in its event loop.
+        '''
+        try:
+            self.__loop.call_soon_threadsafe(self.__wakeup.set)
+        except RuntimeError:
+            pass    # The event loop is closed
+
+    def get_batch(self,timeout=None):
+        '''
+        Wait for samples and return all buffered samples, up to batch_size.
+        Params:
+        - timeout -> float : Max time to wait, None waits until a sample or close
+        Return:
+        - list<Dict> : The samples oldest first, empty at timeout or when closed
+        '''
+        remaining = timeout
+        while not self.__closed.is_set():
+            wait = WAIT_TIME if remaining is None else min(WAIT_TIME,remaining)
+            try:
+                first = self.__buffer.get(timeout=wait)
+            except queue.Empty:
+                if remaining is not None:
+                    remaining -= wait
+                    if remaining <= 0:
+                        return []
+                continue
+            n = None if self.__batch_size is None else self.__batch_size - 1
+            return self.__apply([first] + self.__buffer.drain(n))
+        return []
+
+    def __apply(self,batch):
+        '''
+        Return the batch with the transform applied to every sample.
+        '''
+        if self.__transform is None:
+            return batch
+        return [self.__transform(s) for s in batch]
+
+    def __deliver(self):
+        '''
+        Call the callback with every batch until closed.
+        '''
+        for batch in self:
+            try:
+                self.__callback(batch)
+            except Exception as e:
+                print('Subscription callback failed : {}'.format(e))
+
+    def __iter__(self):
+        '''
+        '''
+        return self
+
+    def __next__(self):
+        '''
+        Return the next batch, stop when closed.
+        '''
+        batch = self.get_batch()
+        if not batch:
+            raise StopIteration
+        return batch
+
+    def __aiter__(self):
+        '''
+        '''
+        return self
+
+    async def __anext__(self):
+        '''
+        Return the next batch without blocking the event loop, stop when closed.
+        '''
+        if self.__wakeup is None:
+            self.__loop = asyncio.get_running_loop()
+            self.__wakeup = asyncio.Event()
+        while not self.__closed.is_set():
+            # Cleared before the drain, so a sample published after it wakes the wait
+            self.__wakeup.clear()
+            batch = self.__buffer.drain(self.__batch_size)
+            if batch:
+                return self.__apply(batch)
+            await self.__wakeup.wait()
+        raise StopAsyncIteration
+
+    def close(self):
+        '''
+        Stop the subscription. Waiting consumers return within WAIT_TIME, an
+        async consumer at once.
+        '''
+        self.__closed.set()
+        if self.__wakeup is not None:
+            self.__wake()
+
+    @property
+    def closed(self):
+        '''
+        '''
+        return self.__closed.is_set()
+
+    def info(self):
+        '''
+        Return the state of the buffer.
+        Return:
+        - Dict : size, capacity, policy and counters of added and dropped samples
+        '''
+        d = self.__buffer.info()
+        d['closed'] = self.closed
+        return d
+
+class SubscriptionHub():
+    '''
+    The subscriptions of a controller.
+    '''
+    def __init__(self):
+        '''
+        Instantiate without subscriptions.
+        '''
+        self.__subs = ()
+        self.__lock = threading.Lock()
+
+    def subscribe(self,callback=None,**kwargs):
+        '''
+        Return a new subscription.
+        Params:
+        - callback -> callable : Called with every batch, None to iterate the subscription
+        - kwargs   -> The params of Subscription
+        Return:
+        - Subscription : The subscription
+        '''
+        sub = Subscription(callback=callback,**kwargs)
+        with self.__lock:
+            self.__subs = self.__subs + (sub,)
+        return sub
+
+    def unsubscribe(self,sub):
+        '''
+        Close and remove a subscription.
+        '''
+        sub.close()
+        with self.__lock:
+            self.__subs = tuple(i for i in self.__subs if i is not sub)
+
+    def publish(self,sample):
+        '''
+        Deliver a sample to all subscriptions.
+        '''
+        for sub in self.__subs:
+            sub.publish(sample)
+
+    def __len__(self):
+        '''
+        '''
+        return len(self.__subs)
+
+    def info(self):
+        '''
+        Return the state of all subscriptions.
+        '''
+        return [sub.info() for sub in self.__subs]
@@ -0,0 +1,46 @@
+#--------------------------------------------------------------------
+#Module Description
+#--------------------------------------------------------------------
+"""
+Example how to run a local EMI simulator, that can stand in for a machine.
+Connect EMI_Interface, IMM_API or the IMM proxy to IP and PORT below.
+"""
+#--------------------------------------------------------------------
+#Administration Details
+#--------------------------------------------------------------------
+__author__ = "Mats Larsen"
+__copyright__ = "2020 [NTNU Gjøvik and SINTEF Manufacturing]"
+__credits__ = ["Mats Larsen"]
+__license__ = "MIT"
+__maintainer__ = "Mats Larsen"
+__email__ = "Mats.Larsen@sintef.no"
+__status__ = "Development"
+__date__ = "30032020"
+__version__ = "1.0"
+#--------------------------------------------------------------------
+#Import
+#--------------------------------------------------------------------
+import imm
+#--------------------------------------------------------------------
+#CONSTANTS
+#--------------------------------------------------------------------
+IP = '127.0.0.1'            # Host of the simulator
+PORT = 10050                # Port of the simulator
+LATENCY = 0.005             # Response delay in seconds
+JITTER = 0.002              # Max random extra delay in seconds
+PADDING = 0                 # Extra bytes per parameter in value responses
+CYCLE_TIME = 20.0           # Seconds of a shot cycle
+#--------------------------------------------------------------------
+#METHODS
+#--------------------------------------------------------------------
+if __name__ ==  "__main__":
+    sim = imm.EMISimulator(host=IP,
+                           port=PORT,
+                           latency=LATENCY,
+                           jitter=JITTER,
+                           padding=PADDING,
+                           cycle_time=CYCLE_TIME)
+    try:
+        sim.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -16,7 +16,12 @@ __version__ = "1.0"
 # IMPORT
 #--------------------------------------------------------------------
 from .emi_interface import EMI_Interface
+from .async_emi_interface import AsyncEMIInterface
+from .emi_frame_decoder import FrameDecoder
+from .emi_pool import EMIConnectionPool
+from .emi_simulator import EMISimulator
 from .imm_api import IMM_API
 from .imm_proxy import IMMProxy
 from .process_params import ProcessParam
 from .imm_controller import IMMController,SamplingRateMode,Protocol,States
+from .multi_imm_controller import MultiIMMController
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------
+# Module Description
+#--------------------------------------------------------------------
+"""
+Sampling rate adapted to the phase of the shot cycle.
+Injection and holding are short phases with much information, while cooling
+and mould open are long and quiet. Phase indicators like clamp force or screw
+velocity are checked in every sample. When one crosses its enter threshold the
+fast rate is used, and the slow rate is used again when all indicators have
+crossed back over their exit thresholds and the hold time has passed.
+
+A trigger is (uri, enter, exit):
+- enter >= exit -> Active when the value rises to enter, released below exit
+- enter <  exit -> Active when the value falls to enter, released above exit
+
+Methods for AdaptiveRate
+update(values)      -> Returning the sampling period from the values of a sample
+info()              -> Returning the state of the triggers
+"""
+#--------------------------------------------------------------------
+# Administration Details
+#--------------------------------------------------------------------
+__author__ = "Mats Larsen"
+__copyright__ = "2020 [NTNU Gjøvik and SINTEF Manufacturing]"
+__credits__ = ["Mats Larsen", "Olga Ogorodnyk"]
+__license__ = "MIT"
+__maintainer__ = "Mats Larsen"
+__email__ = "Mats.Larsen@sintef.no"
+__status__ = "Development"
+__date__ = "30032020"
+__version__ = "1.0"
+#--------------------------------------------------------------------
+#IMPORT
+#--------------------------------------------------------------------
+import time
+#--------------------------------------------------------------------
+#CONSTANTS
+#--------------------------------------------------------------------
+FAST_RATE = 0.01        # Default sampling period in active phases in seconds
+SLOW_RATE = 0.5         # Default sampling period in quiet phases in seconds
+HOLD_TIME = 0.5         # Default min time in the fast rate after a trigger in seconds
+#--------------------------------------------------------------------
+# CLASSES
+#--------------------------------------------------------------------
+class AdaptiveRate():
+    '''
+    Fast or slow sampling period from thresholds with hysteresis.
+    '''
+    def __init__(self,**kwargs):
+        '''
+        Instantiate the adaptive rate, starting with the slow rate.
+        Params:
+        - triggers  -> list<(str,float,float)> : uri, enter and exit threshold of the phase indicators
+        - fast_rate -> float : Sampling period in active phases in seconds
+        - slow_rate -> float : Sampling period in quiet phases in seconds
+        - hold_time -> float : Min time in the fast rate after the last active sample in seconds
+        '''
+        # Arguments
+        self.__triggers = [(uri,float(enter),float(exit)) for uri,enter,exit in kwargs.get('triggers',[])]
+        self.__fast = kwargs.get('fast_rate',FAST_RATE)
+        self.__slow = kwargs.get('slow_rate',SLOW_RATE)
+        self.__hold = kwargs.get('hold_time',HOLD_TIME)
+
+        # Attributes
+        self.__active = {uri:False for uri,enter,exit in self.__triggers}
+        self.__last_active = None       # Time of the last sample with an active trigger
+        self.__switches = 0
+
+    @property
+    def uris(self):
+        '''
+        '''
+        return [uri for uri,enter,exit in self.__triggers]
+
+    @property
+    def period(self):
+        '''
+        '''
+        return self.__fast if self.__last_active is not None else self.__slow
+
+    def update(self,values,now=None):
+        '''
+        Update the triggers from a sample and return the sampling period.
+        Params:
+        - values -> Dict  : uri -> value of the sample
+        - now    -> float : Monotonic time of the sample, default is the current time
+        Return:
+        - float : The sampling period in seconds
+        '''
+        if now is None:
+            now = time.monotonic()
+        fast = self.__last_active is not None
+        active = False
+        for uri,enter,exit in self.__triggers:
+            try:
+                v = float(values.get(uri))
+            except (TypeError,ValueError):
+                active = active or self.__active[uri]      # Keep the state without a value
+                continue
+            if enter >= exit:
+                on = v >= enter if not self.__active[uri] else v >= exit
+            else:
+                on = v <= enter if not self.__active[uri] else v <= exit
+            self.__active[uri] = on
+            active = active or on
+
+        if active:
+            self.__last_active = now
+        elif self.__last_active is not None and now - self.__last_active >= self.__hold:
+            self.__last_active = None
+        if fast != (self.__last_active is not None):
+            self.__switches += 1
+        return self.period
+
+    def info(self):
+        '''
+        Return the state of the adaptive rate.
+        Return:
+        - Dict : period, fast and slow rate, number of switches and the state per trigger
+        '''
+        return {'period':self.period,
+                'fast_rate':self.__fast,
+                'slow_rate':self.__slow,
+                'hold_time':self.__hold,
+                'switches':self.__switches,
+                'triggers':dict(self.__active)}
@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------
+# Module Description
+#--------------------------------------------------------------------
+"""
+This module is for interaction with IMM over EMI for C300 machines with asyncio.
+It has the same requests, 0x19 framing and results as EMI_Interface, but is
+built on asyncio streams. Several machines can therefore be polled from one
+event loop, without one blocking thread per machine.
+
+A request without a connection raises ConnectionError. A request that is
+cancelled or fails between the request and the response closes the connection,
+so its response is never read by the next request, and connect() has to be
+called again.
+
+Methods for AsyncEMIInterface (all are coroutines)
+connect()                           -> Connecting the machine based on the params
+info_log(min_index)                 -> Returning the infolog from the machine, only new messages by default
+login()                             -> Login into the machine based on the user data
+logout()                            -> Login out of the machine
+close()                             -> Close the connection to the machine
+set_param_value(param_uri, value)   -> Setting parameter value based on a uri
+get_param_value(param_uri)          -> Returning the value of the parameter based on uri
+get_param_details(param_uri)        -> Returning details about a parameter based on uri
+get_parameter_text(param_uri)       -> Returning the parameters description
+get_process_dataset(min_r,max_r)    -> Returning the dataset of uris
+"""
+#--------------------------------------------------------------------
+# Administration Details
+#--------------------------------------------------------------------
+__author__ = "Mats Larsen"
+__copyright__ = "2020 [NTNU Gjøvik and SINTEF Manufacturing]"
+__credits__ = ["Mats Larsen", "Olga Ogorodnyk"]
+__license__ = "MIT"
+__maintainer__ = "Mats Larsen"
+__email__ = "Mats.Larsen@sintef.no"
+__status__ = "Development"
+__date__ = "30032020"
+__version__ = "1.0"
+#--------------------------------------------------------------------
+#IMPORT
+#--------------------------------------------------------------------
+import asyncio
+import datetime
+import xml.etree.ElementTree as ET
+from .emi_frame_decoder import FrameDecoder, ENDTAG, READ_SIZE
+from .emi_parser import parse_frame, parse_param_values, next_message_index, check_response
+from .emi_requests import RequestCache, CACHE_SIZE
+from .emi_requests import param_values_request, set_value_request
+from .emi_requests import param_details_request, parameter_phrase_request
+from .emi_requests import login_request, logout_request, messages_request, record_data_request
+#--------------------------------------------------------------------
+#CONSTANTS
+#--------------------------------------------------------------------
+LOGIN_RETRY = 1.0   # Seconds between login attempts
+#--------------------------------------------------------------------
+# CLASSES
+#--------------------------------------------------------------------
+class AsyncEMIInterface():
+    '''
+    Class for interaction with IMM(C300) over Engel Machin Interface (EMI) with asyncio
+    '''
+    def __init__(self,**kwargs):
+        '''
+        Instantiate EMI with params.
+        Params:
+        - name              -> str              : Name of the instance
+        - ip                -> str              : IP of the engel machine
+        - port              -> int              : Port to the engel machine
+        - username          -> str              : Login for user
+        - passw             -> str              : Password to the username
+        - debug             -> Boolean          : Debug value
+        - read_size         -> int              : Size of each socket read in bytes
+        - cache_size        -> int              : Number of cached serialized requests, 0 disables the cache
+        - login_retry       -> float            : Seconds between login attempts
+        '''
+        #Arguments
+        self.__name = kwargs.get('name','imm')
+        self.__ip = kwargs.get('ip',None)
+        self.__port = kwargs.get('port',None)
+        self.__username = kwargs.get('username',None)
+        self.__passw = kwargs.get('passw',None)
+        self.__debug = kwargs.get('debug',False)
+        self.__read_size = kwargs.get('read_size',READ_SIZE)
+        self.__login_retry = kwargs.get('login_retry',LOGIN_RETRY)
+
+        # Attributes
+        self.__endtag = ENDTAG                      # Endtag
+        self.__my_client_id = '1'                   # client id
+        self.__isoabs = 'iso_abs'                   # Setting
+        self.__session_id = None
+        self.__message_index = 0                    # Index after the last seen message
+        # Connection ref
+        self.__reader = None
+        self.__writer = None
+        self.__decoder = FrameDecoder(endtag=self.__endtag,read_size=self.__read_size)
+        self.__requests = RequestCache(maxsize=kwargs.get('cache_size',CACHE_SIZE),endtag=self.__endtag)
+        # Only one request at the time on the connection, created in the loop
+        self.__lock = None
+
+    async def connect(self):
+        '''
+        Establish connection to the machine.
+        Params:
+        Return:
+        - err -> Bool : True for valid connection otherwise false
+        '''
+        err = True
+        if self.__debug: print('Trying to etablish connection to {}:{}'.format(self.__ip,self.__port))
+        try:
+            self.__reader, self.__writer = await asyncio.open_connection(self.__ip,self.__port)
+            self.__decoder.reset()
+            self.__lock = asyncio.Lock()
+            if self.__debug: print('Etablish connection to {}:{}'.format(self.__ip,self.__port))
+        except OSError:
+            print('Etablish connection to {}:{} failed !!'.format(self.__ip,self.__port))
+            self.__reader = None
+            self.__writer = None
+            err = False
+        return err
+
+    async def close(self):
+        '''
+        Close the connection to the machine
+        '''
+        if self.__writer is not None:
+            self.__writer.close()
+            try:
+                await self.__writer.wait_closed()
+            except OSError:
+                pass
+        self.__reader = None
+        self.__writer = None
+
+    def __drop(self):
+        '''
+        Close the connection without waiting, e.g. when a request is cancelled.
+        '''
+        if self.__writer is not None:
+            self.__writer.close()
+        self.__reader = None
+        self.__writer = None
+        self.__decoder.reset()
+
+    async def info_log(self,min_index=None):
+        '''
+        Request for the infolog. The next call only returns new messages.
+        Params:
+        - min_index -> int : Index of the first message, None continues after the last seen message
+        Return:
+        - Element : The messages response
+        '''
+        if self.__debug: print('Perform info')
+        if min_index is None:
+            min_index = self.__message_index
+        r = parse_frame(await self.__request(messages_request('en',min_index) + self.__endtag))
+        self.__message_index = next_message_index(r,min_index)
+        return r
+
+    async def login(self):
+        '''
+        Login to the machine, retry until the login is a success.
+        '''
+        msg = login_request(self.__username,self.__passw) + self.__endtag
+        if self.__debug: print('Trying to login')
+        while True:
+            r = parse_frame(await self.__request(msg))
+            self.__session_id = r.get('sessionid') if r is not None else None
+            if self.__session_id is not None:
+                break
+            await self.logout()
+            await asyncio.sleep(self.__login_retry)
+        if self.__debug: print('Login Success')
+
+    async def logout(self):
+        '''
+        Logout of the machine
+        '''
+        if self.__writer is not None:
+            await self.__request(logout_request() + self.__endtag)
+            if self.__debug: print('Login Out')
+        else:
+            print('Connection not establish')
+
+    async def set_param_value(self,param_uri,value):
+        '''
+        Set value to a parameter given in argument
+        Params:
+        - param_uri -> str :
+        - value     -> str :
+        Return:
+        - Element : The response
+        '''
+        # Set requests are not cached as every value is a new request
+        value = str(value)
+        msg = set_value_request(param_uri,value,self.__isoabs) + self.__endtag
+        return parse_frame(await self.__request(msg))
+
+    async def get_param_value(self,param_uri):
+        '''
+        Get value to a parameter given in argument
+        Params:
+        - param_uri -> [str] or str :
+        Return:
+        -> Dict : With results
+        '''
+        param = param_uri
+        if not isinstance(param,list):
+            param = [param]
+        msg = self.__requests.get(('values',tuple(param)),
+                                  lambda: param_values_request(param,self.__my_client_id))
+
+        s = datetime.datetime.now()
+        r = await self.__request(msg)
+        e = datetime.datetime.now()
+        timestamp = s + (e-s)/2.0
+        key = 'timestamp_{}'.format(self.__name)
+
+        values = parse_param_values(r)
+        if values is None:
+            root = parse_frame(r)
+            values = {}
+            if root is None:
+                for i in param:
+                    values[i] = None
+                values[key] = None
+                return values
+            for i in root.findall('./parameters/parameter'):
+                values[i.get('uri')] = i.get('parameterValue')
+        values[key] = timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+        return values
+
+    async def get_param_details(self,param_uri):
+        '''
+        Request of detailed parameter properties.
+        Params:
+        - param_uri -> str :
+        Return:
+        - Dict : Attributes of the details response, None if the request failed
+        '''
+        msg = self.__requests.get(('details',param_uri),
+                                  lambda: param_details_request(param_uri))
+        r = check_response(parse_frame(await self.__request(msg)),'getParameterDetailsResponse')
+        return r.attrib if r is not None else None
+
+    async def get_parameter_text(self,param_uri):
+        '''
+        Get description of the parameter
+        '''
+        msg = self.__requests.get(('phrase',param_uri),
+                                  lambda: parameter_phrase_request(param_uri,self.__isoabs,'en'))
+        r = check_response(parse_frame(await self.__request(msg)),'getParameterPhraseResponse')
+        return ET.tostring(r) if r is not None else None
+
+    async def get_process_dataset(self,min_r,max_r):
+        '''
+        Get the process dataset on the machine
+        '''
+        return parse_frame(await self.__request(record_data_request(min_r,max_r) + self.__endtag))
+
+    async def __request(self,msg):
+        '''
+        Send a request and wait for the response.
+        Params:
+        - msg -> bytes : The request with endtag
+        Return:
+        - bytes : The response without endtag
+        '''
+        if self.__writer is None:
+            raise ConnectionError('Not connected to {}:{}'.format(self.__ip,self.__port))
+        async with self.__lock:
+            if self.__writer is None:
+                raise ConnectionError('Not connected to {}:{}'.format(self.__ip,self.__port))
+            try:
+                if self.__debug: print('Msg send to the machine : {}'.format(msg))
+                self.__writer.write(msg)
+                await self.__writer.drain()
+                r = self.__decoder.next_frame()
+                while r is None:
+                    data = await self.__reader.read(self.__read_size)
+                    if not data:
+                        raise ConnectionError('Connection closed by the machine')
+                    self.__decoder.feed(data)
+                    r = self.__decoder.next_frame()
+            except BaseException:
+                # A cancelled or failed request can leave its response in the stream,
+                # so the connection is dropped and the next request reads no stale frame
+                self.__drop()
+                raise
+        if self.__debug: print('Recv msg from the machine : {}'.format(r))
+        return r
+
+    @property
+    def name(self):
+        '''
+        '''
+        return self.__name
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------
+# Module Description
+#--------------------------------------------------------------------
+"""
+Adaptive chunking of large uri lists.
+A request for a very large uri list gives a long response time and can hit
+limits of the control. The uri list is therefore split into sub-requests. The
+size of a sub-request adapts to the measured response time and response size,
+so each sub-request stays within a latency budget. The chunk size is rounded
+down to a power of two, so the same sub-requests are repeated and their
+serialized requests can be cached.
+
+Methods for AdaptiveChunker
+split(uris)                     -> Returning the uri list split in chunks
+update(n,elapsed,nbytes)        -> Update the chunk size from a measured sub-request
+"""
+#--------------------------------------------------------------------
+# Administration Details
+#--------------------------------------------------------------------
+__author__ = "Mats Larsen"
+__copyright__ = "2020 [NTNU Gjøvik and SINTEF Manufacturing]"
+__credits__ = ["Mats Larsen", "Olga Ogorodnyk"]
+__license__ = "MIT"
+__maintainer__ = "Mats Larsen"
+__email__ = "Mats.Larsen@sintef.no"
+__status__ = "Development"
+__date__ = "30032020"
+__version__ = "1.0"
+#--------------------------------------------------------------------
+#IMPORT
+#--------------------------------------------------------------------
+import threading
+#--------------------------------------------------------------------
+#CONSTANTS
+#--------------------------------------------------------------------
+LATENCY_BUDGET = 0.05       # Default time budget of a sub-request in seconds
+MIN_CHUNK = 16              # Min number of uris in a sub-request
+MAX_CHUNK = 1024            # Max number of uris in a sub-request
+MAX_RESPONSE = 1024*1024    # Max size of a response in bytes
+SMOOTHING = 0.2             # Weight of a new measurement
+#--------------------------------------------------------------------
+# CLASSES
+#--------------------------------------------------------------------
+class AdaptiveChunker():
+    '''
+    Chunk size of value requests adapted to measured latency and payload.
+    '''
+    def __init__(self,**kwargs):
+        '''
+        Instantiate the chunker.
+        Params:
+        - latency_budget    -> float : Time budget of a sub-request in seconds
+        - min_chunk         -> int   : Min number of uris in a sub-request
+        - max_chunk         -> int   : Max number of uris in a sub-request
+        - max_response      -> int   : Max size of a response in bytes
+        '''
+        # Arguments
+        self.__budget = kwargs.get('latency_budget',LATENCY_BUDGET)
+        self.__min = max(1,kwargs.get('min_chunk',MIN_CHUNK))
+        self.__max = max(self.__min,kwargs.get('max_chunk',MAX_CHUNK))
+        self.__max_response = kwargs.get('max_response',MAX_RESPONSE)
+
+        # Attributes
+        self.__time_per_uri = None      # Smoothed seconds per uri
+        self.__bytes_per_uri = None     # Smoothed response bytes per uri
+        self.__chunk = self.__min       # Start small until measured
+        self.__lock = threading.Lock()
+
+    def split(self,uris):
+        '''
+        Split the uris in chunks of the current chunk size.
+        Params:
+        - uris -> list<str> : The uris
+        Return:
+        - list<list<str>> : The chunks
+        '''
+        n = self.__chunk
+        return [uris[i:i+n] for i in range(0,len(uris),n)]
+
+    def update(self,n,elapsed,nbytes):
+        '''
+        Update the chunk size from a measured sub-request.
+        Params:
+        - n       -> int   : Number of uris in the sub-request
+        - elapsed -> float : Response time in seconds
+        - nbytes  -> int   : Size of the response in bytes
+        '''
+        if n <= 0:
+            return
+        with self.__lock:
+            self.__time_per_uri = self.__smooth(self.__time_per_uri,elapsed/n)
+            self.__bytes_per_uri = self.__smooth(self.__bytes_per_uri,nbytes/n)
+
+            size = self.__max
+            if self.__time_per_uri > 0:
+                size = min(size,self.__budget/self.__time_per_uri)
+            if self.__bytes_per_uri > 0:
+                size = min(size,self.__max_response/self.__bytes_per_uri)
+            self.__chunk = self.__power_of_two(int(size))
+
+    def __smooth(self,old,new):
+        '''
+        Exponential smoothing of a measurement.
+        '''
+        if old is None:
+            return new
+        return old + SMOOTHING*(new-old)
+
+    def __power_of_two(self,size):
+        '''
+        Round a size down to a power of two within the limits.
+        '''
+        size = max(self.__min,min(self.__max,size))
+        p = 1 << (size.bit_length()-1)
+        return max(self.__min,p)
+
+    @property
+    def chunk_size(self):
+        '''
+        '''
+        return self.__chunk
+
+    def info(self):
+        '''
+        Return the state of the chunker.
+        Return:
+        - Dict : chunk size, smoothed time and bytes per uri
+        '''
+        return {'chunk_size':self.__chunk,
+                'time_per_uri':self.__time_per_uri,
+                'bytes_per_uri':self.__bytes_per_uri,
+                'latency_budget':self.__budget}
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------
+# Module Description
+#--------------------------------------------------------------------
+"""
+Streaming decoder for the EMI presentation layer.
+Every data string from the CC300 control is ended with the character 0x19.
+The decoder reads from the socket into a fixed read buffer, appends the new
+bytes to a growable buffer and searches only the newly arrived bytes for the
+endtag. Bytes after an endtag are kept for the next frame, so several frames
+arriving in one read are not lost.
+
+Methods for FrameDecoder
+feed(data)          -> Add received bytes and split out complete frames
+read_frame(sock)    -> Returning the next complete frame, reading the socket if needed
+next_frame()        -> Returning the next complete frame if buffered, otherwise None
+has_frame()         -> Returning True if a complete frame is buffered
+pending()           -> Returning the number of buffered bytes not yet part of a frame
+first_read          -> Monotonic time of the first read of the last read_frame
+reset()             -> Clear all buffered data
+"""
+#--------------------------------------------------------------------
+# Administration Details
+#--------------------------------------------------------------------
+__author__ = "Mats Larsen"
+__copyright__ = "2020 [NTNU Gjøvik and SINTEF Manufacturing]"
+__credits__ = ["Mats Larsen", "Olga Ogorodnyk"]
+__license__ = "MIT"
+__maintainer__ = "Mats Larsen"
+__email__ = "Mats.Larsen@sintef.no"
+__status__ = "Development"
+__date__ = "30032020"
+__version__ = "1.0"
+#--------------------------------------------------------------------
+#IMPORT
+#--------------------------------------------------------------------
+import time
+import collections
+#--------------------------------------------------------------------
+#CONSTANTS
+#--------------------------------------------------------------------
+ENDTAG = bytes.fromhex('19')    # Endtag of every EMI data string
+READ_SIZE = 65536               # Default size of a socket read in bytes
+#--------------------------------------------------------------------
+# CLASSES
+#--------------------------------------------------------------------
+class FrameDecoder():
+    '''
+    Incremental decoder of 0x19 terminated frames.
+    '''
+    def __init__(self,endtag=ENDTAG,read_size=READ_SIZE):
+        '''
+        Instantiate the decoder.
+        Params:
+        - endtag    -> bytes    : The byte ending every frame
+        - read_size -> int      : Size of each socket read in bytes
+        '''
+        # Arguments
+        self.__endtag = endtag
+        self.__read_size = read_size
+
+        # Attributes
+        self.__buffer = bytearray()                 # Bytes not yet part of a frame
+        self.__frames = collections.deque()         # Complete frames without endtag
+        self.__chunk = bytearray(read_size)         # Fixed buffer for socket reads
+        self.__chunk_view = memoryview(self.__chunk)
+        self.__first_read = None                    # Time of the first read for the last frame
+
+    def feed(self,data):
+        '''
+        Add received bytes and split out complete frames.
+        Params:
+        - data -> bytes-like : Bytes received from the machine
+        Return:
+        - int : Number of complete frames buffered
+        '''
+        # Only the new bytes have to be searched for the endtag
+        start = len(self.__buffer)
+        self.__buffer += data
+        i = self.__buffer.find(self.__endtag,start)
+        if i < 0:
+            return len(self.__frames)
+
+        begin = 0
+        while i >= 0:
+            self.__frames.append(bytes(self.__buffer[begin:i]))
+            begin = i + 1
+            i = self.__buffer.find(self.__endtag,begin)
+        # Keep the leftover for the next frame
+        del self.__buffer[:begin]
+        return len(self.__frames)
+
+    def read_frame(self,sock):
+        '''
+        Return the next complete frame, reading from the socket until one is present.
+        Params:
+        - sock -> socket : Connected socket to the machine
+        Return:
+        - bytes : The frame without the endtag
+        '''
+        first = None
+        while not self.__frames:
+            n = sock.recv_into(self.__chunk_view,self.__read_size)
+            if n == 0:
+                raise ConnectionError('Connection closed by the machine')
+            if first is None:
+                first = time.monotonic()
+            self.feed(self.__chunk_view[:n])
+        self.__first_read = first
+        return self.__frames.popleft()
+
+    def next_frame(self):
+        '''
+        Return the next complete frame without reading.
+        Return:
+        - bytes : The frame without the endtag, None if no frame is buffered
+        '''
+        if self.__frames:
+            return self.__frames.popleft()
+        return None
+
+    def has_frame(self):
+        '''
+        Check if a complete frame is buffered.
+        Return:
+        - Bool : True if a frame can be returned without reading
+        '''
+        return len(self.__frames) > 0
+
+    def pending(self):
+        '''
+        Return the number of buffered bytes that are not yet part of a frame.
+        '''
+        return len(self.__buffer)
+
+    def reset(self):
+        '''
+        Clear all buffered data, e.g. after a new connection.
+        '''
+        self.__buffer = bytearray()
+        self.__frames.clear()
+
+    @property
+    def first_read(self):
+        '''
+        Monotonic time of the first socket read of the last read_frame, None if
+        the frame was already buffered.
+        '''
+        return self.__first_read
+
+    @property
+    def read_size(self):
+        '''
+        '''
+        return self.__read_size
@@ -30,14 +30,23 @@ Types of request:
 
 Methods for EMI interface
 connect()                           -> Connecting the machine based on the params
-info_log()                          -> Returning the infolog from the machine
+info_log(min_index)                 -> Returning the infolog from the machine, only new messages by default
+keep_alive(param_uri)               -> Keep the session alive with the cheapest request
 login()                             -> Login into the machine based on the user data
 logout()                            -> Login out of the machine
 set_param_value(param_uri, value)   -> Setting parameter value based on a uri
+set_param_values(values,verify)     -> Setting several values with one send and verifying them with one read
 get_param_value(param_uri)          -> Returning the value of the parameter based on uri
+submit_param_value(param_uri)       -> Returning a future of get_param_value, only in pipelined mode
+get_param_types(param_uri)          -> Returning type, unit and dtype of the parameters in typed mode
+refresh_metadata(param_uri)         -> Request details and descriptions missing in the metadata cache
+get_chunking_info()                 -> Returning the state of the adaptive chunking
+get_request_stats()                 -> Returning counts and latency histograms per request type
+reset_request_stats()               -> Remove the recorded latencies
 get_param_details(param_uri)        -> Returning details about a parameter based on uri
 get_parameter_text(param_uri)       -> Returning the parameters description
 get_process_dataset(min_r,max_r)    -> Returning the dataset of uris
+invalidate_request_cache(param_uri) -> Removing serialized requests from the cache
 """
 #--------------------------------------------------------------------
 # Administration Details
@@ -60,12 +69,27 @@ import time
 import threading
 import datetime
 import copy
+import itertools
+import collections
+import concurrent.futures
+from .emi_frame_decoder import FrameDecoder, READ_SIZE
+from .emi_parser import parse_frame, parse_param_values, response_id, next_message_index, check_response
+from .emi_requests import RequestCache, CACHE_SIZE
+from .emi_requests import param_values_request, set_value_request, with_request_id, PARAM_VALUES_HEAD
+from .emi_requests import request_type
+from .emi_requests import param_details_request, parameter_phrase_request
+from .emi_requests import login_request, logout_request, messages_request, record_data_request
+from .value_types import ParameterTypes, same_value
+from .metadata_cache import MetadataCache, METADATA_TTL
+from .emi_chunking import AdaptiveChunker
+from .emi_stats import RequestStats
 #--------------------------------------------------------------------
 #CONSTANTS
 #--------------------------------------------------------------------
 # URI for date and time
 URI_DATE = 'cc300://imm/cm#//c.PDP/p.sv_dPDPDate/v'
 URI_TIME = 'cc300://imm/cm#//c.PDP/p.sv_dPDPTime/v'
+READER_JOIN_TIME = 1.0  # Max time in seconds to wait for the reader thread at close
 #--------------------------------------------------------------------
 # CLASSES
 #--------------------------------------------------------------------
@@ -83,6 +107,19 @@ class EMI_Interface():
         - username          -> str              : Login for user
         - passw             -> str              : Password to the username
         - debug             -> Boolean          : Debug value
+        - read_size         -> int              : Size of each socket read in bytes
+        - cache_size        -> int              : Number of cached serialized requests, 0 disables the cache
+        - pipelined         -> Boolean          : Several requests in flight, responses are dispatched by a reader thread
+        - typed             -> Boolean          : Decode the values to int/float/bool from the parameter details
+        - metadata_path     -> str              : Path to the persistent cache of details and descriptions
+        - metadata_ttl      -> float            : Time to live of the cached metadata in seconds
+        - machine_id        -> str              : Identity of the machine in the metadata cache
+        - chunking          -> Boolean          : Split large value requests in sub-requests of adaptive size
+        - latency_budget    -> float            : Time budget of a sub-request in seconds
+        - min_chunk         -> int              : Min number of uris in a sub-request
+        - max_chunk         -> int              : Max number of uris in a sub-request
+        - stats             -> Boolean          : Record latency histograms of every request phase
+        - keepalive_uri     -> str              : Uri read by keep_alive, None requests new messages
         '''
         #Arguments
         self.__kwargs = kwargs
@@ -92,6 +129,11 @@ class EMI_Interface():
         self.__username = kwargs.get('username',None)
         self.__passw = kwargs.get('passw',None)
         self.__debug = kwargs.get('debug',False)
+        self.__read_size = kwargs.get('read_size',READ_SIZE)
+        self.__cache_size = kwargs.get('cache_size',CACHE_SIZE)
+        self.__pipelined = kwargs.get('pipelined',False)
+        self.__typed = kwargs.get('typed',False)
+        self.__keepalive_uri = kwargs.get('keepalive_uri',None)
 
         if self.__debug:
             print('{} created with these params: ip: {},port: {}, debug: {}'.format(__class__,self.__ip,self.__port,self.__debug))
@@ -101,19 +143,57 @@ class EMI_Interface():
         self.__my_client_id = '1'                   # client id
         self.__host_error_odd = 'enHostErrorOff'    # Setting
         self.__isoabs = 'iso_abs'                   # Setting
+        self.__message_index = 0                    # Index after the last seen message
         # Connection ref
         self.__c = None
+        # Decoder of the 0x19 terminated responses
+        self.__decoder = FrameDecoder(endtag=self.__endtag,read_size=self.__read_size)
+        # Cache of serialized requests
+        self.__requests = RequestCache(maxsize=self.__cache_size,endtag=self.__endtag)
         #Event for socket lock. Only one can send data
         self.__socket_event = threading.Lock()
+        # Pipelined mode, requests waiting for a response. Requests with an id by
+        # id, and requests without an id in the order they were sent
+        self.__pending = collections.OrderedDict()
+        self.__pending_plain = collections.deque()
+        self.__pending_lock = threading.Lock()
+        self.__connection_lost = False      # Set when the reader thread has stopped
+        self.__request_ids = itertools.count(1)
+        self.__local = threading.local()    # Response of the last request of the calling thread
+        self.__reader = None
+        # Types of the parameters from the details, fetched once per uri
+        self.__types = ParameterTypes(self.get_param_details)
+        # Latency of the request phases
+        self.__stats = RequestStats() if kwargs.get('stats',False) else None
+        # Split of large value requests
+        self.__chunker = AdaptiveChunker(**kwargs) if kwargs.get('chunking',False) else None
+        # Persistent cache of details and descriptions
+        self.__metadata = None
+        if kwargs.get('metadata_path') is not None:
+            machine = kwargs.get('machine_id','{}@{}:{}'.format(self.__name,self.__ip,self.__port))
+            self.__metadata = MetadataCache(kwargs['metadata_path'],machine,
+                                            ttl=kwargs.get('metadata_ttl',METADATA_TTL))
+            n = self.__metadata.load()
+            if self.__debug: print('Loaded metadata of {} parameters for {}'.format(n,machine))
 
     def close(self):
         '''
         Close the connection to the machine
         '''
         self.__socket_event.acquire()
+        if self.__pipelined:
+            # Wake up the reader thread
+            try:
+                self.__c.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
         self.__c.close()
         self.__c = None
         self.__socket_event.release()
+        # The reader fails the waiting requests before a new connection is made
+        if self.__reader is not None:
+            self.__reader.join(READER_JOIN_TIME)
+            self.__reader = None
 
     def connect(self):
         '''
@@ -127,6 +207,13 @@ class EMI_Interface():
         try:
             self.__c = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.__c.connect((self.__ip, self.__port))
+            self.__decoder.reset()
+            if self.__pipelined:
+                with self.__pending_lock:
+                    self.__connection_lost = False
+                self.__reader = threading.Thread(target=self.__read_responses,args=(self.__c,))
+                self.__reader.daemon = True
+                self.__reader.start()
             if self.__debug: print('Etablish connection to {}:{}'.format(self.__ip,self.__port))
         except:
             print('Etablish connection to {}:{} failed !!'.format(self.__ip,self.__port))
@@ -135,22 +222,39 @@ class EMI_Interface():
 
         return err
 
-    def info_log(self):
+    def info_log(self,min_index=None):
         '''
-        Request for the infolog and write it to file
+        Request for the infolog. The index after the last message is kept, so
+        the next call only returns new messages.
         Params:
+        - min_index -> int : Index of the first message, None continues after the last seen message
         Return:
-        - r ->
+        - r -> Element : The messages response
         '''
         if self.__debug: print('Perform info')
-        root = ET.Element("getMessagesRequest")
-        root.set('language','en')
-        root.set('minMessageIndex','0')
-
-        self.__send_string(ET.tostring(root))
+        if min_index is None:
+            min_index = self.__message_index
+        self.__send_string(messages_request('en',min_index))
         r = self.__recv_string()
+        self.__message_index = next_message_index(r,min_index)
         return r
 
+    def keep_alive(self,param_uri=None):
+        '''
+        Keep the session alive with the cheapest request. That is a cached
+        value request for a single uri, or a request for the new messages if
+        no uri is given.
+        Params:
+        - param_uri -> str : Uri to read, None uses keepalive_uri
+        Return:
+        '''
+        if param_uri is None:
+            param_uri = self.__keepalive_uri
+        if param_uri is None:
+            self.info_log()
+        else:
+            self.get_param_value([param_uri])
+
     def login(self):
         '''
         Login to the machine
@@ -158,16 +262,14 @@ class EMI_Interface():
         Return:
         '''
         # Create the login request
-        root = ET.Element("loginRequest")
-        root.set('username',self.__username)
-        root.set('password',self.__passw)
+        msg = login_request(self.__username,self.__passw)
 
         login = False
         # Continue until login success
         if self.__debug: print('Trying to login')
         while not login:
         # Send the login request
-            self.__send_string(ET.tostring(root))
+            self.__send_string(msg)
             login =  self.__handle_login()
             time.sleep(1)
 
@@ -195,8 +297,7 @@ class EMI_Interface():
         '''
         if self.__c != None:
             # Create msg
-            root = ET.Element("logoutRequest")
-            self.__send_string(ET.tostring(root))
+            self.__send_string(logout_request())
             root = self.__recv_string()
             time.sleep(0.1)
             if self.__debug: print('Login Out')
@@ -212,18 +313,132 @@ class EMI_Interface():
         - value     -> str :
         Return:
         '''
-        # Create the request
-        root = ET.Element("setParameterValueRequest")
-        root.set('unitSystem',self.__isoabs)
-        root.set('uri',param_uri)
-        root.set('parameterValue', str(value))
+        # Create the request, set requests are not cached as every value is a new request
+        value = str(value)
+        msg = set_value_request(param_uri,value,self.__isoabs) + self.__endtag
 
         # Send the request
-        self.__send_string(ET.tostring(root))
+        self.__send_bytes(msg)
 
         # Get the response
         r = self.__recv_string()
 
+    def set_param_values(self,values,verify=True):
+        '''
+        Set the values of several parameters. All requests are sent at once and
+        the responses are read after, and the values are verified with one read.
+        Params:
+        - values -> Dict    : uri -> value
+        - verify -> Boolean : Read the values back and compare them to the set values
+        Return:
+        - Dict : ok -> uri -> Boolean, values -> uri -> value read back,
+                 latency -> seconds of write, verify and total
+        '''
+        start = time.monotonic()
+        uris = list(values.keys())
+        msgs = []
+        for uri in uris:
+            msgs.append(set_value_request(uri,str(values[uri]),self.__isoabs) + self.__endtag)
+        ok = {}
+        for uri,r in zip(uris,self.__send_batch(msgs)):
+            root = parse_frame(r)
+            ok[uri] = root is not None and root.tag == 'setParameterValueResponse'
+            if not ok[uri]: print('Setting {} to {} failed : {}'.format(uri,values[uri],r))
+        write = time.monotonic()
+
+        read = {}
+        if verify and uris:
+            read = self.get_param_value(uris)
+            for uri in uris:
+                ok[uri] = ok[uri] and same_value(read.get(uri),values[uri])
+        end = time.monotonic()
+        return {'ok':ok,
+                'values':{uri:read.get(uri) for uri in uris} if verify else {},
+                'latency':{'write':write-start,'verify':end-write,'total':end-start}}
+
+    def __send_batch(self,msgs):
+        '''
+        Send several requests at once and return the responses in the same order.
+        Params:
+        - msgs -> list<bytes> : The requests with endtag
+        Return:
+        - list<bytes> : The responses without endtag
+        '''
+        if not msgs:
+            return []
+        if self.__pipelined:
+            return self.__send_batch_pipelined(msgs)
+
+        if self.__stats is not None: t = time.monotonic()
+        # One lock, send and read for all requests
+        with self.__socket_event:
+            if self.__stats is not None:
+                # The batch is recorded as one request of its own kind
+                now = time.monotonic()
+                kind = '{} batch'.format(request_type(msgs[0]))
+                self.__stats.record(kind,'lock_wait',now-t)
+                self.__local.request = [kind,now]
+                t = now
+            if self.__debug: print('Msgs send to the machine : {}'.format(msgs))
+            failure = None
+            try:
+                self.__c.sendall(b''.join(msgs))
+                if self.__stats is not None: self.__record_send(t)
+                frames = [self.__decoder.read_frame(self.__c) for msg in msgs]
+            except Exception as err:
+                # Responses of the batch may be left in the socket, start a new connection
+                print('Batch of {} requests failed, reconnecting : {}'.format(len(msgs),err))
+                self.__reopen()
+                failure = err
+            else:
+                if self.__stats is not None:
+                    self.__record_receive(self.__local.request,self.__decoder.first_read,time.monotonic())
+        if failure is not None:
+            # A new session, after the socket is free again
+            if self.__c is not None:
+                self.login()
+            raise failure
+        if self.__debug: print('Recv msgs from the machine : {}'.format(frames))
+        return frames
+
+    def __send_batch_pipelined(self,msgs):
+        '''
+        Send several requests in pipelined mode, recorded as one batch as in the
+        other mode.
+        '''
+        if self.__stats is None:
+            futures = [self.__send_pipelined(msg) for msg in msgs]
+            return [f.result() for f in futures]
+        kind = '{} batch'.format(request_type(msgs[0]))
+        t = time.monotonic()
+        futures = [self.__send_pipelined(msg,record=False) for msg in msgs]
+        sent = time.monotonic()
+        self.__stats.record(kind,'send',sent-t)
+        frames = []
+        first = None
+        for f in futures:
+            frames.append(f.result())
+            if first is None: first = time.monotonic()
+        self.__record_receive([kind,sent],first,time.monotonic())
+        return frames
+
+    def __reopen(self):
+        '''
+        Close the socket and connect a new one, the socket lock is held. The
+        connection is None if the machine can not be reached.
+        '''
+        try:
+            self.__c.close()
+        except OSError:
+            pass
+        self.__decoder.reset()
+        try:
+            self.__c = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.__c.connect((self.__ip, self.__port))
+        except OSError:
+            print('Etablish connection to {}:{} failed !!'.format(self.__ip,self.__port))
+            self.__c = None
+
     def get_param_value(self,param_uri):
         '''
         Get value to a parameter given in argument
@@ -234,66 +449,247 @@ class EMI_Interface():
         '''
         if self.__debug:print('Performing get_param_value with these parameters: {}'.format(param_uri))
         # Create request
-        root = ET.Element("getParameterValuesRequest")
-        root.set('id',self.__my_client_id)
-        parameters = ET.SubElement(root, 'parameters')
         param = copy.copy(param_uri)
         if not isinstance(param,list):
             param = [param]
-
-        for i in param:
-            parameter = ET.SubElement(parameters, 'parameter')
-            parameter.set('uri',i)
+        if self.__typed:
+            self.__types.prepare(param)
+        if self.__chunker is not None and len(param) > self.__chunker.chunk_size:
+            return self.__get_param_value_chunked(param)
+        msg = self.__requests.get(('values',tuple(param)),
+                                  lambda: param_values_request(param,self.__my_client_id))
 
         # Send reqeust
         s = datetime.datetime.now()
-        self.__send_string(ET.tostring(root))
-        # recv response
-        p = self.__handle_get_param_value(s)
+        if self.__chunker is not None:
+            # Measure also the unchunked requests, so the chunk can shrink again
+            start = time.monotonic()
+            self.__send_bytes(msg)
+            r = self.__recv_frame()
+            self.__chunker.update(len(param),time.monotonic()-start,len(r))
+            p = self.__values_from_frame(r,s,datetime.datetime.now())
+        else:
+            self.__send_bytes(msg)
+            # recv response
+            p = self.__handle_get_param_value(s)
         if p is None:
-            e = {}
-            e['timestamp_{}'.format(self.__name)] = None
-            for i in param:
-                e[i] = None
-            return e
+            return self.__empty_values(param)
         return p
 
+    def __get_param_value_chunked(self,param):
+        '''
+        Get the values in sub-requests and merge them with one timestamp.
+        Params:
+        - param -> list<str> : The uris
+        Return:
+        -> Dict : With results
+        '''
+        key = 'timestamp_{}'.format(self.__name)
+        values = {}
+        valid = True
+        s = datetime.datetime.now()
+        for chunk in self.__chunker.split(param):
+            msg = self.__requests.get(('values',tuple(chunk)),
+                                      lambda: param_values_request(chunk,self.__my_client_id))
+            start = time.monotonic()
+            self.__send_bytes(msg)
+            r = self.__recv_frame()
+            self.__chunker.update(len(chunk),time.monotonic()-start,len(r))
+
+            p = self.__values_from_frame(r,s,s)
+            if not p or p.get(key) is None:
+                valid = False
+                p = self.__empty_values(chunk)
+            values.update(p)
+        e = datetime.datetime.now()
+        timestamp = s + (e-s)/2.0
+        values[key] = timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3] if valid else None
+        return values
+
+    def get_request_stats(self):
+        '''
+        Return counts and latency histograms per request type and phase.
+        Return:
+        - Dict : kind -> {'count', 'phases': phase -> histogram}, None if stats is disabled
+        '''
+        if self.__stats is None:
+            return None
+        return self.__stats.snapshot()
+
+    def reset_request_stats(self):
+        '''
+        Remove the recorded latencies.
+        '''
+        if self.__stats is not None:
+            self.__stats.reset()
+
+    def get_chunking_info(self):
+        '''
+        Return the state of the adaptive chunking, None if chunking is disabled.
+        '''
+        if self.__chunker is None:
+            return None
+        return self.__chunker.info()
+
+    def submit_param_value(self,param_uri):
+        '''
+        Send a request for the values without waiting for the response. Only
+        available in pipelined mode.
+        Params:
+        - param_uri -> [str] or str :
+        Return:
+        -> Future : Resolves to the same dict as get_param_value
+        '''
+        if not self.__pipelined:
+            raise RuntimeError('submit_param_value requires pipelined=True')
+        param = copy.copy(param_uri)
+        if not isinstance(param,list):
+            param = [param]
+        msg = self.__requests.get(('values',tuple(param)),
+                                  lambda: param_values_request(param,self.__my_client_id))
+        if self.__typed:
+            self.__types.prepare(param)
+
+        s = datetime.datetime.now()
+        f = self.__send_bytes(msg)
+        result = concurrent.futures.Future()
+
+        def done(f):
+            e = datetime.datetime.now()
+            if f.exception() is not None:
+                result.set_exception(f.exception())
+                return
+            p = self.__values_from_frame(f.result(),s,e)
+            result.set_result(self.__empty_values(param) if p is None else p)
+
+        f.add_done_callback(done)
+        return result
+
+    def __empty_values(self,param):
+        '''
+        Return the result of a failed request for the values.
+        '''
+        e = {}
+        e['timestamp_{}'.format(self.__name)] = None
+        for i in param:
+            e[i] = None
+        return e
 
     def get_param_details(self,param_uri):
         '''
-        Request of detailed parameter properties.
+        Request of detailed parameter properties. Cached details are returned
+        without a request.
         Params:
         - param_uri -> [str] or str :
         Return:
         '''
+        if self.__metadata is not None:
+            d = self.__metadata.get_details(param_uri)
+            if d is not None:
+                return d
+        return self.__fetch_param_details(param_uri)
+
+    def __fetch_param_details(self,param_uri):
+        '''
+        Request the details from the machine and cache them. A failed request
+        returns None and is not cached.
+        '''
         # Create request
-        root = ET.Element("getParameterDetailsRequest")
-        root.set('uri', param_uri)
+        msg = self.__requests.get(('details',param_uri),
+                                  lambda: param_details_request(param_uri))
         # Send reqeust
-        self.__send_string(ET.tostring(root))
-        return self.__handle_get_param_details()
+        self.__send_bytes(msg)
+        d = self.__handle_get_param_details()
+        if d is not None and self.__metadata is not None:
+            self.__metadata.set_details(param_uri,d)
+        return d
 
     def get_parameter_text(self,param_uri):
         '''
-        Get description of the parameter
+        Get description of the parameter. A cached description is returned
+        without a request.
+        '''
+        if self.__metadata is not None:
+            t = self.__metadata.get_text(param_uri)
+            if t is not None:
+                return t.encode('UTF-8')
+        return self.__fetch_parameter_text(param_uri)
+
+    def __fetch_parameter_text(self,param_uri):
+        '''
+        Request the description from the machine and cache it. A failed request
+        returns None and is not cached.
         '''
-        root = ET.Element("getParameterPhraseRequest")
-        root.set('unitSystem', self.__isoabs)
-        root.set('uri', param_uri)
-        root.set('language', 'en')
+        msg = self.__requests.get(('phrase',param_uri),
+                                  lambda: parameter_phrase_request(param_uri,self.__isoabs,'en'))
         # Send reqeust
-        self.__send_string(ET.tostring(root))
-        return self.__handle_get_param_text()
+        self.__send_bytes(msg)
+        t = self.__handle_get_param_text()
+        if t is not None and self.__metadata is not None:
+            self.__metadata.set_text(param_uri,t.decode('UTF-8'))
+        return t
+
+    def refresh_metadata(self,param_uri,force=False):
+        '''
+        Request details and descriptions that are missing or expired in the
+        metadata cache, and save the cache.
+        Params:
+        - param_uri -> [str] or str : The parameters
+        - force     -> Boolean      : Request all the parameters
+        Return:
+        - int : Number of refreshed parameters
+        '''
+        if self.__metadata is None:
+            return 0
+        if not isinstance(param_uri,list):
+            param_uri = [param_uri]
+        uris = param_uri if force else self.__metadata.stale(param_uri)
+        for i in uris:
+            try:
+                self.__fetch_param_details(i)
+                self.__fetch_parameter_text(i)
+            except Exception as err:
+                print('Metadata of {} could not be refreshed : {}'.format(i,err))
+        self.__metadata.save()
+        return len(uris)
+
+    def get_param_types(self,param_uri=None):
+        '''
+        Return the types of the parameters, fetching the details that are not cached.
+        Params:
+        - param_uri -> [str] or str : The parameters, None returns all cached parameters
+        Return:
+        - Dict : uri -> {'type','unit','dtype'}
+        '''
+        if param_uri is None:
+            return self.__types.info()
+        if not isinstance(param_uri,list):
+            param_uri = [param_uri]
+        self.__types.prepare(param_uri)
+        return self.__types.info(param_uri)
+
+    def invalidate_request_cache(self,param_uri=None):
+        '''
+        Remove serialized requests from the cache.
+        Params:
+        - param_uri -> [str] or str : Remove the requests for these uris, None removes all requests
+        Return:
+        '''
+        if param_uri is None:
+            self.__requests.invalidate()
+        elif isinstance(param_uri,list):
+            self.__requests.invalidate(('values',tuple(param_uri)))
+        else:
+            self.__requests.invalidate(('values',(param_uri,)))
+            self.__requests.invalidate(('details',param_uri))
+            self.__requests.invalidate(('phrase',param_uri))
 
     def get_process_dataset(self,min_r,max_r):
         '''
         Get the process dataset on the machine
         '''
-        root = ET.Element("getRecordDataRequest")
-        root.set('minRecordNumber', min_r)
-        root.set('maxRecordNumber', max_r)
         # Create request
-        self.__send_string(ET.tostring(root))
+        self.__send_string(record_data_request(min_r,max_r))
         return self.__handle_process_dataset()
 
     def __handle_process_dataset(self):
@@ -305,26 +701,59 @@ class EMI_Interface():
 
     def __handle_get_param_text(self):
         '''
+        Handler of the method get_parameter_text, None if the request failed
         '''
-        r = self.__recv_string()
-        return ET.tostring(r)
+        r = check_response(self.__recv_string(),'getParameterPhraseResponse')
+        return ET.tostring(r) if r is not None else None
 
     def __handle_get_param_details(self):
         '''
-        Handler of the method get_param_details
+        Handler of the method get_param_details, None if the request failed
         '''
-        r = self.__recv_string()
-        return r.attrib
+        r = check_response(self.__recv_string(),'getParameterDetailsResponse')
+        return r.attrib if r is not None else None
 
     def __handle_get_param_value(self,s):
         '''
         Handle the get parameter response
         '''
         # Get recv msg
-        r = self.__recv_string()
+        r = self.__recv_frame()
         e = datetime.datetime.now()
+        return self.__values_from_frame(r,s,e)
+
+    def __values_from_frame(self,r,s,e):
+        '''
+        Return the values of a getParameterValuesResponse.
+        Params:
+        - r -> bytes    : The response
+        - s -> datetime : Time the request was sent
+        - e -> datetime : Time the response was received
+        '''
+        if self.__stats is None:
+            return self.__parse_values(r,s,e)
+        start = time.monotonic()
+        values = self.__parse_values(r,s,e)
+        self.__stats.record('getParameterValuesRequest','parse',time.monotonic()-start)
+        return values
+
+    def __parse_values(self,r,s,e):
+        '''
+        Parse the values of a getParameterValuesResponse.
+        '''
         timestamp = s + (e-s)/2.0
         t= timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+
+        # Fast path, scan the attributes directly on the frame
+        values = parse_param_values(r)
+        if values is not None:
+            if self.__typed:
+                self.__types.decode(values)
+            values['timestamp_{}'.format(self.__name)] = t
+            return values
+
+        # Other response, fall back to the tree
+        r = parse_frame(r)
         if r is None: return None
         values = {}
 
@@ -333,6 +762,8 @@ class EMI_Interface():
             param = r.findall('./parameters/parameter')
             for i in param:
                 values[i.get('uri')] = i.get('parameterValue')
+            if self.__typed:
+                self.__types.decode(values)
             values['timestamp_{}'.format(self.__name)] = t
 
             #del values[URI_DATE]
@@ -349,40 +780,189 @@ class EMI_Interface():
         - string -> str : The request we want to send
         Return:
         '''
+        # Add the endtag to the request
+        self.__send_bytes(string + self.__endtag)
+
+    def __send_bytes(self,msg):
+        '''
+        Send a request that already ends with the endtag.
+        Params:
+        - msg -> bytes : The request we want to send
+        Return:
+        - Future : The response, only in pipelined mode
+        '''
+        if self.__pipelined:
+            return self.__send_pipelined(msg)
+
+        if self.__stats is not None: t = time.monotonic()
         #Wait till the socket is free
         self.__socket_event.acquire()
-        # Add the endtag to the request
-        msg = string + self.__endtag
+        if self.__stats is not None: t = self.__record_lock(msg,t)
 
         if self.__debug: print('Msg send to the machine : {}'.format(msg))
         # Send the request
-        self.__c.send(msg)
+        try:
+            self.__c.sendall(msg)
+        except:
+            self.__socket_event.release()
+            raise
+        if self.__stats is not None: self.__record_send(t)
 
-    def __recv_string(self):
+    def __record_lock(self,msg,t):
         '''
-        Return the response from the machine.
-        Params:
+        Record the lock wait of a request started at t.
         Return:
+        - float : Time the lock was taken
         '''
-        r = b""
-        # Wait the endtag is present
-        while not r.endswith(self.__endtag):
-            r += self.__c.recv(1024)
+        now = time.monotonic()
+        kind = request_type(msg)
+        self.__stats.record(kind,'lock_wait',now-t)
+        self.__local.request = [kind,now]
+        return now
 
-        # Decode reponse to tree.xml
-        r = r[:-1].decode("UTF-8")
-        r = "<" + r.split("<", 1)[-1]
-        if self.__debug: print('Recv msg from the machine : {}'.format(r))
+    def __record_send(self,t):
+        '''
+        Record the send of the request of this thread, the lock was taken at t.
+        '''
+        now = time.monotonic()
+        self.__stats.record(self.__local.request[0],'send',now-t)
+        self.__local.request[1] = now
 
-        # Ensure a new thread can take the socket
-        self.__socket_event.release()
+    def __record_receive(self,request,first,end):
+        '''
+        Record first byte and full receive of a request.
+        Params:
+        - request -> [str,float] : Request type and time it was sent
+        - first   -> float       : Time of the first read, None if already buffered
+        - end     -> float       : Time the response was complete
+        '''
+        kind,sent = request
+        self.__stats.record(kind,'first_byte',(first if first is not None else end)-sent)
+        self.__stats.record(kind,'receive',end-sent)
 
-        if r is None: return None
+    def __send_pipelined(self,msg,record=True):
+        '''
+        Send a request without waiting for the response of the previous requests.
+        Params:
+        - msg    -> bytes   : The request we want to send
+        - record -> Boolean : Record the request in the stats, False when the caller records it
+        Return:
+        - Future : The response without the endtag
+        '''
+        f = concurrent.futures.Future()
+        f.request = None
+        record = record and self.__stats is not None
+        if record: t = time.monotonic()
+        with self.__socket_event:
+            if record:
+                t = self.__record_lock(msg,t)
+                f.request = self.__local.request
+            request_id = None
+            # Requests with an id get a unique id for the correlation
+            if msg.startswith(PARAM_VALUES_HEAD):
+                request_id = str(next(self.__request_ids))
+                msg = with_request_id(msg,request_id)
+            with self.__pending_lock:
+                if self.__connection_lost or self.__c is None:
+                    raise ConnectionError('Connection to the machine is closed')
+                if request_id is not None:
+                    self.__pending[request_id] = f
+                else:
+                    self.__pending_plain.append(f)
+
+            if self.__debug: print('Msg send to the machine : {}'.format(msg))
+            try:
+                self.__c.sendall(msg)
+            except Exception:
+                with self.__pending_lock:
+                    if request_id is not None:
+                        self.__pending.pop(request_id,None)
+                    elif f in self.__pending_plain:
+                        self.__pending_plain.remove(f)
+                raise
+            if record: self.__record_send(t)
+        self.__local.response = f
+        return f
+
+    def __read_responses(self,c):
+        '''
+        Reader thread in pipelined mode, dispatching the responses to the waiting requests.
+        Params:
+        - c -> socket : The connection to read
+        '''
+        err = ConnectionError('Connection closed by the machine')
         try:
-            root = ET.fromstring(r)
-            return root
-        except:
-            print('error',r )
+            while True:
+                r = self.__decoder.read_frame(c)
+                if self.__debug: print('Recv msg from the machine : {}'.format(r))
+                request_id = response_id(r)
+                with self.__pending_lock:
+                    if request_id is not None:
+                        f = self.__pending.pop(request_id,None)
+                    else:
+                        # Without an id the responses come in the order of the requests without id
+                        f = self.__pending_plain.popleft() if self.__pending_plain else None
+                if f is None:
+                    print('Response without a waiting request is dropped : {}'.format(r))
+                    continue
+                if f.request is not None:
+                    self.__record_receive(f.request,self.__decoder.first_read,time.monotonic())
+                f.set_result(r)
+        except OSError as e:
+            err = ConnectionError('Connection closed by the machine : {}'.format(e))
+        except Exception as e:
+            print('Reader of {} stopped : {}'.format(self.__name,e))
+            err = ConnectionError('Reader stopped : {}'.format(e))
+        finally:
+            # The connection is lost, fail all waiting requests and refuse new ones
+            with self.__pending_lock:
+                self.__connection_lost = True
+                pending = list(self.__pending.values()) + list(self.__pending_plain)
+                self.__pending.clear()
+                self.__pending_plain.clear()
+            for f in pending:
+                f.set_exception(err)
+
+    def __recv_frame(self):
+        '''
+        Return the raw response from the machine.
+        Params:
+        Return:
+        - bytes : The response without the endtag
+        '''
+        if self.__pipelined:
+            # Wait for the response of the last request sent by this thread
+            r = self.__local.response.result()
+            self.__local.response = None
+            return r
+
+        try:
+            # Wait the endtag is present
+            r = self.__decoder.read_frame(self.__c)
+            if self.__stats is not None:
+                self.__record_receive(self.__local.request,self.__decoder.first_read,time.monotonic())
+        finally:
+            # Ensure a new thread can take the socket
+            self.__socket_event.release()
+
+        if self.__debug: print('Recv msg from the machine : {}'.format(r))
+        return r
+
+    def __recv_string(self):
+        '''
+        Return the response from the machine.
+        Params:
+        Return:
+        - Element : Root of the response, None if the response is not valid
+        '''
+        r = self.__recv_frame()
+        if self.__stats is None:
+            # Decode reponse to tree.xml
+            return parse_frame(r)
+        start = time.monotonic()
+        root = parse_frame(r)
+        self.__stats.record(self.__local.request[0],'parse',time.monotonic()-start)
+        return root
 
     def __get_datetime(self,d,t):
         '''
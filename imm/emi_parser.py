@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------
+# Module Description
+#--------------------------------------------------------------------
+"""
+Parsers for the responses of the EMI interface.
+The getParameterValuesResponse is by far the most frequent response while
+logging, and only the uri and parameterValue attributes of each parameter
+element are used. It is therefore parsed without building an ElementTree.
+When every parameter element has the uri followed by the parameterValue, all
+pairs are found with one regular expression scan of the frame. Other layouts
+are parsed by scanning the attributes of each parameter element. All other
+responses are parsed with ElementTree.
+
+Methods for EMI parser
+parse_frame(frame)          -> Returning the root element of a frame
+parse_param_values(frame)   -> Returning uri->value pairs of a getParameterValuesResponse
+response_id(frame)          -> Returning the id attribute of the response
+check_response(root,tag)    -> Returning the root if it is the expected response, None otherwise
+next_message_index(root,i)  -> Returning the index after the last message of a messages response
+"""
+#--------------------------------------------------------------------
+# Administration Details
+#--------------------------------------------------------------------
+__author__ = "Mats Larsen"
+__copyright__ = "2020 [NTNU Gjøvik and SINTEF Manufacturing]"
+__credits__ = ["Mats Larsen", "Olga Ogorodnyk"]
+__license__ = "MIT"
+__maintainer__ = "Mats Larsen"
+__email__ = "Mats.Larsen@sintef.no"
+__status__ = "Development"
+__date__ = "30032020"
+__version__ = "1.0"
+#--------------------------------------------------------------------
+#IMPORT
+#--------------------------------------------------------------------
+import re
+import html
+import xml.etree.ElementTree as ET
+#--------------------------------------------------------------------
+#CONSTANTS
+#--------------------------------------------------------------------
+# Tag of the response handled by the fast path
+PARAM_VALUES_RESPONSE = b'<getParameterValuesResponse'
+# Parameter element with the uri followed by the parameterValue
+_PAIR = re.compile(rb'<parameter\s+uri="([^"]*)"\s+parameterValue="([^"]*)"')
+# Start tag of a parameter element, the attributes are in group 1
+_PARAMETER = re.compile(rb'<parameter\s([^>]*)>')
+# Attributes used from a parameter element
+_URI = re.compile(rb'(?:^|\s)uri\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+_VALUE = re.compile(rb'(?:^|\s)parameterValue\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+# Id attribute of the root element of a response
+_ID = re.compile(rb'\sid\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+#--------------------------------------------------------------------
+#METHODS
+#--------------------------------------------------------------------
+def parse_frame(frame):
+    '''
+    Parse a frame to an ElementTree element.
+    Params:
+    - frame -> bytes : The frame without endtag
+    Return:
+    - Element : Root of the response, None if the frame is not valid XML
+    '''
+    # Skip anything in front of the first tag
+    i = frame.find(b'<')
+    if i > 0:
+        frame = frame[i:]
+    try:
+        return ET.fromstring(frame)
+    except ET.ParseError:
+        print('error',frame)
+        return None
+
+def parse_param_values(frame):
+    '''
+    Parse a getParameterValuesResponse without building the tree.
+    Params:
+    - frame -> bytes : The frame without endtag
+    Return:
+    - Dict : uri->value pairs, None if the frame is another response
+    '''
+    start = frame.find(PARAM_VALUES_RESPONSE)
+    if start < 0:
+        return None
+
+    # Usual layout, one scan finds all pairs, only the uris and values are decoded
+    pairs = _PAIR.findall(frame,start)
+    if len(pairs) == frame.count(b'<parameter ',start):
+        if b'&' in frame:
+            return {html.unescape(k.decode('UTF-8')):html.unescape(v.decode('UTF-8')) for k,v in pairs}
+        return {k.decode('UTF-8'):v.decode('UTF-8') for k,v in pairs}
+
+    # Other layouts, scan the attributes of every element
+    values = {}
+    for m in _PARAMETER.finditer(frame,start):
+        attrib = m.group(1)
+        uri = _attribute(_URI,attrib)
+        if uri is not None:
+            values[uri] = _attribute(_VALUE,attrib)
+    return values
+
+def response_id(frame):
+    '''
+    Return the id attribute of the root element of a response.
+    Params:
+    - frame -> bytes : The frame without endtag
+    Return:
+    - str : The id, None if the response has no id
+    '''
+    # The root element is the first tag that is not a declaration
+    i = frame.find(b'<')
+    while i >= 0 and frame[i+1:i+2] in (b'?',b'!'):
+        i = frame.find(b'<',i+1)
+    if i < 0:
+        return None
+    j = frame.find(b'>',i)
+    if j < 0:
+        j = len(frame)
+    m = _ID.search(frame,i,j)
+    if m is None:
+        return None
+    v = m.group(1)
+    if v is None:
+        v = m.group(2)
+    return v.decode('UTF-8')
+
+def check_response(root,tag):
+    '''
+    Check that a response is the expected one, e.g. not an errorResponse.
+    Params:
+    - root -> Element : Root of the response, None if it could not be parsed
+    - tag  -> str     : The expected tag of the root
+    Return:
+    - Element : The root, None if it is another response
+    '''
+    if root is None:
+        return None
+    if root.tag != tag:
+        print('Expected {} but got {} : {}'.format(tag,root.tag,root.get('text','')))
+        return None
+    return root
+
+def next_message_index(root,index=0):
+    '''
+    Return the index after the last message of a getMessagesResponse.
+    Params:
+    - root  -> Element : The messages response
+    - index -> int     : The current index, returned if there are no newer messages
+    Return:
+    - int : The minMessageIndex of the next request
+    '''
+    if root is None:
+        return index
+    for m in root.iter('message'):
+        i = m.get('index',m.get('messageIndex'))
+        try:
+            index = max(index,int(i)+1)
+        except (TypeError,ValueError):
+            pass
+    return index
+
+def _attribute(pattern,attrib):
+    '''
+    Return the decoded value of an attribute, None if it is not present.
+    '''
+    m = pattern.search(attrib)
+    if m is None:
+        return None
+    v = m.group(1)
+    if v is None:
+        v = m.group(2)
+    v = v.decode('UTF-8')
+    if '&' in v:
+        v = html.unescape(v)
+    return v
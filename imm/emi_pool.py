@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------
+# Module Description
+#--------------------------------------------------------------------
+"""
+Pool of EMI sessions to the same machine.
+The session layer of the CC300 control is multi-client compatible, so several
+logged-in sessions can be opened to the same machine. The pool splits large
+get_param_value requests across the sessions and sends the parts concurrently,
+and merges the results with one timestamp. Control writes are sent on a
+separate session, so they do not wait for a long logging read.
+
+Methods for EMIConnectionPool
+connect()                           -> Connecting all sessions to the machine
+login()                             -> Login all sessions into the machine
+logout()                            -> Login out all sessions
+close()                             -> Close all sessions
+info_log(min_index)                 -> Returning the infolog from the machine, only new messages by default
+set_param_value(param_uri, value)   -> Setting parameter value on the control session
+get_param_value(param_uri)          -> Returning the values, split across the sessions
+get_param_details(param_uri)        -> Returning details about a parameter based on uri
+get_parameter_text(param_uri)       -> Returning the parameters description
+"""
+#--------------------------------------------------------------------
+# Administration Details
+#--------------------------------------------------------------------
+__author__ = "Mats Larsen"
+__copyright__ = "2020 [NTNU Gjøvik and SINTEF Manufacturing]"
+__credits__ = ["Mats Larsen", "Olga Ogorodnyk"]
+__license__ = "MIT"
+__maintainer__ = "Mats Larsen"
+__email__ = "Mats.Larsen@sintef.no"
+__status__ = "Development"
+__date__ = "30032020"
+__version__ = "1.0"
+#--------------------------------------------------------------------
+#IMPORT
+#--------------------------------------------------------------------
+import datetime
+import threading
+import concurrent.futures
+from .emi_interface import EMI_Interface
+#--------------------------------------------------------------------
+#CONSTANTS
+#--------------------------------------------------------------------
+SESSIONS = 2        # Default number of read sessions
+MIN_BATCH = 50      # Min number of uris sent on one session when splitting
+#--------------------------------------------------------------------
+# CLASSES
+#--------------------------------------------------------------------
+class EMIConnectionPool():
+    '''
+    Several EMI sessions to the same machine.
+    '''
+    def __init__(self,**kwargs):
+        '''
+        Instantiate the pool with params.
+        Params:
+        - sessions          -> int              : Number of sessions used for reads
+        - control_session   -> Boolean          : Open an extra session reserved for writes
+        - min_batch         -> int              : Min number of uris per session when splitting a read
+        The rest of the params are the same as for EMI_Interface.
+        '''
+        #Arguments
+        self.__name = kwargs.get('name','imm')
+        self.__n = max(1,kwargs.pop('sessions',SESSIONS))
+        self.__min_batch = max(1,kwargs.pop('min_batch',MIN_BATCH))
+        control = kwargs.pop('control_session',True)
+        self.__debug = kwargs.get('debug',False)
+
+        # Sessions
+        self.__sessions = [EMI_Interface(**kwargs) for i in range(self.__n)]
+        if control:
+            self.__control = EMI_Interface(**kwargs)
+        else:
+            self.__control = self.__sessions[0]
+
+        # Workers sending the parts of a read
+        self.__executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.__n)
+        # Round robin for reads that are not split
+        self.__next = 0
+        self.__next_lock = threading.Lock()
+
+    def __all(self):
+        '''
+        Return all sessions, the control session included.
+        '''
+        if self.__control in self.__sessions:
+            return list(self.__sessions)
+        return self.__sessions + [self.__control]
+
+    def connect(self):
+        '''
+        Establish all connections to the machine.
+        Return:
+        - err -> Bool : True if all connections are valid otherwise false
+        '''
+        err = True
+        for s in self.__all():
+            if s.connect() == False:
+                err = False
+        return err
+
+    def login(self):
+        '''
+        Login all sessions, each session is first logged out.
+        '''
+        for s in self.__all():
+            s.logout()
+            s.login()
+        if self.__debug: print('{} sessions logged in'.format(len(self.__all())))
+
+    def logout(self):
+        '''
+        Logout all sessions.
+        '''
+        for s in self.__all():
+            s.logout()
+
+    def close(self):
+        '''
+        Close all connections and stop the workers.
+        '''
+        for s in self.__all():
+            s.close()
+        self.__executor.shutdown(wait=False)
+
+    def info_log(self,min_index=None):
+        '''
+        Request for the infolog on the control session.
+        '''
+        return self.__control.info_log(min_index)
+
+    def set_param_value(self,param_uri,value):
+        '''
+        Set value to a parameter on the control session.
+        Params:
+        - param_uri -> str :
+        - value     -> str :
+        '''
+        return self.__control.set_param_value(param_uri,value)
+
+    def get_param_details(self,param_uri):
+        '''
+        Request of detailed parameter properties on the control session.
+        '''
+        return self.__control.get_param_details(param_uri)
+
+    def get_parameter_text(self,param_uri):
+        '''
+        Get description of the parameter on the control session.
+        '''
+        return self.__control.get_parameter_text(param_uri)
+
+    def __next_session(self):
+        '''
+        Return the next read session in round robin.
+        '''
+        with self.__next_lock:
+            s = self.__sessions[self.__next]
+            self.__next = (self.__next + 1) % self.__n
+        return s
+
+    def get_param_value(self,param_uri):
+        '''
+        Get the values of the parameters, split across the read sessions.
+        Params:
+        - param_uri -> [str] or str :
+        Return:
+        -> Dict : With results and one timestamp, "" as for EMI_Interface if a part has no values
+        '''
+        param = param_uri
+        if not isinstance(param,list):
+            param = [param]
+
+        # Number of parts
+        n = min(self.__n,len(param)//self.__min_batch)
+        if n <= 1:
+            return self.__next_session().get_param_value(param)
+
+        size = -(-len(param)//n)
+        parts = [param[i:i+size] for i in range(0,len(param),size)]
+
+        s = datetime.datetime.now()
+        futures = [self.__executor.submit(self.__sessions[i].get_param_value,p)
+                   for i,p in enumerate(parts)]
+        results = [f.result() for f in futures]
+        for i,r in enumerate(results):
+            # A failed part, e.g. the empty result of a response without parameters,
+            # is read again on the control session
+            if not isinstance(r,dict):
+                print('Read session {} returned no values, retrying on the control session'.format(i))
+                results[i] = self.__control.get_param_value(parts[i])
+                if not isinstance(results[i],dict):
+                    print('No values returned for {} parameters'.format(len(parts[i])))
+                    return ""
+        e = datetime.datetime.now()
+
+        # Merge the results with one timestamp
+        key = 'timestamp_{}'.format(self.__name)
+        values = {}
+        valid = True
+        for r in results:
+            if r.pop(key,None) is None:
+                valid = False
+            values.update(r)
+        timestamp = s + (e-s)/2.0
+        values[key] = timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3] if valid else None
+        return values
+
+    @property
+    def sessions(self):
+        '''
+        '''
+        return self.__n
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------
+# Module Description
+#--------------------------------------------------------------------
+"""
+Requests of the EMI interface and a cache of serialized requests.
+A logging loop sends the same request every sampling tick, so the serialized
+request, with the endtag already appended, is kept in a LRU cache keyed by the
+request type and its arguments. A cached request is sent with a single socket
+write.
+
+Methods for EMI requests
+login_request(username,passw)                    -> loginRequest
+logout_request()                                 -> logoutRequest
+messages_request(language,min_index)             -> getMessagesRequest
+record_data_request(min_r,max_r)                 -> getRecordDataRequest
+param_values_request(uris,client_id)             -> getParameterValuesRequest
+with_request_id(msg,request_id)                  -> getParameterValuesRequest with a new id
+request_type(msg)                                -> Returning the tag of a serialized request
+set_value_request(uri,value,unit_system)         -> setParameterValueRequest
+param_details_request(uri)                       -> getParameterDetailsRequest
+parameter_phrase_request(uri,unit_system,lang)   -> getParameterPhraseRequest
+
+Methods for RequestCache
+get(key,build)      -> Returning the cached request, build and cache it if missing
+invalidate(key)     -> Remove one request or all requests from the cache
+"""
+#--------------------------------------------------------------------
+# Administration Details
+#--------------------------------------------------------------------
+__author__ = "Mats Larsen"
+__copyright__ = "2020 [NTNU Gjøvik and SINTEF Manufacturing]"
+__credits__ = ["Mats Larsen", "Olga Ogorodnyk"]
+__license__ = "MIT"
+__maintainer__ = "Mats Larsen"
+__email__ = "Mats.Larsen@sintef.no"
+__status__ = "Development"
+__date__ = "30032020"
+__version__ = "1.0"
+#--------------------------------------------------------------------
+#IMPORT
+#--------------------------------------------------------------------
+import re
+import collections
+import threading
+import xml.etree.ElementTree as ET
+from .emi_frame_decoder import ENDTAG
+#--------------------------------------------------------------------
+#CONSTANTS
+#--------------------------------------------------------------------
+CACHE_SIZE = 128    # Default number of cached requests
+# Start of a serialized getParameterValuesRequest, followed by the id
+PARAM_VALUES_HEAD = b'<getParameterValuesRequest id="'
+# Tag of the root element of a request
+_TAG = re.compile(rb'<([\w:.-]+)')
+#--------------------------------------------------------------------
+#METHODS
+#--------------------------------------------------------------------
+def login_request(username,passw):
+    '''
+    Serialize a login request.
+    Params:
+    - username -> str : Login for user
+    - passw    -> str : Password to the username
+    Return:
+    - bytes : The request without endtag
+    '''
+    root = ET.Element("loginRequest")
+    root.set('username',username)
+    root.set('password',passw)
+    return ET.tostring(root)
+
+def logout_request():
+    '''
+    Serialize a logout request.
+    Return:
+    - bytes : The request without endtag
+    '''
+    return ET.tostring(ET.Element("logoutRequest"))
+
+def messages_request(language='en',min_index=0):
+    '''
+    Serialize a request for the messages of the machine.
+    Params:
+    - language  -> str : Language of the messages
+    - min_index -> int : Index of the first message
+    Return:
+    - bytes : The request without endtag
+    '''
+    root = ET.Element("getMessagesRequest")
+    root.set('language',language)
+    root.set('minMessageIndex',str(min_index))
+    return ET.tostring(root)
+
+def record_data_request(min_r,max_r):
+    '''
+    Serialize a request for the process dataset.
+    Params:
+    - min_r -> str : First record number
+    - max_r -> str : Last record number
+    Return:
+    - bytes : The request without endtag
+    '''
+    root = ET.Element("getRecordDataRequest")
+    root.set('minRecordNumber', str(min_r))
+    root.set('maxRecordNumber', str(max_r))
+    return ET.tostring(root)
+
+def param_values_request(uris,client_id):
+    '''
+    Serialize a request for the values of several parameters.
+    Params:
+    - uris      -> list<str> : URI of the parameters
+    - client_id -> str       : Id of the request
+    Return:
+    - bytes : The request without endtag
+    '''
+    root = ET.Element("getParameterValuesRequest")
+    root.set('id',client_id)
+    parameters = ET.SubElement(root, 'parameters')
+    for i in uris:
+        parameter = ET.SubElement(parameters, 'parameter')
+        parameter.set('uri',i)
+    return ET.tostring(root)
+
+def with_request_id(msg,request_id):
+    '''
+    Replace the id of a serialized getParameterValuesRequest.
+    Params:
+    - msg        -> bytes : Serialized request from param_values_request
+    - request_id -> str   : The new id
+    Return:
+    - bytes : The request with the new id
+    '''
+    i = msg.index(b'"',len(PARAM_VALUES_HEAD))
+    return PARAM_VALUES_HEAD + request_id.encode() + msg[i:]
+
+def request_type(msg):
+    '''
+    Return the tag of the root element of a serialized request.
+    Params:
+    - msg -> bytes : Serialized request
+    Return:
+    - str : The tag, e.g. getParameterValuesRequest
+    '''
+    m = _TAG.match(msg)
+    if m is None:
+        return 'unknown'
+    return m.group(1).decode('UTF-8')
+
+def set_value_request(uri,value,unit_system):
+    '''
+    Serialize a request for setting the value of a parameter.
+    Params:
+    - uri         -> str : URI of the parameter
+    - value       -> str : The new value
+    - unit_system -> str : Unit system of the value
+    Return:
+    - bytes : The request without endtag
+    '''
+    root = ET.Element("setParameterValueRequest")
+    root.set('unitSystem',unit_system)
+    root.set('uri',uri)
+    root.set('parameterValue', str(value))
+    return ET.tostring(root)
+
+def param_details_request(uri):
+    '''
+    Serialize a request for the details of a parameter.
+    Params:
+    - uri -> str : URI of the parameter
+    Return:
+    - bytes : The request without endtag
+    '''
+    root = ET.Element("getParameterDetailsRequest")
+    root.set('uri', uri)
+    return ET.tostring(root)
+
+def parameter_phrase_request(uri,unit_system,language='en'):
+    '''
+    Serialize a request for the description of a parameter.
+    Params:
+    - uri         -> str : URI of the parameter
+    - unit_system -> str : Unit system of the description
+    - language    -> str : Language of the description
+    Return:
+    - bytes : The request without endtag
+    '''
+    root = ET.Element("getParameterPhraseRequest")
+    root.set('unitSystem', unit_system)
+    root.set('uri', uri)
+    root.set('language', language)
+    return ET.tostring(root)
+#--------------------------------------------------------------------
+# CLASSES
+#--------------------------------------------------------------------
+class RequestCache():
+    '''
+    LRU cache of serialized requests with the endtag appended.
+    '''
+    def __init__(self,maxsize=CACHE_SIZE,endtag=ENDTAG):
+        '''
+        Instantiate the cache.
+        Params:
+        - maxsize -> int   : Max number of cached requests, 0 disables the cache
+        - endtag  -> bytes : Endtag appended to every request
+        '''
+        # Arguments
+        self.__maxsize = maxsize
+        self.__endtag = endtag
+
+        # Attributes
+        self.__requests = collections.OrderedDict()
+        self.__lock = threading.Lock()
+        self.__hits = 0
+        self.__misses = 0
+
+    def get(self,key,build):
+        '''
+        Return the cached request, build and cache it if it is missing.
+        Params:
+        - key   -> tuple    : Request type and arguments, has to be hashable
+        - build -> callable : Returning the serialized request without endtag
+        Return:
+        - bytes : The request with endtag
+        '''
+        with self.__lock:
+            msg = self.__requests.get(key)
+            if msg is not None:
+                self.__requests.move_to_end(key)
+                self.__hits += 1
+                return msg
+            self.__misses += 1
+
+        msg = build() + self.__endtag
+        if self.__maxsize > 0:
+            with self.__lock:
+                self.__requests[key] = msg
+                if len(self.__requests) > self.__maxsize:
+                    self.__requests.popitem(last=False)
+        return msg
+
+    def invalidate(self,key=None):
+        '''
+        Remove a request from the cache.
+        Params:
+        - key -> tuple : The request to remove, None removes all requests
+        '''
+        with self.__lock:
+            if key is None:
+                self.__requests.clear()
+            else:
+                self.__requests.pop(key,None)
+
+    def info(self):
+        '''
+        Return the cache statistics.
+        Return:
+        - Dict : hits, misses, size and maxsize
+        '''
+        with self.__lock:
+            return {'hits':self.__hits,
+                    'misses':self.__misses,
+                    'size':len(self.__requests),
+                    'maxsize':self.__maxsize}
+
+    def __len__(self):
+        return len(self.__requests)
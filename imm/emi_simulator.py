@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------
+# Module Description
+#--------------------------------------------------------------------
+"""
+Local simulator of the CC300 EMI interface.
+The simulator is a TCP server speaking the EMI protocol, XML requests and
+responses ended with 0x19, and can stand in for a machine when testing and
+benchmarking EMI_Interface, IMMController and imm_system.API without a live
+machine. Every parameter gets a synthetic value. The clamp force follows a
+shot cycle with closing, injection, holding, cooling and opening, and the shot
+counter increases once per cycle. Response latency, jitter and payload size
+can be configured.
+
+Supported requests:
+- loginRequest, logoutRequest
+- getParameterValuesRequest, setParameterValueRequest
+- getParameterDetailsRequest, getParameterPhraseRequest
+- getMessagesRequest, getRecordDataRequest
+
+Methods for EMISimulator
+start()             -> Start serving in a background thread
+serve_forever()     -> Serve in the calling thread until stopped
+stop()              -> Stop serving and close the socket
+phase(t)            -> Returning the phase of the shot cycle
+value(uri,t)        -> Returning the simulated value of a uri
+add_message(text)   -> Add a message to the message log
+"""
+#--------------------------------------------------------------------
+# Administration Details
+#--------------------------------------------------------------------
+__author__ = "Mats Larsen"
+__copyright__ = "2020 [NTNU Gjøvik and SINTEF Manufacturing]"
+__credits__ = ["Mats Larsen", "Olga Ogorodnyk"]
+__license__ = "MIT"
+__maintainer__ = "Mats Larsen"
+__email__ = "Mats.Larsen@sintef.no"
+__status__ = "Development"
+__date__ = "30032020"
+__version__ = "1.0"
+#--------------------------------------------------------------------
+#IMPORT
+#--------------------------------------------------------------------
+import math
+import time
+import random
+import datetime
+import threading
+import itertools
+import zlib
+import socketserver
+import xml.etree.ElementTree as ET
+from .emi_frame_decoder import FrameDecoder, ENDTAG
+from .emi_interface import URI_DATE, URI_TIME
+#--------------------------------------------------------------------
+#CONSTANTS
+#--------------------------------------------------------------------
+# Same uri as OPENINGMOULD_URI in imm_system.api
+CLAMP_FORCE_URI = 'cc300://imm/cm#//c.Mold1/p.sv_MeasActClmpForce/v/p.rAct/v'
+SHOT_COUNTER_URI = 'cc300://imm/cm#//c.ShotCounter/p.sv_iShotCounter/v'
+CYCLE_TIME = 20.0       # Seconds of a simulated shot cycle
+CLAMP_FORCE = 800.0     # kN at full clamp force
+# Phases of the shot cycle as (name, part of cycle)
+PHASES = [('closing',0.1),('injection',0.1),('holding',0.15),('cooling',0.45),('opening',0.2)]
+#--------------------------------------------------------------------
+# CLASSES
+#--------------------------------------------------------------------
+class _EMIHandler(socketserver.BaseRequestHandler):
+    '''
+    Handler of one client connection.
+    '''
+    def handle(self):
+        '''
+        Answer the requests of the client until it disconnects.
+        '''
+        sim = self.server.simulator
+        decoder = FrameDecoder()
+        if sim.greeting:
+            self.request.sendall(sim.greeting_response() + ENDTAG)
+        while True:
+            try:
+                frame = decoder.read_frame(self.request)
+            except (ConnectionError,OSError):
+                return
+            sim.delay()
+            try:
+                r = sim.respond(frame)
+            except Exception as e:
+                # Answer as the control does, the connection is kept
+                print('EMI simulator failed on request {} : {}'.format(frame,e))
+                r = sim.error_response('Request failed : {}'.format(e))
+            try:
+                self.request.sendall(r + ENDTAG)
+            except OSError:
+                return
+
+class _Server(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    '''
+    Threaded TCP server with reusable address.
+    '''
+    daemon_threads = True
+    allow_reuse_address = True
+
+class EMISimulator():
+    '''
+    Fake CC300 control speaking the EMI protocol.
+    '''
+    def __init__(self,**kwargs):
+        '''
+        Instantiate the simulator with params.
+        Params:
+        - host          -> str      : Host to serve on
+        - port          -> int      : Port to serve on, 0 picks a free port
+        - username      -> str      : Accepted login, None accepts all
+        - passw         -> str      : Accepted password
+        - latency       -> float    : Response delay in seconds
+        - jitter        -> float    : Max random extra delay in seconds
+        - padding       -> int      : Extra bytes per parameter in value responses
+        - cycle_time    -> float    : Seconds of a shot cycle
+        - messages      -> int      : Number of messages in the message log
+        - greeting      -> Boolean  : Send the list of commands after connecting
+        - seed          -> int      : Seed of the jitter
+        '''
+        # Arguments
+        self.__host = kwargs.get('host','127.0.0.1')
+        self.__port = kwargs.get('port',10050)
+        self.__username = kwargs.get('username',None)
+        self.__passw = kwargs.get('passw',None)
+        self.__latency = kwargs.get('latency',0.0)
+        self.__jitter = kwargs.get('jitter',0.0)
+        self.__padding = kwargs.get('padding',0)
+        self.__cycle_time = float(kwargs.get('cycle_time',CYCLE_TIME))
+        if self.__cycle_time <= 0:
+            raise ValueError('cycle_time has to be positive, not {}'.format(self.__cycle_time))
+        self.__greeting = kwargs.get('greeting',False)
+        self.__random = random.Random(kwargs.get('seed',None))
+
+        # Attributes
+        self.__start = time.monotonic()
+        self.__values = {}                  # Values set by clients
+        self.__lock = threading.Lock()
+        self.__sessions = itertools.count(1)
+        self.__messages = ['Simulated message {}'.format(i) for i in range(kwargs.get('messages',100))]
+        self.__server = None
+        self.__thread = None
+        self.__requests = 0
+
+    def start(self):
+        '''
+        Start serving in a background thread.
+        Return:
+        - (str,int) : The address served on
+        '''
+        self.__server = _Server((self.__host,self.__port),_EMIHandler)
+        self.__server.simulator = self
+        self.__thread = threading.Thread(target=self.__server.serve_forever)
+        self.__thread.daemon = True
+        self.__thread.start()
+        print('EMI simulator serving on {}:{}'.format(*self.address))
+        return self.address
+
+    def serve_forever(self):
+        '''
+        Serve in the calling thread until stopped.
+        '''
+        self.__server = _Server((self.__host,self.__port),_EMIHandler)
+        self.__server.simulator = self
+        print('EMI simulator serving on {}:{}'.format(*self.address))
+        self.__server.serve_forever()
+
+    def stop(self):
+        '''
+        Stop serving and close the socket.
+        '''
+        if self.__server is not None:
+            self.__server.shutdown()
+            self.__server.server_close()
+            self.__server = None
+
+    def delay(self):
+        '''
+        Wait the configured latency and jitter.
+        '''
+        d = self.__latency
+        if self.__jitter > 0:
+            d += self.__random.uniform(0,self.__jitter)
+        if d > 0:
+            time.sleep(d)
+
+    def phase(self,t=None):
+        '''
+        Return the phase of the shot cycle and the progress in the phase.
+        Params:
+        - t -> float : Seconds since start, None is now
+        Return:
+        - (str,float) : Name of the phase and progress from 0 to 1
+        '''
+        if t is None:
+            t = time.monotonic() - self.__start
+        c = (t % self.__cycle_time)/self.__cycle_time
+        for name,part in PHASES:
+            if c < part:
+                return name,c/part
+            c -= part
+        return PHASES[-1][0],1.0
+
+    def value(self,uri,t=None):
+        '''
+        Return the simulated value of a uri.
+        Params:
+        - uri -> str   : The uri
+        - t   -> float : Seconds since start, None is now
+        Return:
+        - str : The value
+        '''
+        with self.__lock:
+            if uri in self.__values:
+                return self.__values[uri]
+        if t is None:
+            t = time.monotonic() - self.__start
+        if uri == CLAMP_FORCE_URI:
+            name,p = self.phase(t)
+            if name == 'closing':
+                force = CLAMP_FORCE*p
+            elif name == 'opening':
+                force = CLAMP_FORCE*(1.0-p)
+            else:
+                force = CLAMP_FORCE
+            return '{:.1f}'.format(force)
+        if uri == SHOT_COUNTER_URI:
+            return str(int(t//self.__cycle_time))
+        if uri == URI_DATE:
+            return datetime.datetime.now().strftime('%Y-%m-%dT00:00:00')
+        if uri == URI_TIME:
+            return datetime.datetime.now().strftime('1970-01-01T%H:%M:%S')
+        # Slow sine with a period and phase given by the uri
+        h = zlib.crc32(uri.encode('UTF-8'))
+        period = 5.0 + h % 60
+        return '{:.3f}'.format(100.0 + 50.0*math.sin(2*math.pi*t/period + h % 628/100.0))
+
+    def respond(self,frame):
+        '''
+        Return the serialized response of a request.
+        Params:
+        - frame -> bytes : The request without endtag
+        Return:
+        - bytes : The response without endtag
+        '''
+        with self.__lock:
+            self.__requests += 1
+        try:
+            req = ET.fromstring(frame)
+        except ET.ParseError:
+            return self.__error('Request is not valid XML')
+
+        handler = getattr(self,'_EMISimulator__{}'.format(req.tag),None)
+        if handler is None:
+            return self.__error('Unknown request {}'.format(req.tag))
+        return ET.tostring(handler(req))
+
+    def error_response(self,text):
+        '''
+        Return the serialized error response with a text.
+        '''
+        return self.__error(text)
+
+    def greeting_response(self):
+        '''
+        Return the list of commands sent after connecting.
+        '''
+        root = ET.Element('commands')
+        for i in ('loginRequest','logoutRequest','getParameterValuesRequest','setParameterValueRequest',
+                  'getParameterDetailsRequest','getParameterPhraseRequest','getMessagesRequest','getRecordDataRequest'):
+            ET.SubElement(root,'command').set('name',i)
+        return ET.tostring(root)
+
+    def __error(self,text):
+        '''
+        Return an error response.
+        '''
+        root = ET.Element('errorResponse')
+        root.set('text',text)
+        return ET.tostring(root)
+
+    def __loginRequest(self,req):
+        '''
+        Accept the login and return a session id.
+        '''
+        root = ET.Element('loginResponse')
+        if self.__username is None or (req.get('username') == self.__username and req.get('password') == self.__passw):
+            root.set('sessionid',str(next(self.__sessions)))
+        return root
+
+    def __logoutRequest(self,req):
+        '''
+        Return the logout response.
+        '''
+        return ET.Element('logoutResponse')
+
+    def __getParameterValuesRequest(self,req):
+        '''
+        Return the simulated values of the requested uris.
+        '''
+        root = ET.Element('getParameterValuesResponse')
+        if req.get('id') is not None:
+            root.set('id',req.get('id'))
+        parameters = ET.SubElement(root,'parameters')
+        t = time.monotonic() - self.__start
+        pad = 'x'*self.__padding
+        for i in req.findall('./parameters/parameter'):
+            p = ET.SubElement(parameters,'parameter')
+            p.set('uri',i.get('uri'))
+            p.set('parameterValue',self.value(i.get('uri'),t))
+            if pad:
+                p.set('padding',pad)
+        return root
+
+    def __setParameterValueRequest(self,req):
+        '''
+        Keep the set value, it is returned by later value requests.
+        '''
+        with self.__lock:
+            self.__values[req.get('uri')] = req.get('parameterValue')
+        root = ET.Element('setParameterValueResponse')
+        root.set('uri',req.get('uri'))
+        root.set('parameterValue',req.get('parameterValue'))
+        return root
+
+    def __getParameterDetailsRequest(self,req):
+        '''
+        Return the type and unit of a uri.
+        '''
+        uri = req.get('uri')
+        root = ET.Element('getParameterDetailsResponse')
+        root.set('uri',uri)
+        if uri in (URI_DATE,URI_TIME):
+            root.set('dataType','DATE')
+        elif uri == SHOT_COUNTER_URI:
+            root.set('dataType','DINT')
+            root.set('unit','Piece')
+        else:
+            root.set('dataType','REAL')
+            root.set('unit','kN' if uri == CLAMP_FORCE_URI else '')
+        return root
+
+    def __getParameterPhraseRequest(self,req):
+        '''
+        Return the description of a uri.
+        '''
+        root = ET.Element('getParameterPhraseResponse')
+        root.set('uri',req.get('uri'))
+        root.set('language',req.get('language','en'))
+        root.set('text','Simulated parameter {}'.format(req.get('uri')))
+        return root
+
+    def __getMessagesRequest(self,req):
+        '''
+        Return the messages from minMessageIndex.
+        '''
+        root = ET.Element('getMessagesResponse')
+        messages = ET.SubElement(root,'messages')
+        start = int(req.get('minMessageIndex','0'))
+        for i in range(start,len(self.__messages)):
+            m = ET.SubElement(messages,'message')
+            m.set('index',str(i))
+            m.set('text',self.__messages[i])
+        return root
+
+    def __getRecordDataRequest(self,req):
+        '''
+        Return the records of the finished shot cycles.
+        '''
+        root = ET.Element('getRecordDataResponse')
+        records = ET.SubElement(root,'records')
+        last = int((time.monotonic() - self.__start)//self.__cycle_time)
+        lo = int(req.get('minRecordNumber','0'))
+        hi = min(int(req.get('maxRecordNumber','0')),last)
+        for n in range(lo,hi+1):
+            r = ET.SubElement(records,'record')
+            r.set('number',str(n))
+            r.set('cycleTime','{:.2f}'.format(self.__cycle_time))
+        return root
+
+    def add_message(self,text):
+        '''
+        Add a message to the message log.
+        '''
+        with self.__lock:
+            self.__messages.append(text)
+
+    @property
+    def address(self):
+        '''
+        '''
+        return self.__server.server_address
+
+    @property
+    def greeting(self):
+        '''
+        '''
+        return self.__greeting
+
+    @property
+    def requests(self):
+        '''
+        '''
+        return self.__requests
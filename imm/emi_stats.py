@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------
+# Module Description
+#--------------------------------------------------------------------
+"""
+Latency statistics of EMI requests.
+For every request type the time of each phase of a request is recorded in a
+histogram with log spaced buckets:
+- lock_wait     -> Waiting for the socket lock
+- send          -> Writing the request to the socket
+- first_byte    -> From the request is sent to the first byte of the response
+- receive       -> From the request is sent to the full response
+- parse         -> Parsing the response
+
+The statistics are returned as plain dicts and lists, so they can be
+queried over the Pyro proxy.
+
+Methods for RequestStats
+record(kind,phase,seconds)  -> Record the time of a phase
+snapshot()                  -> Returning counts and histograms of all request types
+reset()                     -> Remove all recorded times
+"""
+#--------------------------------------------------------------------
+# Administration Details
+#--------------------------------------------------------------------
+__author__ = "Mats Larsen"
+__copyright__ = "2020 [NTNU Gjøvik and SINTEF Manufacturing]"
+__credits__ = ["Mats Larsen", "Olga Ogorodnyk"]
+__license__ = "MIT"
+__maintainer__ = "Mats Larsen"
+__email__ = "Mats.Larsen@sintef.no"
+__status__ = "Development"
+__date__ = "30032020"
+__version__ = "1.0"
+#--------------------------------------------------------------------
+#IMPORT
+#--------------------------------------------------------------------
+import bisect
+import threading
+#--------------------------------------------------------------------
+#CONSTANTS
+#--------------------------------------------------------------------
+PHASES = ('lock_wait','send','first_byte','receive','parse')
+# Upper bounds of the buckets in seconds, 4 buckets per decade from 10 us to 100 s
+BUCKETS = [round(10**(e/4.0),9) for e in range(-20,9)]
+#--------------------------------------------------------------------
+# CLASSES
+#--------------------------------------------------------------------
+class Histogram():
+    '''
+    Histogram of times with log spaced buckets.
+    '''
+    def __init__(self):
+        '''
+        Instantiate an empty histogram.
+        '''
+        self.__counts = [0]*(len(BUCKETS)+1)    # Last bucket is everything above
+        self.__count = 0
+        self.__sum = 0.0
+        self.__min = None
+        self.__max = None
+
+    def add(self,seconds):
+        '''
+        Add a time to the histogram.
+        '''
+        self.__counts[bisect.bisect_left(BUCKETS,seconds)] += 1
+        self.__count += 1
+        self.__sum += seconds
+        if self.__min is None or seconds < self.__min:
+            self.__min = seconds
+        if self.__max is None or seconds > self.__max:
+            self.__max = seconds
+
+    def percentile(self,p):
+        '''
+        Return the upper bound of the bucket holding the p percentile.
+        '''
+        if self.__count == 0:
+            return None
+        rank = p/100.0*self.__count
+        acc = 0
+        for i,n in enumerate(self.__counts):
+            acc += n
+            if acc >= rank and n > 0:
+                return BUCKETS[i] if i < len(BUCKETS) else self.__max
+        return self.__max
+
+    def snapshot(self):
+        '''
+        Return the histogram as a dict.
+        '''
+        return {'count':self.__count,
+                'sum':self.__sum,
+                'mean':self.__sum/self.__count if self.__count else None,
+                'min':self.__min,
+                'max':self.__max,
+                'p50':self.percentile(50),
+                'p90':self.percentile(90),
+                'p99':self.percentile(99),
+                'buckets':[[b,n] for b,n in zip(BUCKETS + [None],self.__counts) if n > 0]}
+
+class RequestStats():
+    '''
+    Histograms of the phases of every request type.
+    '''
+    def __init__(self):
+        '''
+        Instantiate empty statistics.
+        '''
+        self.__kinds = {}       # kind -> phase -> Histogram
+        self.__lock = threading.Lock()
+
+    def record(self,kind,phase,seconds):
+        '''
+        Record the time of a phase.
+        Params:
+        - kind    -> str   : Request type, e.g. getParameterValuesRequest
+        - phase   -> str   : One of PHASES
+        - seconds -> float : Time of the phase
+        '''
+        with self.__lock:
+            phases = self.__kinds.get(kind)
+            if phases is None:
+                phases = self.__kinds[kind] = {}
+            h = phases.get(phase)
+            if h is None:
+                h = phases[phase] = Histogram()
+            h.add(seconds)
+
+    def snapshot(self):
+        '''
+        Return counts and histograms of all request types.
+        Return:
+        - Dict : kind -> {'count', 'phases': phase -> histogram}
+        '''
+        r = {}
+        with self.__lock:
+            for kind,phases in self.__kinds.items():
+                p = {name:h.snapshot() for name,h in phases.items()}
+                count = max(h['count'] for h in p.values())
+                r[kind] = {'count':count,'phases':p}
+        return r
+
+    def reset(self):
+        '''
+        Remove all recorded times.
+        '''
+        with self.__lock:
+            self.__kinds = {}
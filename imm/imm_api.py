@@ -22,13 +22,24 @@ __version__ = "1.0"
 # IMPORT
 #--------------------------------------------------------------------
 from .imm_controller import IMMController, States
-import csv
+import inspect
+import threading
 from .process_params import ProcessParam
+from daq_core import load_catalog, rows_to_lists
 #--------------------------------------------------------------------
 #CONSTANTS
 #--------------------------------------------------------------------
 # path to CSV
 PATH_VALUES = ['path_act_value','path_set_low_value','path_set_high_value','path_set_value']
+# Optional column with the update cycle in ms
+CYCLE = 'cycle'
+# Kind of the compiled parameter catalog, it changes with the format and with the params of ProcessParam
+CATALOG_KIND = 'imm_api.3:{}'.format(','.join(inspect.signature(ProcessParam).parameters))
+# Optional column with the NumPy dtype name of the actual value for columnar storage
+DTYPE = 'dtype'
+DTYPE_NAMES = ('float64','float32','int64','int32','bool','object')
+# Value of an unused uri in the csv
+UNUSED = '0'
 #--------------------------------------------------------------------
 # CLASSES
 #--------------------------------------------------------------------
@@ -40,71 +51,204 @@ class IMM_API(IMMController):
         '''
         Constructor for REVPODAQ API
         Params : The same params from IMMController
+        With metadata_path the cached details and descriptions are loaded at
+        startup and refreshed in the background.
+        The parameter list is compiled to a catalog next to the csv, or at
+        catalog_path, and compiled again when the csv changes.
         '''
-        # load params from csv on a specific format
-        params = self.__load_params(params_path)
+        # load the compiled params from csv on a specific format
+        catalog = self.__load_params(params_path,kwargs.get('catalog_path'))
         # Define update parameters
-        self.__pp = self.__preparePP(params)
-        uri = [self.__pp[i].get for i in self.__pp.keys()]
+        self.__pp = catalog['pp']
+        self.__names = catalog['names']
+        uri = catalog['uri']
+        # Update cycles for the flexible sampling mode
+        if 'cycles' not in kwargs:
+            kwargs['cycles'] = dict(catalog['cycles'])
+        # dtypes of the columns from the csv, the other uris get the type from the details
+        if 'dtypes' not in kwargs:
+            kwargs['dtypes'] = dict(catalog['dtypes'])
+        # Limit monitor, created by start_limit_monitor
+        self.__time_key = 'timestamp_{}'.format(kwargs.get('name','imm'))
+        self.__monitor = None
+        self.__monitor_sub = None
+        self.__monitor_callback = None
+        self.__limit_events = None
         # Create controller
         IMMController.__init__(self,uri=uri,**kwargs)
         self.init()
 
-    def __load_params(self,path):
+        # Refresh the metadata cache in the background
+        if kwargs.get('metadata_path') is not None:
+            self.__metadata_thread = threading.Thread(target=self.__refresh_metadata)
+            self.__metadata_thread.daemon = True
+            self.__metadata_thread.start()
+
+    def __refresh_metadata(self):
         '''
-        Loading parameter list
+        Refresh the metadata of all uris of the process parameters.
         '''
-        print('Loading parameter list at path : {}'.format(path))
-        params = {}
-        with open('{}'.format(path)) as csvfile:
+        uris = []
+        for p in self.__pp.values():
+            for i in [p.get,p.set] + (p.threshold or []):
+                if i is not None and i != '0' and i not in uris:
+                    uris.append(i)
+        n = self.refresh_metadata(uris)
+        print('Metadata refreshed for {} of {} parameters'.format(n,len(uris)))
 
-            line = csv.DictReader(csvfile,delimiter=',', quotechar='"')
-            count = 0
-            for row in line:
+    def __load_params(self,path,catalog_path=None):
+        '''
+        Loading the compiled parameter list
+        Params:
+        - path          -> str : Path to the csv
+        - catalog_path  -> str : Path to the compiled catalog, None is next to the csv
+        Return:
+        - Dict : pp, names, uri, cycles and dtypes
+        '''
+        catalog = load_catalog(path,self.__compile,kind=CATALOG_KIND,catalog_path=catalog_path)
+        # The catalog has the params of each ProcessParam as plain data
+        catalog['pp'] = {name:ProcessParam(**f) for name,f in catalog['params'].items()}
+        return catalog
 
-                params[row['name']] = row
-        return params
+    def __compile(self,params):
+        '''
+        Compile the rows of the parameter list.
+        Params:
+        - params -> Dict : name -> row of the csv
+        Return:
+        - Dict : params, names, uri, cycles and dtypes
+        '''
+        fields = self.__preparePP(params)
+        pp = {name:ProcessParam(**f) for name,f in fields.items()}
+        return {'params':fields,
+                'names':self.__index(pp),
+                'uri':[p.get for p in pp.values()],
+                'cycles':{p.get:p.cycle/1000.0 for p in pp.values() if p.cycle is not None},
+                'dtypes':{p.get:params[name][DTYPE] for name,p in pp.items()
+                          if params[name].get(DTYPE) in DTYPE_NAMES}}
+
+    def __check_row(self,name,row):
+        '''
+        Validate a row of the parameter list.
+        Return:
+        - Boolean : True if the parameter is valid and enabled
+        '''
+        enable = row.get('enable')
+        if enable not in ('0','1'):
+            print('Parameter {} has enable {}, it has to be 0 or 1'.format(name,enable))
+            return False
+        if enable == '0':
+            return False
+        if row.get(PATH_VALUES[0]) in (None,'',UNUSED):
+            print('Parameter {} has no {}'.format(name,PATH_VALUES[0]))
+            return False
+        low = row.get(PATH_VALUES[1]) in (None,'',UNUSED)
+        high = row.get(PATH_VALUES[2]) in (None,'',UNUSED)
+        if low != high:
+            print('Parameter {} has only one threshold, both or none has to be set'.format(name))
+            return False
+        if not row.get('unit'):
+            print('Parameter {} has no unit'.format(name))
+        if row.get(CYCLE) and self.__cycle(row.get(CYCLE)) is None:
+            print('Parameter {} has the cycle {}, it has to be a positive number of ms'.format(name,row.get(CYCLE)))
+        if row.get(DTYPE) and row.get(DTYPE) not in DTYPE_NAMES:
+            print('Parameter {} has the dtype {}, it has to be one of {}'.format(name,row.get(DTYPE),DTYPE_NAMES))
+        return True
 
     def __preparePP(self,params):
         '''
-        Prepare uri to a list of if process parameters instances.
+        Prepare the params of the process parameters.
         Params:
         - params -> List<string> : URI for process parameters
         Return:
-        - uris  -> Dict[UpdateParams]
+        - Dict : name -> params of ProcessParam
         '''
         print('Prepraring UpdateParms list')
-        # List with ParamUpdates instances
+        # Params of the ProcessParam instances
         pp = {}
         # Loop the parameter list
         for key,value in params.items():
-            # IF the enable is 1, and wanted to be used
-            if value['enable'] == '1':
-                pp[key] = ProcessParam(name=key,
-                                       get=value[PATH_VALUES[0]],
-                                       set=value[PATH_VALUES[3]],
-                                       threshold=[value[PATH_VALUES[1]],value[PATH_VALUES[2]]],
-                                       unit=value['unit']
-                                       )
+            # IF the enable is 1, and the row is valid
+            if self.__check_row(key,value):
+                pp[key] = dict(name=key,
+                               get=value[PATH_VALUES[0]],
+                               set=value[PATH_VALUES[3]],
+                               threshold=[value[PATH_VALUES[1]],value[PATH_VALUES[2]]],
+                               unit=value['unit'],
+                               cycle=self.__cycle(value.get(CYCLE))
+                               )
         return pp
 
+    def __index(self,pp):
+        '''
+        Build the reverse index from uri to process parameter name.
+        Params:
+        - pp -> Dict[ProcessParam] : The process parameters
+        Return:
+        - Dict : uri -> name, the first parameter with the uri is used
+        '''
+        names = {}
+        for name,p in pp.items():
+            for uri in p.uris:
+                if uri != UNUSED:
+                    names.setdefault(uri,name)
+        return names
+
+    def __cycle(self,value):
+        '''
+        Return the update cycle in ms from the csv, None if it is empty or not valid.
+        '''
+        try:
+            cycle = float(value)
+        except (TypeError,ValueError):
+            return None
+        return cycle if cycle > 0 else None
+
     def set_process_param(self,param,value):
         '''
         Setting process param for set value or a threshold boundary
+        Params:
+        - param -> str              : Name of the process parameter
+        - value -> str or [str,str] : The set value, or the low and high threshold
+        Return:
+        - list : The values read back from the machine, None if the param has no set uri
         '''
-        p = self.__pp[param]
-        if p.set is not None:
-            set_val = [p.set]
-            value = [value]
-        elif p.threshold is not None:
-            set_val = p.threshold
-        else:
-            return None
-        r = {}
-        for i in range(0,len(set_val)):
-            print('set {} to {}'.format(param,value[i]))
-            self.set_param_value(set_val[i],value[i])
-        return self.get_process_param(param)
+        r = self.set_process_params({param:value})
+        return r['values'].get(param)
+
+    def set_process_params(self,params,verify=True):
+        '''
+        Setting several process params with one send, and verifying them with one read.
+        Params:
+        - params -> Dict    : name -> set value, or [low,high] for a threshold
+        - verify -> Boolean : Read the values back and compare them to the set values
+        Return:
+        - Dict : ok -> name -> Boolean, values -> name -> values read back,
+                 latency -> seconds of write, verify and total
+        '''
+        uris = {}       # name -> uris
+        values = {}     # uri -> value
+        for name,value in params.items():
+            p = self.__pp[name]
+            if p.set not in (None,UNUSED):
+                set_val = [p.set]
+                value = [value]
+            elif p.threshold is not None and UNUSED not in p.threshold:
+                set_val = p.threshold
+            else:
+                print('Process param {} has no set value or threshold'.format(name))
+                continue
+            uris[name] = set_val
+            for i in range(0,len(set_val)):
+                print('set {} to {}'.format(name,value[i]))
+                values[set_val[i]] = value[i]
+
+        r = self.set_param_values(values,verify)
+        if self.__monitor is not None and verify:
+            self.__monitor.set_limits(r['values'])
+        return {'ok':{name:name in uris and all(r['ok'][i] for i in uris[name]) for name in params},
+                'values':{name:[r['values'][i] for i in set_val] for name,set_val in uris.items()} if verify else {},
+                'latency':r['latency']}
 
     def get_process_param(self,param):
         '''
@@ -123,6 +267,78 @@ class IMM_API(IMMController):
             r.append(d[i])
         return r
 
+    def start_limit_monitor(self,callback=None,**kwargs):
+        '''
+        Start checking the samples against the thresholds of the process params.
+        The thresholds are read once, and again by refresh_limits or when they
+        are set with set_process_params.
+        Params:
+        - callback -> callable : Called with every list of events, None keeps them for get_limit_events
+        - edge     -> Boolean  : Events only when the state of a param changes
+        - capacity -> int      : Max number of samples buffered for the monitor
+        - max_events -> int    : Max number of events kept for get_limit_events
+        Return:
+        - int : Number of monitored params
+        '''
+        from .limit_monitor import LimitMonitor
+        from daq_core import RingBuffer
+        self.stop_limit_monitor()
+        self.__monitor = LimitMonitor(self.__pp,time_key=self.__time_key,edge=kwargs.get('edge',True))
+        self.__monitor_callback = callback
+        self.__limit_events = RingBuffer(capacity=kwargs.get('max_events',10000))
+        self.refresh_limits()
+        sub_kwargs = {'capacity':kwargs['capacity']} if 'capacity' in kwargs else {}
+        # The monitor checks the samples by uri
+        self.__monitor_sub = IMMController.subscribe(self,self.__check_limits,**sub_kwargs)
+        return len(self.__monitor.uris)
+
+    def stop_limit_monitor(self):
+        '''
+        Stop checking the samples against the thresholds.
+        '''
+        if self.__monitor_sub is not None:
+            self.unsubscribe(self.__monitor_sub)
+        self.__monitor_sub = None
+
+    def refresh_limits(self):
+        '''
+        Read the thresholds of the monitored params with one request.
+        Return:
+        - int : Number of changed thresholds
+        '''
+        if self.__monitor is None or not self.__monitor.threshold_uris:
+            return 0
+        return self.__monitor.set_limits(self.get_param_value(self.__monitor.threshold_uris))
+
+    def __check_limits(self,batch):
+        '''
+        Check a batch of samples from the subscription of the limit monitor.
+        '''
+        events = self.__monitor.check(batch)
+        if not events:
+            return
+        if self.__monitor_callback is not None:
+            self.__monitor_callback(events)
+        else:
+            for e in events:
+                self.__limit_events.put(e)
+
+    def get_limit_events(self):
+        '''
+        Remove and return the limit events, oldest first.
+        '''
+        if self.__limit_events is None:
+            return []
+        return self.__limit_events.drain()
+
+    def get_limit_info(self):
+        '''
+        Return the limits, state and number of violations per monitored param, None if not started.
+        '''
+        if self.__monitor is None:
+            return None
+        return self.__monitor.info()
+
     def get_async_sample(self,uri=None):
         '''
         Get asynchrony sample independent of the control loop
@@ -133,32 +349,30 @@ class IMM_API(IMMController):
 
     def __convert(self,d):
         '''
+        Rename the uris of a sample, or of the columns of samples, to the
+        process parameter names. Keys without a parameter are kept.
         '''
-        for key in d.keys():
-
-            for name,data in self.__pp.items():
-                r = data.find(key)
-
-                if r is not None: break
-
-            if r is not None:
-                d[r] = d[key]
-                del d[key]
+        names = self.__names
+        return {names.get(key,key):val for key,val in d.items()}
 
-        return d
+    def subscribe(self,callback=None,**kwargs):
+        '''
+        Subscribe to the samples as they are taken, with the params as for
+        IMMController.subscribe. The samples are named by the process parameters
+        as in get_samples.
+        '''
+        kwargs.setdefault('transform',self.__convert)
+        return IMMController.subscribe(self,callback,**kwargs)
 
     def get_samples(self):
         '''
         Return samples from the FIFO quene. This is properly a thread action to
-        get data.
+        get data. A columnar controller returns one array per parameter.
         '''
-        d = {}
-        while self.quene_is_empty() == False:
-            s = self.get_sample()
-
-            for key,val in s.items():
-                if key not in d.keys(): d[key] = []
-                d[key].append(val)
+        if self.columnar:
+            return self.__convert(self.drain_columns())
+        # In the flexible cycles mode a sample has only the due uris, the others are None
+        d = rows_to_lists(self.drain())
         d = self.__convert(d)
         return d
 
@@ -27,10 +27,14 @@ import queue
 import datetime
 import time
 import copy
+from .sampling_scheduler import SamplingScheduler
+from .adaptive_rate import AdaptiveRate
+from daq_core import DeadlineTimer, OverrunPolicy, RingBuffer, OverflowPolicy, SubscriptionHub
 #--------------------------------------------------------------------
 # CONSTANTS
 #--------------------------------------------------------------------
 IDLE_TIME = 10 # Units is  seconds. Time that the connection can be idle
+QUEUE_SIZE = 100000 # Default max number of samples in the queue
 #--------------------------------------------------------------------
 # CLASSES
 #--------------------------------------------------------------------
@@ -47,9 +51,11 @@ class SamplingRateMode:
     Mode for the sampling. It can be either
     - A fixed sampling rate for all parameter
     - A flexible sampling rate, because not all parameter have the same update cycle
+    - An adaptive sampling rate, fast in the active phases of the shot cycle
     '''
     FIXED_STEP = 'Fixed sampling step'
     FLEXIBLE_CYCLES = 'Flexible update cycles'
+    ADAPTIVE_PHASE = 'Adaptive phase rate'
 
 class IMMController(threading.Thread, imm.EMI_Interface):
     '''
@@ -61,7 +67,26 @@ class IMMController(threading.Thread, imm.EMI_Interface):
         Instantiate EMI with params.
         Params:
         - sampling_mode     -> SamplingRateMode : The mode for sampling
-        - sampling_rate     -> float            : Sampling rate for fixed sampling mode
+        - sampling_rate     -> float            : Sampling rate for fixed sampling mode, and
+                                                  default update cycle for flexible mode
+        - cycles            -> Dict[str,float]  : Update cycle in seconds per uri for flexible mode
+        - overrun_policy    -> OverrunPolicy    : Handling of missed deadlines in fixed sampling mode
+        - max_catch_up      -> int              : Max missed deadlines sampled at once for CATCH_UP
+        - overrun_callback  -> callable         : Called with the number of missed deadlines and timing info
+        - queue_size        -> int              : Max number of samples in the queue
+        - queue_bytes       -> int              : Max estimated bytes of the samples in the queue
+        - overflow_policy   -> OverflowPolicy   : Handling of a sample when the queue is full
+        - columnar          -> Boolean          : Store the samples in one NumPy column per uri
+        - dtypes            -> Dict[str,str]    : NumPy dtype name per uri for columnar, the other uris
+                                                  get the dtype from the parameter details at init
+        - triggers          -> list<(str,float,float)> : uri, enter and exit threshold of the phase
+                                                  indicators for adaptive mode, they are added to the uris
+        - fast_rate         -> float            : Sampling rate in active phases for adaptive mode
+        - slow_rate         -> float            : Sampling rate in quiet phases for adaptive mode,
+                                                  default is sampling_rate
+        - hold_time         -> float            : Min time in the fast rate after a trigger for adaptive mode
+        - keepalive_uri     -> str              : Uri read in idle to keep the connection alive,
+                                                  default is the first uri
         - uri       -> list<str>             : A collection of params that the machien can log
         - protocol -> Protocol : Type protocol that will be applied
         '''
@@ -74,6 +99,15 @@ class IMMController(threading.Thread, imm.EMI_Interface):
         #self.__kwargs['sampling_mode'] = self.__sampling_mode
         self.__sampling_rate = kwargs.get('sampling_rate',0.1)
         self.__debug = kwargs.get('debug',False)
+        # Uri read to keep the connection alive in idle, default is the first uri
+        self.__keepalive_uri = kwargs.get('keepalive_uri',self.__uri[0] if self.__uri else None)
+        # Rate from the phase indicators for the adaptive mode
+        self.__adaptive = AdaptiveRate(triggers=kwargs.get('triggers',[]),
+                                       fast_rate=kwargs.get('fast_rate',0.01),
+                                       slow_rate=kwargs.get('slow_rate',self.__sampling_rate),
+                                       hold_time=kwargs.get('hold_time',0.5))
+        if self.__sampling_mode == SamplingRateMode.ADAPTIVE_PHASE:
+            self.__uri = list(self.__uri) + [i for i in self.__adaptive.uris if i not in self.__uri]
 
         #Inheritance
         if kwargs.get('protocol','emi'):
@@ -86,7 +120,18 @@ class IMMController(threading.Thread, imm.EMI_Interface):
         # Transfrom uri to uptateparms instances
 
         self.__last_action = datetime.datetime.now() - datetime.timedelta(days=1)    # Datetime for last action
-        self.__q = queue.Queue()     # The quene LIFO with samples
+        self.__columnar = kwargs.get('columnar',False)
+        self.__q = self.__make_queue(kwargs.get('dtypes'))     # The quene FIFO with samples
+        self.__subs = SubscriptionHub()    # Subscribers of the samples
+        # Uris grouped by update cycle for the flexible sampling mode
+        self.__scheduler = SamplingScheduler(self.__uri,
+                                             cycles=kwargs.get('cycles'),
+                                             default_cycle=self.__sampling_rate)
+        # Absolute deadlines for the fixed sampling mode
+        self.__timer = DeadlineTimer(self.__sampling_rate,
+                                     overrun_policy=kwargs.get('overrun_policy',OverrunPolicy.SKIP),
+                                     max_catch_up=kwargs.get('max_catch_up',10),
+                                     overrun_callback=kwargs.get('overrun_callback',None))
 
         #Threading
         threading.Thread.__init__(self)     # initialize this thread
@@ -119,6 +164,9 @@ class IMMController(threading.Thread, imm.EMI_Interface):
 
         self.logout()        # First logout and then login
         self.login()         # Login
+        # Columns with the types of the parameters
+        if self.__columnar:
+            self.__q = self.__make_queue(self.__column_dtypes())
         # Start the thread
         self.start()
         print('IMM Controller started')
@@ -138,6 +186,18 @@ class IMMController(threading.Thread, imm.EMI_Interface):
             d = None
         return d
 
+    def drain(self,max_items=None):
+        '''
+        Remove and return the buffered samples in one operation.
+        Params:
+        - max_items -> int : Max number of samples, None returns all samples
+        Return:
+        - list<Dict> : The samples oldest first, also if columnar
+        '''
+        if self.__columnar:
+            return self.__q.drain_rows(max_items)
+        return self.__q.drain(max_items)
+
     def set_state(self,state):
         '''
         Set the thread to go to a new state.
@@ -154,7 +214,7 @@ class IMMController(threading.Thread, imm.EMI_Interface):
         Reset samples and set to idle
         '''
         self.set_state(States.IDLE)
-        self.__q = queue.Queue()
+        self.__q.clear()
         self.__event_quene = queue.Queue()
 
     def quene_is_empty(self):
@@ -167,12 +227,104 @@ class IMMController(threading.Thread, imm.EMI_Interface):
         if self.__q.empty(): return True
         else: return False
 
+    def __column_dtypes(self):
+        '''
+        Return the dtype of every uri, from the dtypes param or from the parameter details.
+        Return:
+        - Dict[str,str] : uri -> NumPy dtype name
+        '''
+        dtypes = dict(self.__kwargs.get('dtypes') or {})
+        missing = [uri for uri in self.__uri if uri not in dtypes]
+        if missing:
+            info = self.get_param_types(missing)
+            typed = self.__kwargs.get('typed',False)
+            for uri in missing:
+                t = info.get(uri,{})
+                # Without typed the values are strings, only numbers are converted by the store
+                if not typed and t.get('type') not in ('int','float'):
+                    dtypes[uri] = 'object'
+                else:
+                    dtypes[uri] = t.get('dtype','object')
+        return dtypes
+
+    def __make_queue(self,dtypes=None):
+        '''
+        Create the sample queue, a column store if columnar is set.
+        Params:
+        - dtypes -> Dict[str,str] : NumPy dtype name per uri, the other uris are float64 until init
+        '''
+        kwargs = self.__kwargs
+        if not self.__columnar:
+            return RingBuffer(capacity=kwargs.get('queue_size',QUEUE_SIZE),
+                              max_bytes=kwargs.get('queue_bytes',None),
+                              overflow=kwargs.get('overflow_policy',OverflowPolicy.DROP_OLDEST))
+        from daq_core.column_store import ColumnStore, CAPACITY, TIMESTAMP_DTYPE
+        columns = {uri:(dtypes or {}).get(uri,'float64') for uri in self.__uri}
+        columns['timestamp_{}'.format(kwargs.get('name','imm'))] = TIMESTAMP_DTYPE
+        return ColumnStore(columns,
+                           capacity=kwargs.get('queue_size',CAPACITY),
+                           overflow=kwargs.get('overflow_policy',OverflowPolicy.DROP_OLDEST))
+
+    def drain_columns(self,max_rows=None):
+        '''
+        Remove and return the samples as one array per uri. Requires columnar.
+        Params:
+        - max_rows -> int : Max number of samples, None returns all samples
+        Return:
+        - Dict : uri -> array, None if the controller is not columnar
+        '''
+        if not self.__columnar:
+            print('The controller is not columnar')
+            return None
+        return self.__q.drain(max_rows)
+
+    @property
+    def columnar(self):
+        '''
+        '''
+        return self.__columnar
+
+    def get_queue_info(self):
+        '''
+        Return the state of the sample queue.
+        Return:
+        - Dict : size, capacity, bytes, policy and counters of added and dropped samples
+        '''
+        return self.__q.info()
+
+    def subscribe(self,callback=None,**kwargs):
+        '''
+        Subscribe to the samples as they are taken.
+        Params:
+        - callback      -> callable       : Called with every batch of samples, None to iterate the subscription
+        - capacity      -> int            : Max number of buffered samples of the subscription
+        - overflow      -> OverflowPolicy : Backpressure policy when the buffer is full
+        - block_timeout -> float          : Max time the sampling is blocked with BLOCK, None waits forever
+        - batch_size    -> int            : Max number of samples in a batch
+        - transform     -> callable       : Called with every sample before it is delivered
+        Return:
+        - Subscription : Iterable of batches of samples
+        '''
+        return self.__subs.subscribe(callback,**kwargs)
+
+    def unsubscribe(self,sub):
+        '''
+        Close and remove a subscription.
+        '''
+        self.__subs.unsubscribe(sub)
+
+    def get_subscription_info(self):
+        '''
+        Return the buffer state of all subscriptions.
+        '''
+        return self.__subs.info()
+
     def __sample_quene(self,d,debug=False):
         '''
-        Set a data to queue
+        Set a data to queue, and deliver it to the subscribers
         '''
-        if self.__q.full() == False:
-            self.__q.put(d)
+        self.__q.put(d)
+        self.__subs.publish(d)
 
         if debug: print('len of the queue {}'.format(self.__q.qsize()))
 
@@ -195,8 +347,9 @@ class IMMController(threading.Thread, imm.EMI_Interface):
 
         if sleep_time > 0: # Goto sleep
             self.__t_trigger.wait(timeout=sleep_time)
-        else:   # If no action has happened, then call for info data for active the connection
-            self.info_log()
+        else:   # If no action has happened, then read one parameter to keep the connection active
+            self.keep_alive(self.__keepalive_uri)
+            self.__last_action = datetime.datetime.now()
 
     def trigger_event(self):
         '''
@@ -209,15 +362,64 @@ class IMMController(threading.Thread, imm.EMI_Interface):
     def __sample_to_queue(self):
         '''
         '''
-        # The sampling mode is fixed
-        if self.__sampling_mode == SamplingRateMode.FIXED_STEP:
+        d = None
+        # The sampling mode is fixed or adaptive
+        if self.__sampling_mode in (SamplingRateMode.FIXED_STEP,SamplingRateMode.ADAPTIVE_PHASE):
             d = self.get_value() # Get data
             self.__sample_quene(d,debug=self.__debug)    # Put it in queue
 
         elif self.__sampling_mode == SamplingRateMode.FLEXIBLE_CYCLES:
-            d = self.__getParamsOnCycle(past_time=past,debug=False)   # Get data
+            d = self.__getParamsOnCycle()   # Get data
             if d !=  None:
                 self.__sample_quene(d,debug=self.__debug)    # Put it in queue
+        return d
+
+    def __getParamsOnCycle(self):
+        '''
+        Get the parameters that are due in one request.
+        Return:
+        - Dict : Dict with the due uris and the respectively results, None if nothing is due
+        '''
+        deadline = self.__scheduler.next_deadline()
+        missed = self.__scheduler.missed
+        uris = self.__scheduler.due()
+        if not uris:
+            return None
+        # Lateness and skipped deadlines of the groups in the timing info
+        self.__timer.record(deadline,self.__scheduler.missed - missed)
+        return self.get_value(uris)
+
+    def set_param_cycle(self,uri,cycle):
+        '''
+        Set the update cycle of a parameter for the flexible sampling mode.
+        Params:
+        - uri   -> str   : The uri
+        - cycle -> float : Update cycle in seconds, None gives the sampling rate
+        '''
+        self.__scheduler.set_cycle(uri,cycle)
+
+    def get_timing_info(self):
+        '''
+        Return the timing statistics of the intern logging. In the flexible cycles
+        mode the lateness and missed deadlines are against the deadlines of the groups.
+        Return:
+        - Dict : period, samples, achieved period and rate, jitter, lateness, missed deadlines and overruns
+        '''
+        return self.__timer.info()
+
+    def get_adaptive_info(self):
+        '''
+        Return the state of the adaptive sampling rate.
+        Return:
+        - Dict : period, fast and slow rate, number of switches and the state per trigger
+        '''
+        return self.__adaptive.info()
+
+    def get_param_cycles(self):
+        '''
+        Return the groups of parameters with the same update cycle.
+        '''
+        return self.__scheduler.info()
 
     def __event(self):
         '''
@@ -236,11 +438,32 @@ class IMMController(threading.Thread, imm.EMI_Interface):
         Params:
         Return:
         '''
+        if self.__sampling_mode == SamplingRateMode.FIXED_STEP:
+            # Wait for the deadline, a state transition interrupts
+            if self.__timer.wait(self.__t_trigger):
+                self.__sample_to_queue()    # Put it in queue
+                self.__timer.done()
+            return
+
+        if self.__sampling_mode == SamplingRateMode.ADAPTIVE_PHASE:
+            if self.__timer.wait(self.__t_trigger):
+                d = self.__sample_to_queue()    # Put it in queue
+                self.__timer.done()
+                # The next deadline is moved if the phase changed the rate
+                period = self.__adaptive.update(d or {})
+                if period != self.__timer.period:
+                    if self.__debug: print('Sampling rate changed to {}'.format(period))
+                    self.__timer.period = period
+            return
+
         self.__sample_to_queue()    # Put it in queue
 
         # Get sleep time
-        sleep_time = self.__sampling_rate - (datetime.datetime.now()-self.__last_action).total_seconds()
-        #print('Sleep time : {}, rate : {}'.format(sleep_time,self.__sampling_rate))
+        deadline = self.__scheduler.next_deadline()
+        if deadline is None:
+            sleep_time = self.__sampling_rate
+        else:
+            sleep_time = deadline - time.monotonic()
         if sleep_time > 0:
             self.__t_trigger.wait(timeout=sleep_time)
 
@@ -257,6 +480,12 @@ class IMMController(threading.Thread, imm.EMI_Interface):
                 self.__t_trigger.clear()
                 self.__event_quene = queue.Queue()
                 self.__c_state = self.__nx_state
+                if self.__c_state == States.INTERNLOGGING:
+                    self.__timer.start()
+                    if self.__sampling_mode == SamplingRateMode.ADAPTIVE_PHASE:
+                        self.__timer.period = self.__adaptive.period
+                    elif self.__sampling_mode == SamplingRateMode.FLEXIBLE_CYCLES:
+                        self.__scheduler.start()
 
                 print('Changed to new state {}'.format(self.__c_state))
 
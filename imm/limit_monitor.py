@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------
+# Module Description
+#--------------------------------------------------------------------
+"""
+Online monitoring of actual values against the thresholds of the process params.
+The low and high thresholds of all monitored params are kept as NumPy arrays,
+which are only written when a threshold value changes. A batch of samples is
+turned into one matrix with a row per sample and a column per param, and all
+values are compared to the limits in one operation. Only the violations are
+turned into events.
+
+By default the events are edge triggered: an event is emitted when a param
+goes above its high or below its low threshold ('high' or 'low'), and when it
+is back inside the limits ('ok'). With edge=False every violating value gives
+an event. A missing threshold (NaN) is not checked. A param that is missing
+in a sample, e.g. in the flexible cycles mode, keeps its previous state and
+gives no event.
+
+An event is a dict with name, uri, value, low, high, state and timestamp.
+
+Methods for LimitMonitor
+set_limits(values)      -> Update the thresholds from uri->value, returning the number of changes
+check(rows)             -> Check a batch of sample dicts, returning the events
+check_columns(columns)  -> Check a batch of columns uri->array, returning the events
+info()                  -> Returning limits, state and counters per param
+"""
+#--------------------------------------------------------------------
+# Administration Details
+#--------------------------------------------------------------------
+__author__ = "Mats Larsen"
+__copyright__ = "2020 [NTNU Gjøvik and SINTEF Manufacturing]"
+__credits__ = ["Mats Larsen", "Olga Ogorodnyk"]
+__license__ = "MIT"
+__maintainer__ = "Mats Larsen"
+__email__ = "Mats.Larsen@sintef.no"
+__status__ = "Development"
+__date__ = "30032020"
+__version__ = "1.0"
+#--------------------------------------------------------------------
+#IMPORT
+#--------------------------------------------------------------------
+import operator
+import threading
+import numpy as np
+#--------------------------------------------------------------------
+#CONSTANTS
+#--------------------------------------------------------------------
+UNUSED = '0'                            # Value of an unused uri in the csv
+STATES = {-1:'low',0:'ok',1:'high'}     # State code -> state of an event
+#--------------------------------------------------------------------
+#METHODS
+#--------------------------------------------------------------------
+def to_float(value):
+    '''
+    Convert a value to float, NaN if it is missing or not a number.
+    '''
+    try:
+        return float(value)
+    except (TypeError,ValueError):
+        return np.nan
+
+def as_float_array(values):
+    '''
+    Convert a sequence of values to a float64 array, invalid values are NaN.
+    '''
+    try:
+        return np.asarray(values,dtype='float64')
+    except (TypeError,ValueError):
+        # Slow path for missing or invalid values only
+        return np.array([to_float(v) for v in values],dtype='float64')
+#--------------------------------------------------------------------
+# CLASSES
+#--------------------------------------------------------------------
+class LimitMonitor():
+    '''
+    Vectorized check of actual values against low and high thresholds.
+    '''
+    def __init__(self,params,**kwargs):
+        '''
+        Instantiate the monitor without limits, all thresholds are NaN until set.
+        Params:
+        - params    -> Dict[ProcessParam] : The process params, the params with get and threshold uris are monitored
+        - time_key  -> str                : Key of the timestamp in the samples
+        - edge      -> Boolean            : Events only when the state of a param changes
+        '''
+        # Arguments
+        self.__time_key = kwargs.get('time_key','timestamp_imm')
+        self.__edge = kwargs.get('edge',True)
+
+        # Attributes
+        pp = [p for p in params.values()
+              if p.get not in (None,UNUSED) and p.threshold is not None
+              and len(p.threshold) == 2 and UNUSED not in p.threshold]
+        self.__names = [p.name for p in pp]
+        self.__uris = [p.get for p in pp]
+        self.__getter = operator.itemgetter(*self.__uris) if self.__uris else None
+        # Threshold uri -> (column, 0 for low and 1 for high)
+        self.__limit_index = {}
+        for i,p in enumerate(pp):
+            self.__limit_index[p.threshold[0]] = (i,0)
+            self.__limit_index[p.threshold[1]] = (i,1)
+        n = len(pp)
+        self.__limits = np.full((2,n),np.nan)       # Row 0 is low, row 1 is high
+        self.__state = np.zeros(n,dtype='int8')     # -1 low, 0 ok, 1 high
+        self.__violations = np.zeros(n,dtype='int64')
+        self.__checked = 0
+        # The limits are set and checked from different threads
+        self.__lock = threading.Lock()
+
+    @property
+    def uris(self):
+        '''
+        '''
+        return list(self.__uris)
+
+    @property
+    def threshold_uris(self):
+        '''
+        '''
+        return list(self.__limit_index.keys())
+
+    def set_limits(self,values):
+        '''
+        Update the thresholds that have changed.
+        Params:
+        - values -> Dict : threshold uri -> value, other uris are ignored
+        Return:
+        - int : Number of changed thresholds
+        '''
+        changed = 0
+        with self.__lock:
+            for uri,value in values.items():
+                index = self.__limit_index.get(uri)
+                if index is None:
+                    continue
+                i,row = index
+                v = to_float(value)
+                old = self.__limits[row,i]
+                if v != old and not (np.isnan(v) and np.isnan(old)):
+                    self.__limits[row,i] = v
+                    changed += 1
+        return changed
+
+    def __matrix(self,rows):
+        '''
+        Return the values of the rows as a matrix with a column per param.
+        '''
+        getter = self.__getter
+        if len(self.__uris) == 1:
+            values = [[getter(row)] if self.__uris[0] in row else [None] for row in rows]
+        else:
+            values = []
+            for row in rows:
+                try:
+                    values.append(getter(row))
+                except KeyError:
+                    # Sample with a part of the uris, e.g. in the flexible cycles mode
+                    values.append([row.get(uri) for uri in self.__uris])
+        try:
+            m = np.asarray(values,dtype='float64')
+        except (TypeError,ValueError):
+            # Slow path for rows with missing or invalid values
+            m = np.array([[to_float(v) for v in row] for row in values],dtype='float64')
+        return m.reshape(len(rows),len(self.__uris))
+
+    def check(self,rows):
+        '''
+        Check a batch of samples.
+        Params:
+        - rows -> list<Dict> : The samples, uri -> value
+        Return:
+        - list<Dict> : The events, oldest first
+        '''
+        if not rows or not self.__uris:
+            return []
+        return self.__check(self.__matrix(rows),[row.get(self.__time_key) for row in rows])
+
+    def check_columns(self,columns):
+        '''
+        Check a batch of samples stored as columns.
+        Params:
+        - columns -> Dict : uri -> array of values, and the timestamps with time_key
+        Return:
+        - list<Dict> : The events, oldest first
+        '''
+        times = columns.get(self.__time_key)
+        n = max((len(col) for col in columns.values()),default=0)
+        if n == 0 or not self.__uris:
+            return []
+        m = np.full((n,len(self.__uris)),np.nan)
+        for j,uri in enumerate(self.__uris):
+            col = columns.get(uri)
+            if col is not None:
+                m[:,j] = as_float_array(col)
+        return self.__check(m,times if times is not None else [None]*n)
+
+    def __check(self,m,times):
+        '''
+        Compare the matrix of values to the limits and return the events.
+        '''
+        with self.__lock:
+            low = self.__limits[0].copy()
+            high = self.__limits[1].copy()
+            n,k = m.shape
+            valid = ~np.isnan(m)
+            # A NaN limit gives False, so it is ok
+            state = (m > high).astype('int8') - (m < low).astype('int8')
+            # A missing value keeps the state of the last valid value, or of the last batch
+            last = np.maximum.accumulate(np.where(valid,np.arange(n)[:,np.newaxis],-1),axis=0)
+            state = np.where(last >= 0,state[np.maximum(last,0),np.arange(k)],self.__state[np.newaxis,:])
+            self.__violations += np.count_nonzero((state != 0) & valid,axis=0)
+            self.__checked += n
+
+            if self.__edge:
+                prev = np.vstack((self.__state[np.newaxis,:],state[:-1]))
+                rows,cols = np.nonzero((state != prev) & valid)
+            else:
+                rows,cols = np.nonzero((state != 0) & valid)
+            self.__state = state[-1].astype('int8')
+
+        events = []
+        for r,c in zip(rows.tolist(),cols.tolist()):
+            events.append({'name':self.__names[c],
+                           'uri':self.__uris[c],
+                           'value':float(m[r,c]),
+                           'low':float(low[c]),
+                           'high':float(high[c]),
+                           'state':STATES[int(state[r,c])],
+                           'timestamp':times[r]})
+        return events
+
+    def info(self):
+        '''
+        Return the limits, state and number of violations per param.
+        Return:
+        - Dict : name -> low, high, state and violations, and the number of checked samples
+        '''
+        params = {}
+        for i,name in enumerate(self.__names):
+            params[name] = {'low':float(self.__limits[0,i]),
+                            'high':float(self.__limits[1,i]),
+                            'state':STATES[int(self.__state[i])],
+                            'violations':int(self.__violations[i])}
+        return {'checked':self.__checked,'params':params}
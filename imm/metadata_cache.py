@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------
+# Module Description
+#--------------------------------------------------------------------
+"""
+Persistent cache of parameter metadata.
+The details and the description of a parameter seldom change, but requesting
+them costs one round trip per uri. The cache keeps them in a JSON file keyed by
+machine identity and uri, so a restarted proxy can start logging without
+requesting them again. Every entry has a timestamp and expires after a time to
+live, and a file written with another cache version is discarded.
+
+Methods for MetadataCache
+load()                  -> Load the cache from file
+save()                  -> Save the cache to file if it has changed
+get_details(uri)        -> Returning the cached details, None if missing or expired
+set_details(uri,d)      -> Cache the details of a uri
+get_text(uri)           -> Returning the cached description, None if missing or expired
+set_text(uri,t)         -> Cache the description of a uri
+stale(uris)             -> Returning the uris with missing or expired metadata
+clear()                 -> Remove all metadata of the machine
+"""
+#--------------------------------------------------------------------
+# Administration Details
+#--------------------------------------------------------------------
+__author__ = "Mats Larsen"
+__copyright__ = "2020 [NTNU Gjøvik and SINTEF Manufacturing]"
+__credits__ = ["Mats Larsen", "Olga Ogorodnyk"]
+__license__ = "MIT"
+__maintainer__ = "Mats Larsen"
+__email__ = "Mats.Larsen@sintef.no"
+__status__ = "Development"
+__date__ = "30032020"
+__version__ = "1.0"
+#--------------------------------------------------------------------
+#IMPORT
+#--------------------------------------------------------------------
+import os
+import json
+import time
+import threading
+#--------------------------------------------------------------------
+#CONSTANTS
+#--------------------------------------------------------------------
+CACHE_VERSION = 2               # Version of the file format, 2 has no failed requests
+METADATA_TTL = 7*24*3600        # Default time to live of an entry in seconds
+#--------------------------------------------------------------------
+# CLASSES
+#--------------------------------------------------------------------
+class MetadataCache():
+    '''
+    Details and descriptions of parameters, stored on disk per machine.
+    '''
+    def __init__(self,path,machine,ttl=METADATA_TTL):
+        '''
+        Instantiate the cache.
+        Params:
+        - path    -> str   : Path to the cache file
+        - machine -> str   : Identity of the machine
+        - ttl     -> float : Time to live of an entry in seconds, None never expires
+        '''
+        # Arguments
+        self.__path = path
+        self.__machine = machine
+        self.__ttl = ttl
+
+        # Attributes
+        self.__machines = {}        # machine -> uri -> entry
+        self.__lock = threading.Lock()
+        self.__changed = False
+
+    def load(self):
+        '''
+        Load the cache from file. A missing, broken or old file gives an empty cache.
+        Return:
+        - int : Number of cached uris for the machine
+        '''
+        machines = {}
+        try:
+            with open(self.__path,'r') as f:
+                d = json.load(f)
+            if d.get('version') == CACHE_VERSION:
+                machines = d.get('machines',{})
+            else:
+                print('Metadata cache {} has another version, it is discarded'.format(self.__path))
+        except FileNotFoundError:
+            pass
+        except (OSError,ValueError):
+            print('Metadata cache {} could not be read, it is discarded'.format(self.__path))
+
+        with self.__lock:
+            self.__machines = machines
+            self.__changed = False
+            return len(self.__machines.get(self.__machine,{}))
+
+    def save(self):
+        '''
+        Save the cache to file if it has changed. The file is replaced atomically.
+        '''
+        with self.__lock:
+            if not self.__changed:
+                return
+            d = {'version':CACHE_VERSION,'machines':self.__machines}
+            dir_path = os.path.dirname(os.path.abspath(self.__path))
+            os.makedirs(dir_path,exist_ok=True)
+            tmp = '{}.tmp'.format(self.__path)
+            with open(tmp,'w') as f:
+                json.dump(d,f)
+            os.replace(tmp,self.__path)
+            self.__changed = False
+
+    def __entry(self,uri,key):
+        '''
+        Return a field of a valid entry, None if missing or expired.
+        '''
+        e = self.__machines.get(self.__machine,{}).get(uri)
+        if e is None or key not in e:
+            return None
+        if self.__ttl is not None and time.time() - e['time'][key] > self.__ttl:
+            return None
+        return e[key]
+
+    def __set(self,uri,key,value):
+        '''
+        Set a field of an entry.
+        '''
+        with self.__lock:
+            e = self.__machines.setdefault(self.__machine,{}).setdefault(uri,{'time':{}})
+            e[key] = value
+            e['time'][key] = time.time()
+            self.__changed = True
+
+    def get_details(self,uri):
+        '''
+        Return the cached details of a uri, None if missing or expired.
+        '''
+        return self.__entry(uri,'details')
+
+    def set_details(self,uri,details):
+        '''
+        Cache the details of a uri.
+        Params:
+        - uri     -> str  : The uri
+        - details -> Dict : Attributes of the details response
+        '''
+        self.__set(uri,'details',dict(details))
+
+    def get_text(self,uri):
+        '''
+        Return the cached description of a uri, None if missing or expired.
+        '''
+        return self.__entry(uri,'text')
+
+    def set_text(self,uri,text):
+        '''
+        Cache the description of a uri.
+        Params:
+        - uri  -> str : The uri
+        - text -> str : The phrase response
+        '''
+        self.__set(uri,'text',text)
+
+    def stale(self,uris):
+        '''
+        Return the uris with missing or expired details or description.
+        Params:
+        - uris -> list<str> : The uris to check
+        Return:
+        - list<str> : The uris that have to be refreshed
+        '''
+        return [i for i in uris if self.get_details(i) is None or self.get_text(i) is None]
+
+    def clear(self):
+        '''
+        Remove all metadata of the machine.
+        '''
+        with self.__lock:
+            self.__machines.pop(self.__machine,None)
+            self.__changed = True
+
+    @property
+    def machine(self):
+        '''
+        '''
+        return self.__machine
+
+    @property
+    def path(self):
+        '''
+        '''
+        return self.__path
@@ -0,0 +1,387 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------
+# Module Description
+#--------------------------------------------------------------------
+"""
+This module is the controller of several machines in one process.
+All machines are polled by one thread running one asyncio event loop, with one
+AsyncEMIInterface per machine. Every machine has its own state machine
+(IDLE/EVENT/INTERNLOGGING) and its own multi-rate SamplingScheduler, and the
+samples of all machines are put in one aggregated queue. Each sample has the
+name of its machine in the key 'machine'.
+
+The samples are put in the queue and the subscriptions from the event loop, so
+a full buffer must not block: OverflowPolicy.BLOCK is not allowed for the queue
+or a subscription, one slow consumer would stop the sampling of all machines.
+
+Methods for MultiIMMController
+init()                          -> Start the event loop, connect and login all machines
+set_state(state,machine)        -> Set the state of a machine, or of all machines
+trigger_event(machine)          -> Trigger a sample of a machine, or of all machines, in EVENT state
+get_value(machine,uri)          -> Returning a sample of a machine independent of the state
+set_param_value(machine,uri,v)  -> Setting parameter value of a machine
+drain(max_items)                -> Remove and return the samples of all machines
+get_samples()                   -> Returning the samples per machine as dicts of lists
+subscribe(callback)             -> Subscribe to the samples of all machines
+unsubscribe(sub)                -> Close and remove a subscription
+info()                          -> Returning the state, schedule and errors of every machine
+close()                         -> Logout and close all machines
+"""
+#--------------------------------------------------------------------
+# Administration Details
+#--------------------------------------------------------------------
+__author__ = "Mats Larsen"
+__copyright__ = "2020 [NTNU Gjøvik and SINTEF Manufacturing]"
+__credits__ = ["Mats Larsen", "Olga Ogorodnyk"]
+__license__ = "MIT"
+__maintainer__ = "Mats Larsen"
+__email__ = "Mats.Larsen@sintef.no"
+__status__ = "Development"
+__date__ = "30032020"
+__version__ = "1.0"
+#--------------------------------------------------------------------
+#IMPORT
+#--------------------------------------------------------------------
+import time
+import asyncio
+import threading
+from .async_emi_interface import AsyncEMIInterface
+from .sampling_scheduler import SamplingScheduler
+from .imm_controller import States, IDLE_TIME, QUEUE_SIZE
+from daq_core import RingBuffer, OverflowPolicy, SubscriptionHub, rows_to_lists
+#--------------------------------------------------------------------
+#CONSTANTS
+#--------------------------------------------------------------------
+RECONNECT_TIME = 5.0    # Seconds between connection attempts to a machine
+#--------------------------------------------------------------------
+# CLASSES
+#--------------------------------------------------------------------
+class _Machine():
+    '''
+    Connection, schedule and state of one machine.
+    '''
+    def __init__(self,params):
+        '''
+        Params:
+        - params -> Dict : The params of AsyncEMIInterface, and uri, sampling_rate, cycles and keepalive_uri
+        '''
+        self.name = params.get('name','imm')
+        self.uri = list(params.get('uri',[]))
+        self.keepalive_uri = params.get('keepalive_uri',self.uri[0] if self.uri else None)
+        self.emi = AsyncEMIInterface(**params)
+        self.scheduler = SamplingScheduler(self.uri,
+                                           cycles=params.get('cycles'),
+                                           default_cycle=params.get('sampling_rate',0.1))
+        self.state = States.IDLE
+        self.next_state = States.IDLE
+        self.last_action = 0.0
+        self.errors = 0
+        self.last_error = None
+        self.connected = False
+        # Created in the event loop
+        self.changed = None
+        self.events = None
+
+class MultiIMMController(threading.Thread):
+    '''
+    Controller of several machines with one event loop.
+    '''
+    def __init__(self,machines,**kwargs):
+        '''
+        Instantiate the controller.
+        Params:
+        - machines          -> list<Dict>       : Params per machine, the params of AsyncEMIInterface and
+                                                  uri, sampling_rate, cycles and keepalive_uri as for IMMController
+        - queue_size        -> int              : Max number of samples in the aggregated queue
+        - overflow_policy   -> OverflowPolicy   : Handling of a sample when the queue is full, not BLOCK
+        - debug             -> Boolean          : Debug value
+        '''
+        # Arguments
+        self.__debug = kwargs.get('debug',False)
+        overflow = kwargs.get('overflow_policy',OverflowPolicy.DROP_OLDEST)
+        if overflow == OverflowPolicy.BLOCK:
+            raise ValueError('OverflowPolicy.BLOCK would stop the sampling of all machines')
+
+        # Attributes
+        self.__machines = {}
+        for params in machines:
+            m = _Machine(params)
+            if m.name in self.__machines:
+                raise ValueError('Machine name {} is not unique'.format(m.name))
+            self.__machines[m.name] = m
+        self.__q = RingBuffer(capacity=kwargs.get('queue_size',QUEUE_SIZE),
+                              overflow=overflow)
+        self.__subs = SubscriptionHub()
+        self.__loop = None
+        self.__ready = threading.Event()
+        self.__tasks = []
+
+        #Threading
+        threading.Thread.__init__(self)     # initialize this thread
+        self.daemon = True                  # Close if main loop stops
+
+    def init(self):
+        '''
+        Start the event loop, and connect and login all machines in the background.
+        '''
+        self.start()
+        self.__ready.wait()
+        print('Multi IMM Controller started with {} machines'.format(len(self.__machines)))
+
+    def run(self):
+        '''
+        Run the event loop of all machines.
+        '''
+        self.__loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.__loop)
+        for m in self.__machines.values():
+            m.changed = asyncio.Event()
+            m.events = asyncio.Queue()
+            self.__tasks.append(self.__loop.create_task(self.__run_machine(m)))
+        self.__loop.call_soon(self.__ready.set)
+        self.__loop.run_forever()
+
+    def __select(self,machine):
+        '''
+        Return the machines with the name, all machines if None.
+        '''
+        if machine is None:
+            return list(self.__machines.values())
+        return [self.__machines[machine]]
+
+    def __call(self,coro,timeout=None):
+        '''
+        Run a coroutine in the event loop and wait for the result.
+        '''
+        return asyncio.run_coroutine_threadsafe(coro,self.__loop).result(timeout)
+
+    def set_state(self,state,machine=None):
+        '''
+        Set a machine to a new state.
+        Params:
+        - state   -> States : Enum for state
+        - machine -> str    : Name of the machine, None sets all machines
+        '''
+        for m in self.__select(machine):
+            self.__loop.call_soon_threadsafe(self.__change,m,state)
+
+    def __change(self,m,state):
+        '''
+        Change the state in the event loop.
+        '''
+        m.next_state = state
+        m.changed.set()
+        m.events.put_nowait(False)
+
+    def trigger_event(self,machine=None):
+        '''
+        Trigger a sample in the EVENT state.
+        Params:
+        - machine -> str : Name of the machine, None triggers all machines
+        '''
+        for m in self.__select(machine):
+            self.__loop.call_soon_threadsafe(self.__trigger,m)
+
+    def __trigger(self,m):
+        '''
+        Trigger a sample in the event loop.
+        '''
+        m.events.put_nowait(True)
+
+    def get_value(self,machine,uri=None):
+        '''
+        Get a sample of a machine independent of its state.
+        Params:
+        - machine -> str              : Name of the machine
+        - uri     -> [str] or str     : The uris, None gets all uris of the machine
+        Return:
+        - Dict : Dict with all uri and the respectively results
+        '''
+        m = self.__machines[machine]
+        m.last_action = time.monotonic()
+        return self.__call(m.emi.get_param_value(m.uri if uri is None else uri))
+
+    def set_param_value(self,machine,uri,value):
+        '''
+        Set the value of a parameter of a machine.
+        '''
+        m = self.__machines[machine]
+        m.last_action = time.monotonic()
+        return self.__call(m.emi.set_param_value(uri,value))
+
+    async def __connect(self,m):
+        '''
+        Connect and login a machine, retry until connected.
+        '''
+        while not await m.emi.connect():
+            await asyncio.sleep(RECONNECT_TIME)
+        await m.emi.logout()
+        await m.emi.login()
+        m.connected = True
+        if self.__debug: print('Machine {} connected'.format(m.name))
+
+    async def __sample(self,m,uris):
+        '''
+        Read the uris of a machine and put the sample in the queue.
+        '''
+        m.last_action = time.monotonic()
+        d = await m.emi.get_param_value(uris)
+        d['machine'] = m.name
+        self.__q.put(d)
+        self.__subs.publish(d)
+
+    async def __wait(self,m,timeout):
+        '''
+        Wait for a state change of a machine, at most timeout seconds.
+        '''
+        if timeout <= 0:
+            return
+        try:
+            await asyncio.wait_for(m.changed.wait(),timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def __step(self,m):
+        '''
+        Run the current state of a machine once.
+        '''
+        if m.state == States.IDLE:
+            sleep_time = IDLE_TIME - (time.monotonic() - m.last_action)
+            if sleep_time > 0:
+                await self.__wait(m,sleep_time)
+            else:   # Keep the connection active
+                m.last_action = time.monotonic()
+                if m.keepalive_uri is not None:
+                    await m.emi.get_param_value([m.keepalive_uri])
+                else:
+                    await m.emi.info_log()
+
+        elif m.state == States.EVENT:
+            if await m.events.get():
+                await self.__sample(m,m.uri)
+
+        elif m.state == States.INTERNLOGGING:
+            uris = m.scheduler.due()
+            if uris:
+                await self.__sample(m,uris)
+            deadline = m.scheduler.next_deadline()
+            await self.__wait(m,deadline - time.monotonic() if deadline is not None else IDLE_TIME)
+
+    async def __run_machine(self,m):
+        '''
+        State machine of one machine.
+        '''
+        while True:
+            try:
+                if not m.connected:
+                    await self.__connect(m)
+                if m.next_state != m.state:
+                    m.changed.clear()
+                    m.events = asyncio.Queue()
+                    m.state = m.next_state
+                    print('Machine {} changed to new state {}'.format(m.name,m.state))
+                await self.__step(m)
+            except asyncio.CancelledError:
+                raise
+            except (OSError,ConnectionError) as e:
+                print('Machine {} lost the connection : {}'.format(m.name,e))
+                await self.__reset(m,e)
+            except Exception as e:
+                # Any other error, e.g. a bad response, the machine is reconnected as well
+                print('Machine {} failed : {!r}'.format(m.name,e))
+                await self.__reset(m,e)
+
+    async def __reset(self,m,err):
+        '''
+        Close the connection of a machine after an error, it is reconnected after RECONNECT_TIME.
+        '''
+        m.errors += 1
+        m.last_error = repr(err)
+        m.connected = False
+        try:
+            await m.emi.close()
+        except Exception:
+            pass
+        await asyncio.sleep(RECONNECT_TIME)
+
+    def drain(self,max_items=None):
+        '''
+        Remove and return the samples of all machines.
+        Params:
+        - max_items -> int : Max number of samples, None returns all samples
+        Return:
+        - list<Dict> : The samples oldest first, with the machine name in 'machine'
+        '''
+        return self.__q.drain(max_items)
+
+    def get_samples(self):
+        '''
+        Return the samples per machine.
+        Return:
+        - Dict : machine -> uri -> list of values
+        '''
+        rows = {}
+        for s in self.drain():
+            rows.setdefault(s['machine'],[]).append(s)
+        # The uris that were not due in a sample are None, so the lists match the timestamps
+        return {name:rows_to_lists(r,exclude=('machine',)) for name,r in rows.items()}
+
+    def subscribe(self,callback=None,**kwargs):
+        '''
+        Subscribe to the samples of all machines. The params are as for IMMController.subscribe,
+        but the overflow can not be BLOCK.
+        '''
+        if kwargs.get('overflow') == OverflowPolicy.BLOCK:
+            raise ValueError('OverflowPolicy.BLOCK would stop the sampling of all machines')
+        return self.__subs.subscribe(callback,**kwargs)
+
+    def unsubscribe(self,sub):
+        '''
+        Close and remove a subscription.
+        '''
+        self.__subs.unsubscribe(sub)
+
+    def info(self):
+        '''
+        Return the state of every machine.
+        Return:
+        - Dict : machine -> state, connected, errors, last error and update cycles
+        '''
+        return {name:{'state':m.state,
+                      'connected':m.connected,
+                      'errors':m.errors,
+                      'last_error':m.last_error,
+                      'cycles':m.scheduler.info()} for name,m in self.__machines.items()}
+
+    def get_queue_info(self):
+        '''
+        Return the state of the aggregated sample queue.
+        '''
+        return self.__q.info()
+
+    @property
+    def machines(self):
+        '''
+        '''
+        return list(self.__machines.keys())
+
+    def close(self):
+        '''
+        Logout and close all machines, and stop the event loop.
+        '''
+        async def stop():
+            for t in self.__tasks:
+                t.cancel()
+            # A request cancelled in the middle closes its connection
+            await asyncio.gather(*self.__tasks,return_exceptions=True)
+            for m in self.__machines.values():
+                if m.connected:
+                    try:
+                        await m.emi.logout()
+                    except Exception:
+                        pass
+                await m.emi.close()
+                m.connected = False
+        self.__call(stop())
+        self.__loop.call_soon_threadsafe(self.__loop.stop)
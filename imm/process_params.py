@@ -28,7 +28,7 @@ class ProcessParam():
     '''
     Class for update params data with different cycle.
     '''
-    def __init__(self,name,get,set,threshold,unit):
+    def __init__(self,name,get,set,threshold,unit,cycle=None):
         '''
         Instantiate updateParams.
         Params:
@@ -36,7 +36,8 @@ class ProcessParam():
         - get  -> str : uri for getting the actual value
         - set  -> str : URI for set the control value
         - threshold [str,str] : for setting the threshold
-        - unit -> float : The update cycle for a parameter in unit[ms]
+        - unit -> str : Unit of the parameter
+        - cycle -> float : The update cycle for a parameter in unit[ms], None is the sampling rate
         '''
         # Argument
         self.__name = name
@@ -44,6 +45,7 @@ class ProcessParam():
         self.__set = set
         self.__threshold = threshold
         self.__unit = unit
+        self.__cycle = cycle
 
     def __check_params(self):
         '''
@@ -67,6 +69,16 @@ class ProcessParam():
                 return self.name
         else: return None
 
+    @property
+    def uris(self):
+        '''
+        The uris of the parameter, get and set before the thresholds.
+        '''
+        uris = [self.__get,self.__set]
+        if self.__threshold is not None:
+            uris += list(self.__threshold)
+        return [uri for uri in uris if uri is not None]
+
     @property
     def get(self):
         '''
@@ -90,3 +102,9 @@ class ProcessParam():
         '''
         '''
         return self.__threshold
+
+    @property
+    def cycle(self):
+        '''
+        '''
+        return self.__cycle
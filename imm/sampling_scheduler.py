@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------
+# Module Description
+#--------------------------------------------------------------------
+"""
+Multi-rate sampling of parameters.
+Every uri has its own update cycle. The uris with the same cycle form a group,
+and the groups are kept in a heap ordered by their next deadline. At a tick
+all groups that are due are merged into one uri list, so parameters due at the
+same time are read in one getParameterValuesRequest. A group that misses
+deadlines is moved to the next deadline in the future instead of catching up,
+and the skipped deadlines are counted.
+
+Methods for SamplingScheduler
+start()                 -> Schedule all groups now, e.g. when the logging starts
+due(now)                -> Returning the uris that are due at the time now
+next_deadline()         -> Returning the time of the next deadline
+set_cycle(uri,cycle)    -> Set the update cycle of a uri
+info()                  -> Returning the groups with their cycle and number of uris
+"""
+#--------------------------------------------------------------------
+# Administration Details
+#--------------------------------------------------------------------
+__author__ = "Mats Larsen"
+__copyright__ = "2020 [NTNU Gjøvik and SINTEF Manufacturing]"
+__credits__ = ["Mats Larsen", "Olga Ogorodnyk"]
+__license__ = "MIT"
+__maintainer__ = "Mats Larsen"
+__email__ = "Mats.Larsen@sintef.no"
+__status__ = "Development"
+__date__ = "30032020"
+__version__ = "1.0"
+#--------------------------------------------------------------------
+#IMPORT
+#--------------------------------------------------------------------
+import time
+import heapq
+import threading
+#--------------------------------------------------------------------
+# CLASSES
+#--------------------------------------------------------------------
+class SamplingScheduler():
+    '''
+    Deadline heap of uri groups with the same update cycle.
+    '''
+    def __init__(self,uris,**kwargs):
+        '''
+        Instantiate the scheduler, all groups are due at once.
+        Params:
+        - uris          -> list<str>        : The uris to sample
+        - cycles        -> Dict[str,float]  : Update cycle in seconds per uri
+        - default_cycle -> float            : Update cycle in seconds of uris without a cycle
+        '''
+        # Arguments
+        self.__default = kwargs.get('default_cycle',0.1)
+        cycles = kwargs.get('cycles') or {}
+
+        # Attributes
+        self.__cycles = {}          # uri -> cycle
+        for i in uris:
+            c = cycles.get(i)
+            self.__cycles[i] = c if c is not None and c > 0 else self.__default
+        self.__groups = {}          # cycle -> list<uri>
+        self.__heap = []            # [deadline,cycle]
+        self.__missed = 0           # Number of skipped deadlines
+        self.__lock = threading.Lock()
+        self.__build(time.monotonic())
+
+    def __build(self,now):
+        '''
+        Group the uris by cycle and schedule every group at the time now.
+        '''
+        self.__groups = {}
+        for uri,c in self.__cycles.items():
+            self.__groups.setdefault(c,[]).append(uri)
+        self.__heap = [[now,c] for c in sorted(self.__groups)]
+        heapq.heapify(self.__heap)
+
+    def start(self):
+        '''
+        Schedule all groups at the current time, all groups are due at once.
+        '''
+        with self.__lock:
+            self.__build(time.monotonic())
+
+    def due(self,now=None):
+        '''
+        Return the uris that are due, and schedule their groups for the next cycle.
+        Params:
+        - now -> float : Monotonic time, default is the current time
+        Return:
+        - list<str> : The uris to read, empty if nothing is due
+        '''
+        if now is None:
+            now = time.monotonic()
+        uris = []
+        with self.__lock:
+            heap = self.__heap
+            while heap and heap[0][0] <= now:
+                deadline,cycle = heap[0]
+                uris.extend(self.__groups[cycle])
+                deadline += cycle
+                if deadline <= now:     # Missed deadlines are skipped
+                    self.__missed += int((now - deadline)//cycle) + 1
+                    deadline = now + cycle
+                heapq.heapreplace(heap,[deadline,cycle])
+        return uris
+
+    def next_deadline(self):
+        '''
+        Return the monotonic time of the next deadline, None if there are no uris.
+        '''
+        with self.__lock:
+            if not self.__heap:
+                return None
+            return self.__heap[0][0]
+
+    @property
+    def missed(self):
+        '''
+        '''
+        return self.__missed
+
+    def set_cycle(self,uri,cycle):
+        '''
+        Set the update cycle of a uri, all groups are due at once.
+        Params:
+        - uri   -> str   : The uri
+        - cycle -> float : Update cycle in seconds, None gives the default cycle
+        '''
+        with self.__lock:
+            self.__cycles[uri] = cycle if cycle is not None and cycle > 0 else self.__default
+            self.__build(time.monotonic())
+
+    def info(self):
+        '''
+        Return the groups of the scheduler.
+        Return:
+        - list<Dict> : cycle, number of uris and seconds to the next deadline per group
+        '''
+        now = time.monotonic()
+        with self.__lock:
+            return [{'cycle':cycle,'uris':len(self.__groups[cycle]),'next':deadline-now}
+                    for deadline,cycle in sorted(self.__heap)]
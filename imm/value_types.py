@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------
+# Module Description
+#--------------------------------------------------------------------
+"""
+Typed decoding of parameter values.
+The machine returns every parameter value as a string. The type and unit of a
+parameter is given by the getParameterDetailsRequest, which is requested once
+per uri and cached. The values are then decoded straight to int, float or bool,
+and each parameter has a NumPy dtype name for columnar storage.
+
+Methods for ParameterTypes
+prepare(uris)       -> Fetch the details of the uris that are not cached
+decode(values)      -> Decode a dict of uri->str values in place
+converter(uri)      -> Returning the converter of a uri
+dtype(uri)          -> Returning the NumPy dtype name of a uri
+unit(uri)           -> Returning the unit of a uri
+info(uris)          -> Returning type, unit and dtype of the uris
+"""
+#--------------------------------------------------------------------
+# Administration Details
+#--------------------------------------------------------------------
+__author__ = "Mats Larsen"
+__copyright__ = "2020 [NTNU Gjøvik and SINTEF Manufacturing]"
+__credits__ = ["Mats Larsen", "Olga Ogorodnyk"]
+__license__ = "MIT"
+__maintainer__ = "Mats Larsen"
+__email__ = "Mats.Larsen@sintef.no"
+__status__ = "Development"
+__date__ = "30032020"
+__version__ = "1.0"
+#--------------------------------------------------------------------
+#IMPORT
+#--------------------------------------------------------------------
+import time
+import threading
+#--------------------------------------------------------------------
+#CONSTANTS
+#--------------------------------------------------------------------
+# Attributes of the details response holding the type and the unit
+TYPE_KEYS = ('dataType','type','valueType')
+UNIT_KEYS = ('unit','unitName')
+# Type names of the machine for each python type
+INT_TYPES = ('int','integer','long','short','byte','sint','dint','lint','uint','udint','word','dword')
+FLOAT_TYPES = ('float','double','real','lreal','number','decimal')
+BOOL_TYPES = ('bool','boolean')
+# Type name -> NumPy dtype name
+DTYPES = {'int':'int64','float':'float64','bool':'bool','str':'object'}
+RETRY_TIME = 60.0       # Seconds before the details of a uri are fetched again after an error
+#--------------------------------------------------------------------
+#METHODS
+#--------------------------------------------------------------------
+def to_bool(value):
+    '''
+    Convert a value string of the machine to bool.
+    '''
+    v = value.strip().lower()
+    if v in ('1','true','on','yes'):
+        return True
+    if v in ('0','false','off','no'):
+        return False
+    raise ValueError('Not a bool value : {}'.format(value))
+
+def same_value(a,b):
+    '''
+    Check if two values of a parameter are equal, as strings or as numbers.
+    Params:
+    - a -> object : A value, str from the machine or decoded
+    - b -> object : The other value
+    Return:
+    - Boolean : True if the values are equal, e.g. '10' and 10.0
+    '''
+    if a is None or b is None:
+        return False
+    if str(a) == str(b):
+        return True
+    try:
+        return float(a) == float(b)
+    except (TypeError,ValueError):
+        return False
+
+def has_type(details):
+    '''
+    Check if the details of a parameter give its type. The attributes of an
+    error response, e.g. {'text':'unknown uri'}, have no type.
+    '''
+    return bool(details) and any(details.get(key) is not None for key in TYPE_KEYS)
+
+def type_from_details(details):
+    '''
+    Return the python type name of a parameter from its details.
+    Params:
+    - details -> Dict : Attributes of the details response
+    Return:
+    - str : 'int', 'float', 'bool' or 'str'
+    '''
+    if not details:
+        return 'str'
+    for key in TYPE_KEYS:
+        t = details.get(key)
+        if t is not None:
+            break
+    else:
+        return 'str'
+    t = t.strip().lower()
+    # Remove prefixes like 'xs:' from the type
+    t = t.rsplit(':',1)[-1]
+    if t in FLOAT_TYPES:
+        return 'float'
+    if t in INT_TYPES:
+        return 'int'
+    if t in BOOL_TYPES:
+        return 'bool'
+    return 'str'
+
+def unit_from_details(details):
+    '''
+    Return the unit of a parameter from its details, None if not given.
+    '''
+    if not details:
+        return None
+    for key in UNIT_KEYS:
+        if details.get(key) is not None:
+            return details.get(key)
+    return None
+
+# Type name -> converter of the value string
+CONVERTERS = {'int':int,'float':float,'bool':to_bool,'str':str}
+#--------------------------------------------------------------------
+# CLASSES
+#--------------------------------------------------------------------
+class ParameterTypes():
+    '''
+    Cache of parameter types, fetched once per uri.
+    '''
+    def __init__(self,fetch):
+        '''
+        Instantiate the cache.
+        Params:
+        - fetch -> callable : fetch(uri) returning the details of a uri as a dict
+        '''
+        # Arguments
+        self.__fetch = fetch
+
+        # Attributes
+        self.__types = {}       # uri -> (type name, unit)
+        self.__failed = {}      # uri -> monotonic time of the last failed fetch
+        self.__lock = threading.Lock()
+
+    def prepare(self,uris):
+        '''
+        Fetch the details of the uris that are not cached. A uri with a failed
+        fetch, e.g. an error response without a type, is not cached. It is kept
+        as str and fetched again after RETRY_TIME.
+        Params:
+        - uris -> list<str> : The uris
+        '''
+        now = time.monotonic()
+        missing = [i for i in uris if i not in self.__types
+                   and now - self.__failed.get(i,-RETRY_TIME) >= RETRY_TIME]
+        for uri in missing:
+            try:
+                details = self.__fetch(uri)
+            except Exception as e:
+                print('Details of {} could not be fetched : {}'.format(uri,e))
+                details = None
+            if not has_type(details):
+                if details: print('Details of {} have no type : {}'.format(uri,details))
+                self.__failed[uri] = time.monotonic()
+                continue
+            self.__failed.pop(uri,None)
+            self.set_details(uri,details)
+
+    def set_details(self,uri,details):
+        '''
+        Set the type of a uri from its details.
+        Params:
+        - uri     -> str  : The uri
+        - details -> Dict : Attributes of the details response
+        '''
+        with self.__lock:
+            self.__types[uri] = (type_from_details(details),unit_from_details(details))
+
+    def decode(self,values):
+        '''
+        Decode the values in place. Values that can not be decoded are kept as str.
+        Params:
+        - values -> Dict : uri->str values, other keys are left as they are
+        Return:
+        - Dict : The same dict
+        '''
+        types = self.__types
+        for uri,value in values.items():
+            t = types.get(uri)
+            if t is None or value is None or t[0] == 'str':
+                continue
+            try:
+                values[uri] = CONVERTERS[t[0]](value)
+            except ValueError:
+                pass
+        return values
+
+    def converter(self,uri):
+        '''
+        Return the converter of a uri.
+        '''
+        t = self.__types.get(uri)
+        return CONVERTERS[t[0] if t is not None else 'str']
+
+    def dtype(self,uri):
+        '''
+        Return the NumPy dtype name of a uri.
+        '''
+        t = self.__types.get(uri)
+        return DTYPES[t[0] if t is not None else 'str']
+
+    def unit(self,uri):
+        '''
+        Return the unit of a uri.
+        '''
+        t = self.__types.get(uri)
+        return t[1] if t is not None else None
+
+    def info(self,uris=None):
+        '''
+        Return type, unit and dtype of the uris.
+        Params:
+        - uris -> list<str> : The uris, None returns all cached uris
+        Return:
+        - Dict : uri -> {'type','unit','dtype'}
+        '''
+        if uris is None:
+            uris = list(self.__types.keys())
+        r = {}
+        for uri in uris:
+            t = self.__types.get(uri,('str',None))
+            r[uri] = {'type':t[0],'unit':t[1],'dtype':DTYPES[t[0]]}
+        return r
+
+    def __contains__(self,uri):
+        return uri in self.__types
@@ -39,6 +39,18 @@ OPENINGMOULD_URI = 'cc300://imm/cm#//c.Mold1/p.sv_MeasActClmpForce/v/p.rAct/v'
 # Threshold to decide of the mould is open
 THRESHOLD_MOULD_OPENING = 300 # kN
 #--------------------------------------------------------------------
+#METHODS
+#--------------------------------------------------------------------
+def to_json(o):
+    '''
+    Convert the columns of columnar samples for json.
+    '''
+    if hasattr(o,'tolist'):
+        return o.tolist()
+    if isinstance(o,(datetime.datetime,datetime.date)):
+        return o.isoformat(sep=' ')[:23] if isinstance(o,datetime.datetime) else o.isoformat()
+    raise TypeError('Object of type {} is not JSON serializable'.format(type(o).__name__))
+#--------------------------------------------------------------------
 # CLASSES
 #--------------------------------------------------------------------
 class API(threading.Thread):
@@ -201,7 +213,7 @@ class API(threading.Thread):
         - d -> Dict : Dict we want to save to file
         '''
         with open(path, 'w') as outfile:
-            json.dump(d, outfile,sort_keys=True, indent=4, separators=(',', ': '))
+            json.dump(d, outfile,sort_keys=True, indent=4, separators=(',', ': '),default=to_json)
 
     def __saveShot(self,folder,file_name,data):
         '''
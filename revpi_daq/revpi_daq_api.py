@@ -29,28 +29,23 @@ __version__ = "1.0"
 from .revpi_daq_controller import RevPi_DAQ_Controller
 from .revpi_daq_controller import States
 import os
-import csv
+from daq_core import load_catalog
 #--------------------------------------------------------------------
 #CONSTANTS
 #--------------------------------------------------------------------
 #--------------------------------------------------------------------
 #METHODS
 #--------------------------------------------------------------------
-def load_params(path):
+def load_params(path,catalog_path=None):
     '''
-    Loading parameter list
+    Loading parameter list, from the compiled catalog if the csv has not changed
+    Params:
+    - path          -> str : Path to the csv
+    - catalog_path  -> str : Path to the compiled catalog, None is next to the csv
+    Return:
+    - Dict : name -> row of the csv
     '''
-    print('Loading parameter list at path : {}'.format(path))
-    params = {}
-
-    with open('{}'.format(path)) as csvfile:
-
-        line = csv.DictReader(csvfile,delimiter=',', quotechar='"')
-        count = 0
-        for row in line:
-
-            params[row['name']] = row
-    return params
+    return load_catalog(path,catalog_path=catalog_path)
 #--------------------------------------------------------------------
 # CLASSES
 #--------------------------------------------------------------------
@@ -61,7 +56,8 @@ class RevPi_DAQ_API(RevPi_DAQ_Controller):
     def __init__(self,pins,**kwargs):
         '''
         Constructor for REVPODAQ API
-        Params : The same params from RevPi_DAQ_Controller
+        Params : The same params from RevPi_DAQ_Controller, with columnar the
+        samples are returned as one array per input
         '''
         #Inheritance
         RevPi_DAQ_Controller.__init__(self,inputs=pins,**kwargs)
@@ -75,14 +71,14 @@ class RevPi_DAQ_API(RevPi_DAQ_Controller):
     def get_samples(self):
         '''
         Return a samples from the FIFO quene. This is properly a thread action to
-        get data.
+        get data. A columnar controller returns one array per input.
         '''
+        if self.columnar:
+            return self.drain_columns()
         d = {}
-        while self.quene_empty() == False:
-            s = self.get_quene_sample()
+        for s in self.drain():
             for key,val in s.items():
-                if key not in d.keys(): d[key] = []
-                d[key].append(val)
+                d.setdefault(key,[]).append(val)
         return d
 
     def event(self):
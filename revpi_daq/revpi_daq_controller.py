@@ -24,6 +24,11 @@ import queue
 import time
 import datetime
 from .rev_pi import RevPi
+from daq_core import DeadlineTimer, OverrunPolicy, RingBuffer, OverflowPolicy, SubscriptionHub
+#--------------------------------------------------------------------
+#CONSTANTS
+#--------------------------------------------------------------------
+QUEUE_SIZE = 100000     # Default max number of samples in the queue
 #--------------------------------------------------------------------
 #METHODS
 #--------------------------------------------------------------------
@@ -46,6 +51,13 @@ class RevPi_DAQ_Controller(threading.Thread, RevPi):
         - name          -> str : Name of this instance
         - sampling_rate -> float : Defining the sampling freq for the time based sampling
         - inputs        -> Dict <string,string> : Key is the parameter name and value is input name
+        - overrun_policy    -> OverrunPolicy : Handling of missed deadlines
+        - max_catch_up      -> int : Max missed deadlines sampled at once for CATCH_UP
+        - overrun_callback  -> callable : Called with the number of missed deadlines and timing info
+        - queue_size        -> int : Max number of samples in the queue
+        - queue_bytes       -> int : Max estimated bytes of the samples in the queue
+        - overflow_policy   -> OverflowPolicy : Handling of a sample when the queue is full
+        - columnar          -> Boolean : Store the samples in one NumPy column per input
         '''
         #Inheritance
         RevPi.__init__(self)
@@ -64,8 +76,15 @@ class RevPi_DAQ_Controller(threading.Thread, RevPi):
         # Arbritues
         #--------------------------------------------------------------------
         # Quene
-        self.__q = queue.Queue()             # The quene LIFO with samples
+        self.__columnar = kwargs.get('columnar',False)
+        self.__q = self.__make_queue(kwargs)    # The quene FIFO with samples
+        self.__subs = SubscriptionHub()         # Subscribers of the samples
         self.__last_timestamp = None
+        # Absolute deadlines for the intern logging
+        self.__timer = DeadlineTimer(self.__sampling_rate,
+                                     overrun_policy=kwargs.get('overrun_policy',OverrunPolicy.SKIP),
+                                     max_catch_up=kwargs.get('max_catch_up',10),
+                                     overrun_callback=kwargs.get('overrun_callback',None))
 
         # Event for sample data
         self.__sample_trigger = threading.Event()
@@ -104,6 +123,18 @@ class RevPi_DAQ_Controller(threading.Thread, RevPi):
             d = None
         return d
 
+    def drain(self,max_items=None):
+        '''
+        Remove and return the buffered samples in one operation.
+        Params:
+        - max_items -> int : Max number of samples, None returns all samples
+        Return:
+        - list<Dict> : The samples oldest first, also if columnar
+        '''
+        if self.__columnar:
+            return self.__q.drain_rows(max_items)
+        return self.__q.drain(max_items)
+
     def quene_empty(self):
         '''
         Check of the queue is full for empty.
@@ -147,13 +178,18 @@ class RevPi_DAQ_Controller(threading.Thread, RevPi):
         Params:
         Return:
         '''
-        self.__sample_queue(self.get_value())    # Put it in queue
+        # Wait for the deadline, a state transition interrupts
+        if self.__timer.wait(self.__t_trigger):
+            self.__sample_queue(self.get_value())    # Put it in queue
+            self.__timer.done()
 
-        # Get sleep time
-        sleep_time = self.__sampling_rate - (datetime.datetime.now()-self.__last_timestamp).total_seconds()
-        #print('Sleep time : {}, rate : {}'.format(sleep_time,self.__sampling_rate))
-        if sleep_time > 0:
-            self.__t_trigger.wait(timeout=sleep_time)
+    def get_timing_info(self):
+        '''
+        Return the timing statistics of the intern logging.
+        Return:
+        - Dict : period, samples, achieved period and rate, jitter, lateness, missed deadlines and overruns
+        '''
+        return self.__timer.info()
 
     def __idle(self):
         '''
@@ -195,15 +231,84 @@ class RevPi_DAQ_Controller(threading.Thread, RevPi):
         '''
         Reset samples and set to idle
         '''
-        self.__q = queue.Queue()
+        self.__q.clear()
         self.__event_quene = queue.Queue()
 
+    def __make_queue(self,kwargs):
+        '''
+        Create the sample queue, a column store if columnar is set.
+        '''
+        if not self.__columnar:
+            return RingBuffer(capacity=kwargs.get('queue_size',QUEUE_SIZE),
+                              max_bytes=kwargs.get('queue_bytes',None),
+                              overflow=kwargs.get('overflow_policy',OverflowPolicy.DROP_OLDEST))
+        from daq_core.column_store import ColumnStore, CAPACITY, TIMESTAMP_DTYPE
+        columns = {'{}_{}'.format(key,val['unit']):'float64' for key,val in self.__input.items()}
+        columns['timestamp_{}'.format(self.__name)] = TIMESTAMP_DTYPE
+        return ColumnStore(columns,
+                           capacity=kwargs.get('queue_size',CAPACITY),
+                           overflow=kwargs.get('overflow_policy',OverflowPolicy.DROP_OLDEST))
+
+    def drain_columns(self,max_rows=None):
+        '''
+        Remove and return the samples as one array per input. Requires columnar.
+        Params:
+        - max_rows -> int : Max number of samples, None returns all samples
+        Return:
+        - Dict : input -> array, None if the controller is not columnar
+        '''
+        if not self.__columnar:
+            print('The controller is not columnar')
+            return None
+        return self.__q.drain(max_rows)
+
+    @property
+    def columnar(self):
+        '''
+        '''
+        return self.__columnar
+
+    def get_queue_info(self):
+        '''
+        Return the state of the sample queue.
+        Return:
+        - Dict : size, capacity, bytes, policy and counters of added and dropped samples
+        '''
+        return self.__q.info()
+
+    def subscribe(self,callback=None,**kwargs):
+        '''
+        Subscribe to the samples as they are taken.
+        Params:
+        - callback      -> callable       : Called with every batch of samples, None to iterate the subscription
+        - capacity      -> int            : Max number of buffered samples of the subscription
+        - overflow      -> OverflowPolicy : Backpressure policy when the buffer is full
+        - block_timeout -> float          : Max time the sampling is blocked with BLOCK, None waits forever
+        - batch_size    -> int            : Max number of samples in a batch
+        - transform     -> callable       : Called with every sample before it is delivered
+        Return:
+        - Subscription : Iterable of batches of samples
+        '''
+        return self.__subs.subscribe(callback,**kwargs)
+
+    def unsubscribe(self,sub):
+        '''
+        Close and remove a subscription.
+        '''
+        self.__subs.unsubscribe(sub)
+
+    def get_subscription_info(self):
+        '''
+        Return the buffer state of all subscriptions.
+        '''
+        return self.__subs.info()
+
     def __sample_queue(self,d,debug=False):
         '''
-        Set a data to the FIFO queue
+        Set a data to the FIFO queue, and deliver it to the subscribers
         '''
-        if self.__q.full() == False:
-            self.__q.put(d)
+        self.__q.put(d)
+        self.__subs.publish(d)
 
         if debug: print('len of the queue {}'.format(self.__q.qsize()))
 
@@ -226,6 +331,8 @@ class RevPi_DAQ_Controller(threading.Thread, RevPi):
                  #self.__sample_trigger.clear()
                  self.__event_quene = queue.Queue()
                  self.__c_state = self.__nx_state
+                 if self.__c_state == States.INTERNLOGGING:
+                     self.__timer.start()
                  print('Changed to new state {}'.format(self.__c_state))
 
             # Upper section
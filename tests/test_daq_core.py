@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------
+# Module Description
+#--------------------------------------------------------------------
+"""
+Unit tests of the sampling tools in daq_core.
+"""
+#--------------------------------------------------------------------
+# Administration Details
+#--------------------------------------------------------------------
+__author__ = "Mats Larsen"
+__copyright__ = "2020 [NTNU Gjøvik and SINTEF Manufacturing]"
+__credits__ = ["Mats Larsen", "Olga Ogorodnyk"]
+__license__ = "MIT"
+__maintainer__ = "Mats Larsen"
+__email__ = "Mats.Larsen@sintef.no"
+__status__ = "Development"
+__date__ = "30032020"
+__version__ = "1.0"
+#--------------------------------------------------------------------
+#IMPORT
+#--------------------------------------------------------------------
+import os
+import time
+import queue
+import asyncio
+import pytest
+from daq_core import (RingBuffer, OverflowPolicy, rows_to_lists, DeadlineTimer,
+                      OverrunPolicy, SubscriptionHub, load_catalog)
+from daq_core.param_catalog import SUFFIX
+#--------------------------------------------------------------------
+# RingBuffer
+#--------------------------------------------------------------------
+def test_ring_buffer_fifo_and_wrap():
+    b = RingBuffer(capacity=3)
+    for i in range(3):
+        assert b.put(i)
+    assert b.get() == 0
+    b.put(3)
+    assert b.drain() == [1,2,3]
+    assert b.empty()
+
+def test_ring_buffer_drop_oldest():
+    b = RingBuffer(capacity=2,overflow=OverflowPolicy.DROP_OLDEST)
+    assert b.put(1) and b.put(2)
+    assert not b.put(3)
+    assert b.drain() == [2,3]
+    assert b.info()['dropped'] == 1
+
+def test_ring_buffer_drop_newest():
+    b = RingBuffer(capacity=2,overflow=OverflowPolicy.DROP_NEWEST)
+    b.put(1); b.put(2)
+    assert not b.put(3)
+    assert b.drain() == [1,2]
+
+def test_ring_buffer_block_timeout():
+    b = RingBuffer(capacity=1,overflow=OverflowPolicy.BLOCK)
+    b.put(1)
+    start = time.monotonic()
+    assert not b.put(2,timeout=0.05)
+    assert time.monotonic() - start >= 0.05
+    assert b.drain() == [1]
+
+def test_ring_buffer_drain_max_items():
+    b = RingBuffer(capacity=5)
+    for i in range(5):
+        b.put(i)
+    assert b.drain(2) == [0,1]
+    assert len(b) == 3
+    with pytest.raises(queue.Empty):
+        RingBuffer().get(block=False)
+
+def test_rows_to_lists_pads_missing_keys():
+    rows = [{'a':1,'t':0},{'b':2,'t':1},{'a':3,'b':4,'t':2}]
+    d = rows_to_lists(rows)
+    assert d == {'a':[1,None,3],'t':[0,1,2],'b':[None,2,4]}
+    assert set(rows_to_lists(rows,exclude=('t',))) == {'a','b'}
+    assert rows_to_lists([]) == {}
+#--------------------------------------------------------------------
+# ColumnStore
+#--------------------------------------------------------------------
+def test_column_store_columns_and_missing():
+    np = pytest.importorskip('numpy')
+    from daq_core.column_store import ColumnStore
+    s = ColumnStore({'x':'float64','n':'int64','s':'object'},capacity=3)
+    s.put({'x':1.5,'n':2,'s':'a'})
+    s.put({'x':'bad','s':'b'})
+    c = s.drain()
+    assert c['x'][0] == 1.5 and np.isnan(c['x'][1])
+    # int columns are float64 with allow_missing, so a missing value is NaN
+    assert c['n'].dtype == np.float64 and np.isnan(c['n'][1])
+    assert list(c['s']) == ['a','b']
+    assert s.info()['invalid'] == 1
+
+def test_column_store_wrap_and_drain_rows():
+    pytest.importorskip('numpy')
+    from daq_core.column_store import ColumnStore
+    s = ColumnStore(['x'],capacity=3)
+    for i in range(5):
+        s.put({'x':i})
+    assert s.drain_rows() == [{'x':2.0},{'x':3.0},{'x':4.0}]
+    assert s.info()['dropped'] == 2
+#--------------------------------------------------------------------
+# DeadlineTimer
+#--------------------------------------------------------------------
+def test_deadline_timer_skips_missed_deadlines():
+    t = DeadlineTimer(0.01,overrun_policy=OverrunPolicy.SKIP)
+    assert t.wait()
+    time.sleep(0.035)
+    missed = t.done()
+    assert missed >= 3
+    info = t.info()
+    assert info['overruns'] == 1 and info['missed'] == missed
+    # The next deadline is on the grid in the future
+    assert t.next_deadline > time.monotonic() - 0.01
+
+def test_deadline_timer_record_external_deadline():
+    calls = []
+    t = DeadlineTimer(0.1,overrun_callback=lambda n,info: calls.append(n))
+    t.record(time.monotonic() - 0.02)
+    t.record(time.monotonic(),missed=2)
+    info = t.info()
+    assert info['samples'] == 2
+    assert info['max_late'] >= 0.02
+    assert info['missed'] == 2 and info['overruns'] == 1
+    assert calls == [2]
+#--------------------------------------------------------------------
+# Subscriptions
+#--------------------------------------------------------------------
+def test_subscription_batches_and_transform():
+    hub = SubscriptionHub()
+    sub = hub.subscribe(transform=lambda s: {'v':s['uri']},batch_size=2)
+    for i in range(3):
+        hub.publish({'uri':i})
+    assert sub.get_batch(0.1) == [{'v':0},{'v':1}]
+    assert sub.get_batch(0.1) == [{'v':2}]
+    assert sub.get_batch(0.05) == []
+    hub.unsubscribe(sub)
+    assert sub.closed and len(hub) == 0
+
+def test_subscription_callback():
+    hub = SubscriptionHub()
+    got = []
+    sub = hub.subscribe(got.extend)
+    hub.publish(1); hub.publish(2)
+    end = time.monotonic() + 2.0
+    while len(got) < 2 and time.monotonic() < end:
+        time.sleep(0.01)
+    hub.unsubscribe(sub)
+    assert got == [1,2]
+
+def test_subscription_async_iteration():
+    hub = SubscriptionHub()
+    sub = hub.subscribe()
+    async def consume():
+        batches = []
+        async for batch in sub:
+            batches += batch
+            if len(batches) >= 2:
+                break
+        return batches
+    async def main():
+        task = asyncio.ensure_future(consume())
+        await asyncio.sleep(0.01)
+        hub.publish('a'); hub.publish('b')
+        return await asyncio.wait_for(task,2.0)
+    assert asyncio.run(main()) == ['a','b']
+#--------------------------------------------------------------------
+# Parameter catalog
+#--------------------------------------------------------------------
+def test_catalog_is_compiled_once_and_rebuilt_on_change(tmp_path):
+    path = str(tmp_path/'params.csv')
+    with open(path,'w') as f:
+        f.write('name,pin\na,1\n')
+    calls = []
+    def compile(rows):
+        calls.append(1)
+        return {'names':sorted(rows)}
+    assert load_catalog(path,compile,kind='t') == {'names':['a']}
+    assert load_catalog(path,compile,kind='t') == {'names':['a']}
+    assert len(calls) == 1
+    # Another kind or a changed csv compiles again
+    load_catalog(path,compile,kind='other')
+    assert len(calls) == 2
+    with open(path,'a') as f:
+        f.write('bb,2\n')
+    assert load_catalog(path,compile,kind='other') == {'names':['a','bb']}
+    assert len(calls) == 3
+
+def test_catalog_broken_file_is_compiled_again(tmp_path):
+    path = str(tmp_path/'params.csv')
+    with open(path,'w') as f:
+        f.write('name,pin\na,1\n')
+    with open(path + SUFFIX,'wb') as f:
+        f.write(b'\x80\x04not json')
+    assert load_catalog(path) == {'a':{'name':'a','pin':'1'}}
+    assert os.path.exists(path + SUFFIX)
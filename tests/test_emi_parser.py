@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------
+# Module Description
+#--------------------------------------------------------------------
+"""
+Unit tests of the EMI framing, requests and response parsers.
+"""
+#--------------------------------------------------------------------
+# Administration Details
+#--------------------------------------------------------------------
+__author__ = "Mats Larsen"
+__copyright__ = "2020 [NTNU Gjøvik and SINTEF Manufacturing]"
+__credits__ = ["Mats Larsen", "Olga Ogorodnyk"]
+__license__ = "MIT"
+__maintainer__ = "Mats Larsen"
+__email__ = "Mats.Larsen@sintef.no"
+__status__ = "Development"
+__date__ = "30032020"
+__version__ = "1.0"
+#--------------------------------------------------------------------
+#IMPORT
+#--------------------------------------------------------------------
+import socket
+import xml.etree.ElementTree as ET
+import pytest
+from imm.emi_frame_decoder import FrameDecoder
+from imm.emi_parser import (parse_frame, parse_param_values, response_id,
+                            check_response, next_message_index)
+from imm.emi_requests import (RequestCache, param_values_request, with_request_id,
+                              request_type, set_value_request)
+#--------------------------------------------------------------------
+#CONSTANTS
+#--------------------------------------------------------------------
+VALUES = (b'<getParameterValuesResponse id="7"><parameters>'
+          b'<parameter uri="a" parameterValue="1.5"/>'
+          b'<parameter uri="b" parameterValue="x"/>'
+          b'</parameters></getParameterValuesResponse>')
+#--------------------------------------------------------------------
+# FrameDecoder
+#--------------------------------------------------------------------
+def test_frame_decoder_split_and_partial_frames():
+    d = FrameDecoder()
+    assert d.feed(b'<a/>\x19<b') == 1
+    assert d.next_frame() == b'<a/>'
+    assert d.next_frame() is None
+    assert d.pending() == 2
+    d.feed(b'/>\x19<c/>\x19')
+    assert [d.next_frame(),d.next_frame()] == [b'<b/>',b'<c/>']
+    d.feed(b'<d')
+    d.reset()
+    assert d.pending() == 0 and not d.has_frame()
+
+def test_frame_decoder_reads_socket():
+    a,b = socket.socketpair()
+    try:
+        a.sendall(b'<x/>\x19<y/>\x19')
+        d = FrameDecoder(read_size=3)
+        assert d.read_frame(b) == b'<x/>'
+        assert d.read_frame(b) == b'<y/>'
+        a.close()
+        with pytest.raises(ConnectionError):
+            d.read_frame(b)
+    finally:
+        b.close()
+#--------------------------------------------------------------------
+# Parsers
+#--------------------------------------------------------------------
+def test_parse_param_values_fast_path():
+    assert parse_param_values(VALUES) == {'a':'1.5','b':'x'}
+
+def test_parse_param_values_other_layout_and_escapes():
+    frame = (b'<getParameterValuesResponse><parameters>'
+             b'<parameter parameterValue="&lt;2" uri="a&amp;b"/>'
+             b'<parameter uri=\'c\' parameterValue=\'3\'/>'
+             b'</parameters></getParameterValuesResponse>')
+    assert parse_param_values(frame) == {'a&b':'<2','c':'3'}
+
+def test_parse_param_values_matches_element_tree():
+    frame = (b'<getParameterValuesResponse><parameters>' +
+             b''.join(b'<parameter uri="u%d" parameterValue="%d"/>' % (i,i) for i in range(200)) +
+             b'</parameters></getParameterValuesResponse>')
+    tree = {p.get('uri'):p.get('parameterValue') for p in ET.fromstring(frame).iter('parameter')}
+    assert parse_param_values(frame) == tree
+
+def test_parse_param_values_other_response():
+    assert parse_param_values(b'<errorResponse text="x"/>') is None
+
+def test_parse_frame_and_check_response():
+    assert parse_frame(b'<oops') is None
+    root = parse_frame(b'junk<getParameterDetailsResponse uri="a" dataType="REAL"/>')
+    assert check_response(root,'getParameterDetailsResponse') is root
+    assert check_response(parse_frame(b'<errorResponse text="unknown uri"/>'),
+                          'getParameterDetailsResponse') is None
+    assert check_response(None,'getParameterDetailsResponse') is None
+
+def test_response_id():
+    assert response_id(VALUES) == '7'
+    assert response_id(b'<?xml version="1.0"?><loginResponse sessionid="1"/>') is None
+
+def test_next_message_index():
+    root = ET.fromstring('<getMessagesResponse><messages><message index="3"/>'
+                         '<message index="5"/></messages></getMessagesResponse>')
+    assert next_message_index(root,0) == 6
+    assert next_message_index(None,4) == 4
+#--------------------------------------------------------------------
+# Requests
+#--------------------------------------------------------------------
+def test_request_cache_lru():
+    c = RequestCache(maxsize=2)
+    built = []
+    def build(n):
+        built.append(n)
+        return str(n).encode()
+    assert c.get(('k',1),lambda: build(1)) == b'1\x19'
+    c.get(('k',2),lambda: build(2))
+    c.get(('k',1),lambda: build(1))
+    c.get(('k',3),lambda: build(3))       # Evicts 2, the least recently used
+    c.get(('k',2),lambda: build(2))
+    assert built == [1,2,3,2]
+    assert c.info()['hits'] == 1 and len(c) == 2
+
+def test_request_cache_disabled():
+    c = RequestCache(maxsize=0)
+    c.get('a',lambda: b'a')
+    assert len(c) == 0
+
+def test_request_helpers():
+    msg = param_values_request(['a','b'],'1')
+    assert request_type(msg) == 'getParameterValuesRequest'
+    root = ET.fromstring(with_request_id(msg,'42'))
+    assert root.get('id') == '42'
+    assert [p.get('uri') for p in root.iter('parameter')] == ['a','b']
+    assert request_type(set_value_request('a',1,'iso_abs')) == 'setParameterValueRequest'
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------
+# Module Description
+#--------------------------------------------------------------------
+"""
+Unit tests of the sampling scheduler, the value types and the limit monitor.
+"""
+#--------------------------------------------------------------------
+# Administration Details
+#--------------------------------------------------------------------
+__author__ = "Mats Larsen"
+__copyright__ = "2020 [NTNU Gjøvik and SINTEF Manufacturing]"
+__credits__ = ["Mats Larsen", "Olga Ogorodnyk"]
+__license__ = "MIT"
+__maintainer__ = "Mats Larsen"
+__email__ = "Mats.Larsen@sintef.no"
+__status__ = "Development"
+__date__ = "30032020"
+__version__ = "1.0"
+#--------------------------------------------------------------------
+#IMPORT
+#--------------------------------------------------------------------
+import pytest
+from imm.sampling_scheduler import SamplingScheduler
+from imm.process_params import ProcessParam
+from imm import value_types
+from imm.value_types import ParameterTypes, same_value, type_from_details
+#--------------------------------------------------------------------
+# SamplingScheduler
+#--------------------------------------------------------------------
+def test_scheduler_merges_due_groups():
+    s = SamplingScheduler(['a','b','c'],cycles={'b':1.0},default_cycle=0.1)
+    t0 = s.next_deadline()
+    assert sorted(s.due(t0)) == ['a','b','c']
+    assert s.due(t0) == []
+    assert s.due(t0 + 0.1) == ['a','c']
+    assert sorted(s.due(t0 + 1.0)) == ['a','b','c']
+
+def test_scheduler_counts_skipped_deadlines():
+    s = SamplingScheduler(['a'],default_cycle=0.1)
+    t0 = s.next_deadline()
+    s.due(t0)
+    # The deadline at 0.1 is sampled late, 0.2 and 0.3 are skipped
+    assert s.due(t0 + 0.35) == ['a']
+    assert s.missed == 2
+    assert s.next_deadline() > t0 + 0.35
+
+def test_scheduler_start_and_set_cycle():
+    s = SamplingScheduler(['a','b'],default_cycle=0.1)
+    s.due()
+    s.set_cycle('b',0.5)
+    assert {g['cycle']:g['uris'] for g in s.info()} == {0.1:1,0.5:1}
+    s.start()
+    assert sorted(s.due()) == ['a','b']
+#--------------------------------------------------------------------
+# Value types
+#--------------------------------------------------------------------
+def test_types_from_details_and_decode():
+    assert type_from_details({'dataType':'xs:REAL'}) == 'float'
+    assert type_from_details({'dataType':'DINT'}) == 'int'
+    assert type_from_details({'text':'unknown uri'}) == 'str'
+    assert same_value('10',10.0) and not same_value(None,None)
+    t = ParameterTypes(lambda uri: {'dataType':'DINT' if uri == 'n' else 'BOOL'})
+    t.prepare(['n','b'])
+    values = {'n':'12','b':'true','other':'x'}
+    assert t.decode(values) == {'n':12,'b':True,'other':'x'}
+    assert t.dtype('n') == 'int64' and t.dtype('other') == 'object'
+
+def test_types_error_response_is_retried(monkeypatch):
+    calls = []
+    def fetch(uri):
+        calls.append(uri)
+        return {'text':'unknown uri'} if len(calls) == 1 else {'dataType':'REAL'}
+    t = ParameterTypes(fetch)
+    t.prepare(['a'])
+    assert 'a' not in t
+    t.prepare(['a'])
+    assert len(calls) == 1          # Not fetched again before RETRY_TIME
+    monkeypatch.setattr(value_types,'RETRY_TIME',0.0)
+    t.prepare(['a'])
+    assert t.info(['a'])['a']['dtype'] == 'float64'
+#--------------------------------------------------------------------
+# LimitMonitor
+#--------------------------------------------------------------------
+@pytest.fixture
+def monitor():
+    pytest.importorskip('numpy')
+    from imm.limit_monitor import LimitMonitor
+    pp = {'p':ProcessParam('p','g','s',['lo','hi'],'bar'),
+          'q':ProcessParam('q','g2','s2',['lo2','hi2'],'bar')}
+    m = LimitMonitor(pp,time_key='t')
+    m.set_limits({'lo':0,'hi':10,'lo2':0,'hi2':1})
+    return m
+
+def test_limit_monitor_edge_events(monitor):
+    rows = [{'g':5,'g2':0.5,'t':0},{'g':11,'g2':0.5,'t':1},{'g':12,'g2':0.5,'t':2},{'g':5,'g2':0.5,'t':3}]
+    events = monitor.check(rows)
+    assert [(e['name'],e['state'],e['timestamp']) for e in events] == [('p','high',1),('p','ok',3)]
+    assert monitor.info()['params']['p']['violations'] == 2
+
+def test_limit_monitor_missing_values_keep_state(monitor):
+    # The param is missing in a sample, e.g. in the flexible cycles mode
+    rows = [{'g':11,'g2':0.5,'t':0},{'g2':0.5,'t':1},{'g':11,'g2':0.5,'t':2}]
+    events = monitor.check(rows)
+    assert [(e['name'],e['state']) for e in events] == [('p','high')]
+    assert monitor.check([{'g2':0.5,'t':3}]) == []
+
+def test_limit_monitor_columns(monitor):
+    events = monitor.check_columns({'g':[1,-1],'g2':[0.5,0.5],'t':[0,1]})
+    assert [(e['name'],e['state'],e['value']) for e in events] == [('p','low',-1.0)]
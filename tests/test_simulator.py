@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#--------------------------------------------------------------------
+# Module Description
+#--------------------------------------------------------------------
+"""
+End-to-end tests of the EMI clients and controllers against the EMI simulator.
+"""
+#--------------------------------------------------------------------
+# Administration Details
+#--------------------------------------------------------------------
+__author__ = "Mats Larsen"
+__copyright__ = "2020 [NTNU Gjøvik and SINTEF Manufacturing]"
+__credits__ = ["Mats Larsen", "Olga Ogorodnyk"]
+__license__ = "MIT"
+__maintainer__ = "Mats Larsen"
+__email__ = "Mats.Larsen@sintef.no"
+__status__ = "Development"
+__date__ = "30032020"
+__version__ = "1.0"
+#--------------------------------------------------------------------
+#IMPORT
+#--------------------------------------------------------------------
+import time
+import asyncio
+import pytest
+import imm
+from daq_core import OverflowPolicy
+from imm.emi_simulator import SHOT_COUNTER_URI, CLAMP_FORCE_URI
+#--------------------------------------------------------------------
+#CONSTANTS
+#--------------------------------------------------------------------
+LOGIN = {'username':'user','passw':'secret'}
+#--------------------------------------------------------------------
+# Fixtures
+#--------------------------------------------------------------------
+@pytest.fixture
+def simulator():
+    sim = imm.EMISimulator(port=0,**LOGIN)
+    sim.start()
+    yield sim
+    sim.stop()
+
+def connection(sim):
+    ip,port = sim.address
+    return dict(ip=ip,port=port,**LOGIN)
+
+def wait_samples(get,n,timeout=5.0):
+    '''
+    Wait until get() returns at least n samples.
+    '''
+    end = time.monotonic() + timeout
+    while get() < n and time.monotonic() < end:
+        time.sleep(0.02)
+#--------------------------------------------------------------------
+# Clients
+#--------------------------------------------------------------------
+@pytest.mark.parametrize('pipelined',[False,True])
+def test_emi_interface_values_and_batch(simulator,pipelined):
+    e = imm.EMI_Interface(name='t',pipelined=pipelined,stats=True,**connection(simulator))
+    assert e.connect()
+    e.login()
+    try:
+        d = e.get_param_value([SHOT_COUNTER_URI,CLAMP_FORCE_URI])
+        assert set(d) == {SHOT_COUNTER_URI,CLAMP_FORCE_URI,'timestamp_t'}
+        assert e.set_param_values({'a':1,'b':2})['ok'] == {'a':True,'b':True}
+        assert 'setParameterValueRequest batch' in e.get_request_stats()
+        assert e.get_param_details('x')['dataType'] == 'REAL'
+    finally:
+        e.close()
+
+def test_async_interface_cancel_drops_connection():
+    sim = imm.EMISimulator(port=0,latency=0.2,**LOGIN)
+    sim.start()
+    async def main():
+        e = imm.AsyncEMIInterface(**connection(sim))
+        with pytest.raises(ConnectionError):
+            await e.get_param_value(SHOT_COUNTER_URI)
+        assert await e.connect()
+        await e.login()
+        task = asyncio.ensure_future(e.get_param_value(SHOT_COUNTER_URI))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # The response of the cancelled request is never read by the next request
+        with pytest.raises(ConnectionError):
+            await e.get_param_value(SHOT_COUNTER_URI)
+        await e.connect()
+        await e.login()
+        d = await e.get_param_value(SHOT_COUNTER_URI)
+        await e.close()
+        return d
+    try:
+        assert SHOT_COUNTER_URI in asyncio.run(main())
+    finally:
+        sim.stop()
+#--------------------------------------------------------------------
+# Controllers
+#--------------------------------------------------------------------
+def test_imm_api_flexible_cycles_samples_are_aligned(simulator,tmp_path):
+    path = str(tmp_path/'params.csv')
+    with open(path,'w') as f:
+        f.write('name,path_act_value,path_set_value,path_set_low_value,path_set_high_value,enable,description,unit\n')
+        f.write('force,{},0,0,0,1,d,kN\n'.format(CLAMP_FORCE_URI))
+        f.write('shots,{},0,0,0,1,d,pcs\n'.format(SHOT_COUNTER_URI))
+    api = imm.IMM_API(path,name='m',sampling_rate=0.02,
+                      sampling_mode=imm.SamplingRateMode.FLEXIBLE_CYCLES,
+                      cycles={SHOT_COUNTER_URI:0.5},**connection(simulator))
+    sub = api.subscribe()
+    try:
+        api.set_state(imm.States.INTERNLOGGING)
+        wait_samples(lambda: api.get_queue_info()['added'],10)
+        api.set_state(imm.States.IDLE)
+        time.sleep(0.1)
+        d = api.get_samples()
+        assert set(d) == {'force','shots','timestamp_m'}
+        n = len(d['timestamp_m'])
+        assert n >= 10
+        # The shot counter is only due every 0.5 s, the other samples are None
+        assert len(d['force']) == len(d['shots']) == n
+        assert d['shots'][0] is not None and None in d['shots']
+        assert api.get_timing_info()['samples'] >= n
+        # Subscribers get the samples named as get_samples
+        assert 'force' in sub.get_batch(1.0)[0]
+    finally:
+        api.unsubscribe(sub)
+        api.close()
+
+def test_multi_controller_samples_per_machine():
+    sims = [imm.EMISimulator(port=0,**LOGIN) for i in range(2)]
+    for sim in sims:
+        sim.start()
+    machines = [dict(name='m{}'.format(i),uri=[SHOT_COUNTER_URI,CLAMP_FORCE_URI],sampling_rate=0.02,
+                     cycles={SHOT_COUNTER_URI:0.5},**connection(sim)) for i,sim in enumerate(sims)]
+    with pytest.raises(ValueError):
+        imm.MultiIMMController(machines,overflow_policy=OverflowPolicy.BLOCK)
+    c = imm.MultiIMMController(machines)
+    c.init()
+    try:
+        c.set_state(imm.States.INTERNLOGGING)
+        wait_samples(lambda: c.get_queue_info()['added'],20)
+        c.set_state(imm.States.IDLE)
+        time.sleep(0.1)
+        d = c.get_samples()
+        assert set(d) == {'m0','m1'}
+        for name,values in d.items():
+            n = len(values['timestamp_{}'.format(name)])
+            assert len(values[SHOT_COUNTER_URI]) == len(values[CLAMP_FORCE_URI]) == n
+    finally:
+        c.close()
+        for sim in sims:
+            sim.stop()